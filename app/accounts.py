@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import aiofiles
+from . import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Аккаунт, для которого выполняется текущий запуск: по нему разделяются состояние синхронизации,
+# контрольные точки и хранилище событий. Задачи asyncio наследуют значение от создавшей их задачи
+current_account_id: ContextVar[Optional[int]] = ContextVar("current_account_id", default=None)
+
+_accounts: List[Dict[str, Any]] = []
+_primary_account_id: Optional[int] = None
+
+
+def load_accounts() -> None:
+    global _accounts, _primary_account_id
+    path = config.ACCOUNTS_FILE_PATH
+    try:
+        with open(path, encoding='utf-8') as f:
+            loaded = json.load(f)
+        _accounts = loaded.get("accounts", [])
+        _primary_account_id = loaded.get("primary_account_id")
+        logging.info(f"Загружен список аккаунтов Huntflow: {[account['id'] for account in _accounts]}.")
+    except FileNotFoundError:
+        logging.info(f"Файл списка аккаунтов {path} не найден. Аккаунты будут получены при первом обновлении.")
+    except Exception:
+        logging.error(f"Ошибка при чтении списка аккаунтов {path}.")
+
+
+async def _save_accounts() -> None:
+    path = config.ACCOUNTS_FILE_PATH
+    tmp_path = f"{path}.tmp"
+    try:
+        accounts_dir = os.path.dirname(path)
+        if accounts_dir:
+            os.makedirs(accounts_dir, exist_ok=True)
+        async with aiofiles.open(tmp_path, mode='w', encoding='utf-8') as f:
+            await f.write(json.dumps(
+                {"primary_account_id": _primary_account_id, "accounts": _accounts}, ensure_ascii=False
+            ))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logging.error(f"Ошибка при сохранении списка аккаунтов: {e}", exc_info=True)
+
+
+def select_accounts(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    available = [{"id": item["id"], "name": item.get("name") or str(item["id"])} for item in items]
+    if not config.HUNTFLOW_ACCOUNT_IDS:
+        return available
+    selected = [account for account in available if account["id"] in config.HUNTFLOW_ACCOUNT_IDS]
+    missing = set(config.HUNTFLOW_ACCOUNT_IDS) - {account["id"] for account in selected}
+    if missing:
+        logging.warning(f"Аккаунты {sorted(missing)} из HUNTFLOW_ACCOUNT_IDS недоступны для текущего токена.")
+    return selected
+
+
+async def remember_accounts(accounts: List[Dict[str, Any]]) -> None:
+    global _accounts, _primary_account_id
+    account_ids = [account["id"] for account in accounts]
+    # Основной аккаунт хранится по прежним путям кэша, поэтому выбирается один раз и больше не меняется
+    primary_account_id = _primary_account_id
+    if primary_account_id is None and account_ids:
+        primary_account_id = account_ids[0]
+    if accounts == _accounts and primary_account_id == _primary_account_id:
+        return
+    _accounts = accounts
+    _primary_account_id = primary_account_id
+    await _save_accounts()
+    logging.info(f"Аккаунты Huntflow для отчета: {account_ids}, основной: {primary_account_id}.")
+
+
+def get_accounts() -> List[Dict[str, Any]]:
+    return list(_accounts)
+
+
+def get_account_ids() -> List[int]:
+    return [account["id"] for account in _accounts]
+
+
+def get_primary_account_id() -> Optional[int]:
+    return _primary_account_id
+
+
+def get_default_account_id() -> Optional[int]:
+    account_ids = get_account_ids()
+    if _primary_account_id in account_ids or not account_ids:
+        return _primary_account_id
+    return account_ids[0]
+
+
+def resolve_account_id(account_id: Optional[int] = None) -> Optional[int]:
+    return get_default_account_id() if account_id is None else account_id
+
+
+def is_known_account(account_id: int) -> bool:
+    return any(account["id"] == account_id for account in _accounts)
+
+
+def partition_path(path: str, account_id: Optional[int] = None) -> str:
+    account_id = resolve_account_id(account_id)
+    if account_id is None or account_id == _primary_account_id:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{account_id}{ext}"
+
+
+def current_partition_path(path: str) -> str:
+    return partition_path(path, current_account_id.get())
+
+
+@contextmanager
+def use_account(account_id: Optional[int]) -> Iterator[None]:
+    token = current_account_id.set(resolve_account_id(account_id))
+    try:
+        yield
+    finally:
+        current_account_id.reset(token)
@@ -1,139 +1,492 @@
 import asyncio
-import json
 import logging
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
-import aiofiles
-from . import config, report_generator
+from typing import Any, Collection, Dict, List, Mapping, Optional, Set, Tuple
+from . import accounts, config, coordination, metrics, progress, refresh_worker, report_generator
+from .cache_storage import create_cache_storage
+from .snapshot import (
+    COMMENT_KEY, EMPTY_SNAPSHOT, VACANCY_ID_KEY, VACANCY_NAME_KEY, ReportSnapshot, build_snapshot, extract_comments, merge_comments,
+    query_positions,
+)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-_cached_data: Dict[str, Any] = {"vacancies": [], "coworkers": {}, "last_updated": None}
-_cache_lock = asyncio.Lock()
+# Время расчета строки ставится при публикации в кэше: строки сборщика от него не зависят
+UPDATED_AT_KEY = "updated_at"
 
-_update_lock = asyncio.Lock()
-_is_updating = False
+
+class _AccountCache:
+    def __init__(self, account_id: Optional[int]):
+        self.account_id = account_id
+        self.storage = create_cache_storage(account_id)
+        # Межпроцессная блокировка записи и отметка последнего известного состояния хранилища
+        self.lock_path = accounts.partition_path(config.CACHE_FILE_PATH, account_id)
+        self.storage_token: Optional[Tuple] = None
+        self.is_loaded = False
+        # Опубликованный снимок неизменяем и заменяется целиком; комментарии живут отдельно и накладываются при чтении
+        self.snapshot: ReportSnapshot = EMPTY_SNAPSHOT
+        self.comments: Dict[str, str] = {}
+        self.comment_revision = 0
+        self.comments_updated_at: Optional[datetime] = None
+        self.merged_view: Tuple[Tuple[int, int], List[Dict[str, Any]]] = ((0, 0), [])
+        self.cache_lock = asyncio.Lock()
+        self.update_lock = asyncio.Lock()
+        self.is_updating = False
+        self.targeted_in_flight: Set[int] = set()
+        # Строки текущего полного обновления, уже опубликованные поверх прежнего снимка
+        self.run_rows: Dict[int, Dict[str, Any]] = {}
+        self.live_dirty = False
+        self.live_version = 0
+        self.live_saved_at = 0.0
+
+
+# Кэш разделен по аккаунтам Huntflow; None — основной аккаунт, пока список аккаунтов еще не получен
+_partitions: Dict[Optional[int], _AccountCache] = {}
+_accounts_token: Optional[Tuple[int, int]] = None
+# Аккаунты, которые сейчас обновляет ведущий процесс (для ведомых воркеров)
+_remote_updating: Set[Optional[int]] = set()
+
+
+def _partition(account_id: Optional[int] = None) -> _AccountCache:
+    account_id = accounts.resolve_account_id(account_id)
+    partition = _partitions.get(account_id)
+    if partition is None:
+        if account_id == accounts.get_primary_account_id() and None in _partitions:
+            # Кэш, загруженный до получения списка аккаунтов, лежит по путям основного аккаунта
+            partition = _partitions.pop(None)
+            partition.account_id = account_id
+        else:
+            partition = _AccountCache(account_id)
+        _partitions[account_id] = partition
+    return partition
+
+
+def _publish(partition: _AccountCache, snapshot: ReportSnapshot, comments: Dict[str, str]) -> None:
+    partition.snapshot = snapshot
+    partition.comments = comments
+    partition.comment_revision += 1
+    partition.comments_updated_at = None
+
+
+def _current_data(partition: _AccountCache) -> Dict[str, Any]:
+    return {
+        "version": partition.snapshot.version,
+        "vacancies": get_cached_vacancies(partition.account_id),
+        "coworkers": dict(partition.snapshot.coworkers),
+        "last_updated": _effective_last_updated(partition),
+        "is_complete": partition.snapshot.is_complete,
+    }
+
+
+def _current_meta(partition: _AccountCache) -> Dict[str, Any]:
+    return {
+        "version": partition.snapshot.version,
+        "last_updated": _effective_last_updated(partition),
+        "is_complete": partition.snapshot.is_complete,
+    }
+
+
+async def _load_partition(partition: _AccountCache) -> None:
+    partition.is_loaded = True
+    partition.storage_token = partition.storage.get_change_token()
+    try:
+        loaded_data = await partition.storage.load()
+        if loaded_data is None:
+            logging.warning(
+                f"Сохраненный кэш ({config.CACHE_BACKEND}) аккаунта {partition.account_id} не найден. "
+                f"Инициализирован пустой кэш.")
+            _publish(partition, EMPTY_SNAPSHOT, {})
+            return
+        vacancies = loaded_data.get("vacancies", [])
+        _publish(
+            partition,
+            build_snapshot(
+                int(loaded_data.get("version") or 0), vacancies,
+                loaded_data.get("coworkers", {}), loaded_data.get("last_updated"),
+                report_generator.FUNNEL_STAGES_ORDER, bool(loaded_data.get("is_complete", True))
+            ),
+            extract_comments(vacancies)
+        )
+
+        logging.info(
+            f"Кэш аккаунта {partition.account_id} успешно загружен. Вакансий: {len(partition.snapshot.vacancies)}. "
+            f"Последнее обновление: {partition.snapshot.last_updated}")
+    except Exception:
+        logging.error(f"Ошибка при чтении или парсинге кэша ({config.CACHE_BACKEND}). Кэш сброшен.")
+        _publish(partition, EMPTY_SNAPSHOT, {})
+
+
+async def _ensure_partitions(account_ids: List[Optional[int]]) -> None:
+    for account_id in account_ids:
+        partition = _partition(account_id)
+        if not partition.is_loaded:
+            await _load_partition(partition)
 
 
 async def load_cache() -> None:
-    global _cached_data
+    global _accounts_token
     if not config.CACHE_FILE_PATH:
         logging.error("CACHE_FILE_PATH не определен. Кэш не будет загружен.")
         return
-    try:
-        async with aiofiles.open(config.CACHE_FILE_PATH, mode='r', encoding='utf-8') as f:
-            content = await f.read()
-            loaded_data = json.loads(content)
-            _cached_data = loaded_data
-
-            last_updated_str = _cached_data.get("last_updated")
-            if last_updated_str and isinstance(last_updated_str, str):
-                _cached_data["last_updated"] = datetime.fromisoformat(last_updated_str)
-
-            logging.info(
-                f"Кэш успешно загружен. Вакансий: {len(get_cached_vacancies())}. Последнее обновление: {_cached_data.get('last_updated')}")
-    except FileNotFoundError:
-        logging.warning(f"Файл кэша {config.CACHE_FILE_PATH} не найден. Инициализирован пустой кэш.")
-        _cached_data = {"vacancies": [], "coworkers": {}, "last_updated": None}
-    except Exception:
-        logging.error(f"Ошибка при чтении или парсинге кэша {config.CACHE_FILE_PATH}. Кэш сброшен.")
-        _cached_data = {"vacancies": [], "coworkers": {}, "last_updated": None}
+    _accounts_token = coordination.file_token(config.ACCOUNTS_FILE_PATH)
+    accounts.load_accounts()
+    await _ensure_partitions(accounts.get_account_ids() or [None])
+
+
+async def _sync_from_storage(partition: _AccountCache) -> bool:
+    # Вызывается под блокировками раздела: подхватывает то, что записали другие воркеры
+    if partition.storage.get_change_token() == partition.storage_token:
+        return False
+    await _load_partition(partition)
+    return True
+
+
+async def reload_if_changed() -> None:
+    global _accounts_token
+    accounts_token = coordination.file_token(config.ACCOUNTS_FILE_PATH)
+    if accounts_token != _accounts_token:
+        _accounts_token = accounts_token
+        accounts.load_accounts()
+        await _ensure_partitions(accounts.get_account_ids() or [None])
+
+    for partition in list(_partitions.values()):
+        if not partition.is_loaded or partition.storage.get_change_token() == partition.storage_token:
+            continue
+        async with partition.cache_lock:
+            if await _sync_from_storage(partition):
+                logging.info(f"Кэш аккаунта {partition.account_id} изменен другим процессом и перечитан.")
+
+
+def set_remote_updating(account_ids: Collection[Optional[int]]) -> None:
+    _remote_updating.clear()
+    _remote_updating.update(account_ids)
+
 
+def _observe_save(partition: _AccountCache, operation: str, started: float) -> None:
+    metrics.CACHE_SAVE_DURATION.labels(config.CACHE_BACKEND, operation).observe(time.perf_counter() - started)
+    metrics.CACHE_SIZE.labels(config.CACHE_BACKEND).set(
+        sum(cache.storage.get_size_bytes() for cache in list(_partitions.values()))
+    )
 
-async def _save_cache_internal() -> None:
+
+async def _save_cache_internal(partition: _AccountCache) -> None:
     if not config.CACHE_FILE_PATH:
         logging.error("CACHE_FILE_PATH не определен. Кэш не будет сохранен.")
         return
 
     try:
-        import os
-        cache_dir = os.path.dirname(config.CACHE_FILE_PATH)
-        if cache_dir:
-            os.makedirs(cache_dir, exist_ok=True)
+        started = time.perf_counter()
+        await partition.storage.save_snapshot(_current_data(partition))
+        partition.storage_token = partition.storage.get_change_token()
+        _observe_save(partition, "snapshot", started)
+        logging.info(f"Кэш аккаунта {partition.account_id} успешно сохранен ({config.CACHE_BACKEND}).")
     except Exception as e:
-        logging.error(f"Не удалось создать директорию для кэша {cache_dir}: {e}")
-        return
+        logging.error(f"Ошибка при сохранении кэша: {e}", exc_info=True)
 
-    data_to_save = _cached_data.copy()
-    if isinstance(data_to_save.get("last_updated"), datetime):
-        data_to_save["last_updated"] = data_to_save["last_updated"].isoformat()
 
+async def _save_comment_internal(partition: _AccountCache, vacancy_name: str, comment: str) -> None:
     try:
-        async with aiofiles.open(config.CACHE_FILE_PATH, mode='w', encoding='utf-8') as f:
-            await f.write(json.dumps(data_to_save, ensure_ascii=False, indent=4))
-        logging.info(f"Кэш успешно сохранен в {config.CACHE_FILE_PATH}.")
+        started = time.perf_counter()
+        await partition.storage.save_comment(
+            _current_meta(partition), vacancy_name, comment, lambda: _current_data(partition)
+        )
+        partition.storage_token = partition.storage.get_change_token()
+        _observe_save(partition, "comment", started)
     except Exception as e:
-        logging.error(f"Ошибка при сохранении кэша: {e}", exc_info=True)
+        logging.error(f"Ошибка при сохранении комментария: {e}", exc_info=True)
 
 
-async def update_cached_data() -> None:
-    global _is_updating
-    if _update_lock.locked():
-        logging.info("Попытка запуска обновления, когда оно уже выполняется. Пропуск.")
+def _on_vacancy_row(account_id: Optional[int], row: Mapping[str, Any]) -> None:
+    partition = _partitions.get(accounts.resolve_account_id(account_id))
+    if partition is None or not partition.is_updating or row.get(VACANCY_ID_KEY) is None:
         return
+    # Строка из контрольной точки прежнего запуска сохраняет время своего расчета
+    updated_at = row.get(UPDATED_AT_KEY) or datetime.now(timezone.utc).isoformat()
+    partition.run_rows[row[VACANCY_ID_KEY]] = {**row, UPDATED_AT_KEY: updated_at}
+    partition.live_dirty = True
+
+
+progress.add_row_listener(_on_vacancy_row)
+
+
+def _merge_live_rows(partition: _AccountCache) -> None:
+    current = partition.snapshot
+    pending = dict(partition.run_rows)
+    merged_rows = [pending.pop(row.get(VACANCY_ID_KEY), row) for row in current.vacancies]
+    merged_rows.extend(pending.values())
+    new_snapshot = build_snapshot(
+        current.version + 1, merged_rows, current.coworkers, current.last_updated,
+        report_generator.FUNNEL_STAGES_ORDER, is_complete=False
+    )
+    _publish(partition, new_snapshot, partition.comments)
+    partition.live_dirty = False
+    partition.live_version = new_snapshot.version
+
 
-    async with _update_lock:
-        _is_updating = True
-        logging.info(">>> Начало процесса обновления данных...")
+async def _publish_live_rows(partition: _AccountCache, force_save: bool = False) -> None:
+    # Снимок мог быть перечитан с диска после записи комментария другим воркером: тогда строки публикуются заново
+    if not partition.run_rows or (not partition.live_dirty and partition.snapshot.version == partition.live_version):
+        return
+    try:
+        async with partition.cache_lock:
+            if force_save or time.monotonic() - partition.live_saved_at >= config.LIVE_SAVE_SECONDS:
+                async with coordination.file_lock(partition.lock_path):
+                    await _sync_from_storage(partition)
+                    _merge_live_rows(partition)
+                    await _save_cache_internal(partition)
+                partition.live_saved_at = time.monotonic()
+            else:
+                _merge_live_rows(partition)
+    except Exception as e:
+        logging.error(f"Ошибка при публикации готовых строк аккаунта {partition.account_id}: {e}", exc_info=True)
+
+
+async def _live_publisher(partition: _AccountCache, stop: asyncio.Event) -> None:
+    while True:
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=config.LIVE_PUBLISH_SECONDS)
+            return
+        except asyncio.TimeoutError:
+            await _publish_live_rows(partition)
+
+
+async def _update_account(partition: _AccountCache, bypass_http_cache: bool) -> bool:
+    if partition.update_lock.locked():
+        logging.info(f"Обновление аккаунта {partition.account_id} уже выполняется. Пропуск.")
+        return False
+
+    async with partition.update_lock:
+        partition.is_updating = True
+        partition.run_rows = {}
+        is_success = False
+        progress.start_run(_effective_last_updated(partition), partition.account_id)
+        logging.info(f">>> Начало процесса обновления данных аккаунта {partition.account_id}...")
+        stop_live = asyncio.Event()
+        live_task = asyncio.create_task(_live_publisher(partition, stop_live))
         try:
-            fetched_data = await report_generator.generate_recruitment_funnel_report()
+            fetched_data = None
+            try:
+                for attempt in range(config.REFRESH_RUN_RETRIES + 1):
+                    fetched_data = await refresh_worker.generate_report(bypass_http_cache, partition.account_id)
+                    if fetched_data is not None or attempt == config.REFRESH_RUN_RETRIES:
+                        break
+                    delay = config.REFRESH_RETRY_BACKOFF_SECONDS * 2 ** attempt
+                    logging.warning(
+                        f"Обновление аккаунта {partition.account_id} не завершено. Повтор через {delay} с "
+                        f"с продолжением от контрольной точки (попытка {attempt + 2} из {config.REFRESH_RUN_RETRIES + 1}).")
+                    await asyncio.sleep(delay)
+            finally:
+                stop_live.set()
+                await live_task
+            if fetched_data is None:
+                # Готовые строки неудачного запуска остаются в отчете, снимок помечен как неполный
+                await _publish_live_rows(partition, force_save=True)
 
             if fetched_data is not None:
-                existing_comments = {
-                    row.get('название вакансии'): row.get('комментарий', '')
-                    for row in _cached_data.get("vacancies", []) if row.get('название вакансии')
-                }
-                new_vacancies = fetched_data.get("vacancies", [])
-                for row in new_vacancies:
-                    vacancy_name = row.get('название вакансии')
-                    row['комментарий'] = existing_comments.get(vacancy_name, "")
-
-                _cached_data["vacancies"] = new_vacancies
-                _cached_data["coworkers"] = fetched_data.get("coworkers", {})
-                _cached_data["last_updated"] = datetime.now(timezone.utc)
-
-                await _save_cache_internal()
-                logging.info("Кэшированные данные успешно обновлены и сохранены.")
+                progress.set_phase(progress.PHASE_SAVING, account_id=partition.account_id)
+                async with partition.cache_lock, coordination.file_lock(partition.lock_path):
+                    # Комментарии, сохраненные другими воркерами во время обновления, не должны потеряться
+                    await _sync_from_storage(partition)
+                    finished_at = datetime.now(timezone.utc)
+                    # Строки, уже опубликованные по ходу запуска, сохраняют свое время расчета
+                    rows = [
+                        {**row, UPDATED_AT_KEY: partition.run_rows.get(row.get(VACANCY_ID_KEY), row).get(
+                            UPDATED_AT_KEY) or finished_at.isoformat()}
+                        for row in fetched_data.get("vacancies", [])
+                    ]
+                    new_snapshot = build_snapshot(
+                        partition.snapshot.version + 1, rows,
+                        fetched_data.get("coworkers", {}), finished_at,
+                        report_generator.FUNNEL_STAGES_ORDER
+                    )
+                    kept_comments = {
+                        name: comment for name, comment in partition.comments.items() if name in new_snapshot.by_name
+                    }
+                    _publish(partition, new_snapshot, kept_comments)
+                    await _save_cache_internal(partition)
+                is_success = True
+                logging.info(
+                    f"Кэшированные данные аккаунта {partition.account_id} успешно обновлены и сохранены. "
+                    f"Версия снимка: {new_snapshot.version}.")
             else:
-                logging.warning("Сборщик данных вернул None, кэш не будет обновлен.")
+                logging.warning(f"Сборщик данных вернул None, кэш аккаунта {partition.account_id} не будет обновлен.")
         except Exception as e:
             import traceback
-            logging.error(f"КРИТИЧЕСКАЯ ОШИБКА во время обновления кэша: {e}")
+            logging.error(f"КРИТИЧЕСКАЯ ОШИБКА во время обновления кэша аккаунта {partition.account_id}: {e}")
             logging.error(traceback.format_exc())
         finally:
-            _is_updating = False
-            logging.info("<<< Процесс обновления данных завершен.")
-
-
-async def update_comment(vacancy_name: str, comment: str) -> bool:
-    found = False
-    async with _cache_lock:
-        for row in _cached_data.get("vacancies", []):
-            if row.get("название вакансии") == vacancy_name:
-                row["комментарий"] = comment
-                found = True
-                break
+            partition.is_updating = False
+            partition.run_rows = {}
+            progress.finish_run(is_success, _effective_last_updated(partition), partition.account_id)
+            logging.info(f"<<< Процесс обновления данных аккаунта {partition.account_id} завершен.")
+        return is_success
+
+
+async def update_cached_data(bypass_http_cache: bool = False, account_id: Optional[int] = None) -> None:
+    if account_id is not None:
+        await _ensure_partitions([account_id])
+        await _update_account(_partition(account_id), bypass_http_cache)
+        return
+
+    account_list = await refresh_worker.discover_accounts(bypass_http_cache)
+    if account_list is None:
+        logging.warning("Не удалось получить список аккаунтов Huntflow, обновление пропущено.")
+        return
+    account_ids = [account["id"] for account in account_list]
+    await _ensure_partitions(account_ids)
+    # Аккаунты обновляются параллельно и делят общий лимит запросов к Huntflow
+    await asyncio.gather(*(_update_account(_partition(account_id), bypass_http_cache) for account_id in account_ids))
+
+
+def resolve_vacancies(
+    vacancy_ids: Optional[Collection[int]] = None,
+    recruiter_id: Optional[int] = None,
+    account_id: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+    snapshot = _partition(account_id).snapshot
+    requested_ids = list(dict.fromkeys(vacancy_ids or []))
+    if recruiter_id is not None:
+        requested_ids.extend(
+            snapshot.vacancies[position][VACANCY_ID_KEY]
+            for position in snapshot.by_member.get(recruiter_id, ())
+            if snapshot.vacancies[position][VACANCY_ID_KEY] not in requested_ids
+        )
+    found = []
+    missing = []
+    for vacancy_id in requested_ids:
+        row = snapshot.find_by_id(vacancy_id)
+        if row is None:
+            missing.append(vacancy_id)
+        else:
+            found.append({"id": vacancy_id, "position": row.get(VACANCY_NAME_KEY)})
+    return found, missing
+
+
+async def refresh_vacancies(
+    vacancies: List[Dict[str, Any]],
+    bypass_http_cache: bool = False,
+    account_id: Optional[int] = None
+) -> Optional[List[Dict[str, Any]]]:
+    partition = _partition(account_id)
+    vacancy_ids = {vacancy["id"] for vacancy in vacancies}
+    busy_ids = vacancy_ids & partition.targeted_in_flight
+    vacancies = [vacancy for vacancy in vacancies if vacancy["id"] not in busy_ids]
+    if busy_ids:
+        logging.info(f"Вакансии {sorted(busy_ids)} уже обновляются, пропускаю их.")
+    if not vacancies:
+        return []
+
+    partition.targeted_in_flight.update(vacancy["id"] for vacancy in vacancies)
+    try:
+        logging.info(f">>> Точечное обновление вакансий: {[vacancy['id'] for vacancy in vacancies]}")
+        rows = await refresh_worker.generate_vacancy_rows(vacancies, bypass_http_cache, partition.account_id)
+        if rows is None:
+            return None
+
+        refreshed_at = datetime.now(timezone.utc).isoformat()
+        rows = [{**row, UPDATED_AT_KEY: refreshed_at} for row in rows]
+        refreshed = {row[VACANCY_ID_KEY]: row for row in rows}
+        async with partition.cache_lock, coordination.file_lock(partition.lock_path):
+            # Сливаем с последним опубликованным снимком: за время запроса мог завершиться полный запуск
+            await _sync_from_storage(partition)
+            current = partition.snapshot
+            merged_rows = [refreshed.get(row.get(VACANCY_ID_KEY), row) for row in current.vacancies]
+            new_snapshot = build_snapshot(
+                current.version + 1, merged_rows, current.coworkers, current.last_updated,
+                report_generator.FUNNEL_STAGES_ORDER, current.is_complete
+            )
+            _publish(partition, new_snapshot, dict(partition.comments))
+            await _save_cache_internal(partition)
+        logging.info(f"<<< Точечное обновление завершено. Обновлено строк: {len(rows)}. Версия снимка: {new_snapshot.version}.")
+        return [{**row, COMMENT_KEY: partition.comments.get(row.get(VACANCY_NAME_KEY), "")} for row in rows]
+    finally:
+        partition.targeted_in_flight.difference_update(vacancy["id"] for vacancy in vacancies)
+
+
+async def update_comment(vacancy_name: str, comment: str, account_id: Optional[int] = None) -> bool:
+    partition = _partition(account_id)
+    async with partition.cache_lock, coordination.file_lock(partition.lock_path):
+        # JSON-кэш перезаписывается целиком, поэтому сначала подхватываем изменения других воркеров
+        await _sync_from_storage(partition)
+        found = vacancy_name in partition.snapshot.by_name
         if found:
-            _cached_data["last_updated"] = datetime.now(timezone.utc)
-            await _save_cache_internal()
+            partition.comments[vacancy_name] = comment
+            partition.comment_revision += 1
+            partition.comments_updated_at = datetime.now(timezone.utc)
+            await _save_comment_internal(partition, vacancy_name, comment)
             logging.info(f"Комментарий для '{vacancy_name}' обновлен в кэше.")
     if not found:
         logging.warning(f"Попытка обновить комментарий для несуществующей вакансии: '{vacancy_name}'")
     return found
 
 
-def get_last_updated_time_msk() -> Optional[datetime]:
-    last_updated = _cached_data.get("last_updated")
+def _effective_last_updated(partition: _AccountCache) -> Optional[datetime]:
+    candidates = [
+        value for value in (partition.snapshot.last_updated, partition.comments_updated_at)
+        if isinstance(value, datetime)
+    ]
+    return max(candidates) if candidates else None
+
+
+def get_last_updated_time_msk(account_id: Optional[int] = None) -> Optional[datetime]:
+    last_updated = _effective_last_updated(_partition(account_id))
     if isinstance(last_updated, datetime):
         return last_updated.astimezone(timezone(timedelta(hours=3)))
     return None
 
-def get_update_status() -> bool:
-    return _is_updating
+def get_update_status(account_id: Optional[int] = None) -> bool:
+    if account_id is None:
+        return bool(_remote_updating) or any(partition.is_updating for partition in _partitions.values())
+    account_id = accounts.resolve_account_id(account_id)
+    return account_id in _remote_updating or _partition(account_id).is_updating
+
+
+def get_updating_account_ids() -> List[Optional[int]]:
+    return [account_id for account_id, partition in _partitions.items() if partition.is_updating]
+
+def get_snapshot(account_id: Optional[int] = None) -> ReportSnapshot:
+    return _partition(account_id).snapshot
+
+
+def get_cache_version(account_id: Optional[int] = None) -> Tuple[int, int]:
+    partition = _partition(account_id)
+    return partition.snapshot.version, partition.comment_revision
+
+
+def get_comment(vacancy_name: str, account_id: Optional[int] = None) -> str:
+    return _partition(account_id).comments.get(vacancy_name, "")
+
+
+def get_cached_vacancies(account_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    partition = _partition(account_id)
+    view_key = (partition.snapshot.version, partition.comment_revision)
+    if partition.merged_view[0] != view_key:
+        partition.merged_view = (view_key, merge_comments(partition.snapshot, partition.comments))
+    return partition.merged_view[1]
+
 
-def get_cached_vacancies() -> List[Dict[str, Any]]:
-    return _cached_data.get("vacancies", [])
+def query_vacancies(
+    recruiter_ids: Optional[Collection[int]] = None,
+    priority_only: bool = False,
+    vacancy_names: Optional[Collection[str]] = None,
+    search: Optional[str] = None,
+    sort: Optional[str] = None,
+    descending: bool = False,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    account_id: Optional[int] = None
+) -> Tuple[int, List[Dict[str, Any]]]:
+    partition = _partition(account_id)
+    snapshot, comments = partition.snapshot, partition.comments
+    positions = query_positions(snapshot, recruiter_ids, priority_only, vacancy_names, search, sort, descending)
+    page = positions[offset:offset + limit if limit is not None else None]
+    rows = []
+    for position in page:
+        row = snapshot.vacancies[position]
+        rows.append({**row, COMMENT_KEY: comments.get(row.get(VACANCY_NAME_KEY), "")})
+    return len(positions), rows
 
 
-def get_cached_coworkers() -> Dict[int, str]:
-    return _cached_data.get("coworkers", {})
\ No newline at end of file
+def get_cached_coworkers(account_id: Optional[int] = None) -> Dict[int, str]:
+    return _partition(account_id).snapshot.coworkers
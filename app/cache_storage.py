@@ -0,0 +1,411 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import struct
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import aiofiles
+from . import accounts, config
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+VACANCY_NAME_KEY = "название вакансии"
+COMMENT_KEY = "комментарий"
+
+
+def _ensure_parent_dir(path: str) -> None:
+    parent_dir = os.path.dirname(path)
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+
+
+def _serialize_last_updated(value: Any) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _parse_last_updated(value: Any) -> Optional[datetime]:
+    if value and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+class CacheStorage(ABC):
+    @abstractmethod
+    async def load(self) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def save_snapshot(self, data: Dict[str, Any]) -> None:
+        pass
+
+    # meta: только version, last_updated и is_complete; полный снимок строится через
+    # get_snapshot лишь тем хранилищам, которым без него не сохранить комментарий
+    @abstractmethod
+    async def save_comment(self, meta: Dict[str, Any], vacancy_name: str, comment: str,
+                           get_snapshot: Callable[[], Dict[str, Any]]) -> None:
+        pass
+
+    @abstractmethod
+    def get_size_bytes(self) -> int:
+        pass
+
+    @abstractmethod
+    def get_change_token(self) -> Tuple:
+        pass
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _file_token(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class JsonFileCacheStorage(CacheStorage):
+    def __init__(self, path: str):
+        self._path = path
+
+    async def load(self) -> Optional[Dict[str, Any]]:
+        try:
+            async with aiofiles.open(self._path, mode='r', encoding='utf-8') as f:
+                content = await f.read()
+        except FileNotFoundError:
+            return None
+        loaded_data = await asyncio.to_thread(json.loads, content)
+        loaded_data["last_updated"] = _parse_last_updated(loaded_data.get("last_updated"))
+        return loaded_data
+
+    async def save_snapshot(self, data: Dict[str, Any]) -> None:
+        _ensure_parent_dir(self._path)
+        data_to_save = data.copy()
+        data_to_save["last_updated"] = _serialize_last_updated(data_to_save.get("last_updated"))
+
+        # Сериализация большого снимка выполняется вне цикла событий и без отступов (быстрый C-кодировщик)
+        content = await asyncio.to_thread(json.dumps, data_to_save, ensure_ascii=False)
+        tmp_path = f"{self._path}.tmp"
+        async with aiofiles.open(tmp_path, mode='w', encoding='utf-8') as f:
+            await f.write(content)
+        os.replace(tmp_path, self._path)
+
+    async def save_comment(self, meta: Dict[str, Any], vacancy_name: str, comment: str,
+                           get_snapshot: Callable[[], Dict[str, Any]]) -> None:
+        await self.save_snapshot(get_snapshot())
+
+    def get_size_bytes(self) -> int:
+        return _file_size(self._path)
+
+    def get_change_token(self) -> Tuple:
+        return (_file_token(self._path),)
+
+
+class SqliteCacheStorage(CacheStorage):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS vacancies (
+            position INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            row_json TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS vacancies_name_idx ON vacancies (name);
+        CREATE TABLE IF NOT EXISTS comments (vacancy_name TEXT PRIMARY KEY, comment TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS coworkers (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+    """
+
+    def __init__(self, db_path: str, legacy_json_path: Optional[str] = None):
+        self._db_path = db_path
+        self._legacy_json_path = legacy_json_path
+        self._is_initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self._db_path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        if not self._is_initialized:
+            connection.executescript(self.SCHEMA)
+            self._is_initialized = True
+        return connection
+
+    def _load_sync(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self._db_path):
+            return None
+        connection = self._connect()
+        try:
+            meta = dict(connection.execute("SELECT key, value FROM meta").fetchall())
+            if "snapshot_saved_at" not in meta:
+                return None
+            comments = dict(connection.execute("SELECT vacancy_name, comment FROM comments").fetchall())
+            vacancies = []
+            for name, row_json in connection.execute("SELECT name, row_json FROM vacancies ORDER BY position"):
+                row = json.loads(row_json)
+                row[COMMENT_KEY] = comments.get(name, "")
+                vacancies.append(row)
+            coworkers = {str(cid): name for cid, name in connection.execute("SELECT id, name FROM coworkers")}
+        finally:
+            connection.close()
+        return {
+            "vacancies": vacancies,
+            "coworkers": coworkers,
+            "last_updated": _parse_last_updated(meta.get("last_updated")),
+            "version": int(meta.get("version") or 0),
+            "is_complete": meta.get("is_complete", True) not in (False, "0"),
+        }
+
+    def _save_snapshot_sync(self, data: Dict[str, Any]) -> None:
+        _ensure_parent_dir(self._db_path)
+        vacancies = data.get("vacancies", [])
+        vacancy_rows = []
+        comment_rows = []
+        for position, row in enumerate(vacancies):
+            name = row.get(VACANCY_NAME_KEY)
+            row_without_comment = {key: value for key, value in row.items() if key != COMMENT_KEY}
+            vacancy_rows.append((position, name, json.dumps(row_without_comment, ensure_ascii=False)))
+            if name and row.get(COMMENT_KEY):
+                comment_rows.append((name, row[COMMENT_KEY]))
+
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM vacancies")
+                connection.executemany("INSERT INTO vacancies (position, name, row_json) VALUES (?, ?, ?)", vacancy_rows)
+                connection.execute("DELETE FROM comments")
+                connection.executemany("INSERT OR REPLACE INTO comments (vacancy_name, comment) VALUES (?, ?)", comment_rows)
+                connection.execute("DELETE FROM coworkers")
+                connection.executemany(
+                    "INSERT OR REPLACE INTO coworkers (id, name) VALUES (?, ?)",
+                    [(int(cid), name) for cid, name in data.get("coworkers", {}).items()]
+                )
+                self._write_meta(connection, data)
+                connection.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('snapshot_saved_at', ?)",
+                    (datetime.now().isoformat(),)
+                )
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _write_meta(connection: sqlite3.Connection, data: Dict[str, Any]) -> None:
+        connection.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [
+                ("last_updated", _serialize_last_updated(data.get("last_updated"))),
+                ("version", str(data.get("version") or 0)),
+                ("is_complete", "1" if data.get("is_complete", True) else "0"),
+            ]
+        )
+
+    def _save_comment_sync(self, meta: Dict[str, Any], vacancy_name: str, comment: str) -> None:
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT INTO comments (vacancy_name, comment) VALUES (?, ?) "
+                    "ON CONFLICT(vacancy_name) DO UPDATE SET comment = excluded.comment",
+                    (vacancy_name, comment)
+                )
+                self._write_meta(connection, meta)
+        finally:
+            connection.close()
+
+    async def load(self) -> Optional[Dict[str, Any]]:
+        data = await asyncio.to_thread(self._load_sync)
+        if data is None and self._legacy_json_path and os.path.exists(self._legacy_json_path):
+            logging.info(f"База кэша {self._db_path} пуста. Импортирую данные из {self._legacy_json_path}...")
+            data = await JsonFileCacheStorage(self._legacy_json_path).load()
+            if data is not None:
+                await self.save_snapshot(data)
+        return data
+
+    async def save_snapshot(self, data: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._save_snapshot_sync, data)
+
+    async def save_comment(self, meta: Dict[str, Any], vacancy_name: str, comment: str,
+                           get_snapshot: Callable[[], Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self._save_comment_sync, meta, vacancy_name, comment)
+
+    def get_size_bytes(self) -> int:
+        return _file_size(self._db_path) + _file_size(f"{self._db_path}-wal")
+
+    def get_change_token(self) -> Tuple:
+        # Запись другим процессом меняет основной файл или WAL
+        return _file_token(self._db_path), _file_token(f"{self._db_path}-wal")
+
+
+class BinaryCacheStorage(CacheStorage):
+    # Файл: сигнатура, кодек (msgpack или компактный JSON) и записи «тип (1 байт) + длина (4 байта) + данные».
+    # Комментарии дописываются в конец файла, целиком файл перезаписывается только при сохранении снимка
+    MAGIC = b"HRCACHE1"
+    RECORD_HEADER = struct.Struct(">BI")
+    RECORD_META = 1
+    RECORD_COWORKERS = 2
+    RECORD_VACANCY = 3
+    RECORD_COMMENT = 4
+    CODEC_JSON = b"j"
+    CODEC_MSGPACK = b"m"
+
+    def __init__(self, path: str, legacy_json_path: Optional[str] = None):
+        self._path = path
+        self._legacy_json_path = legacy_json_path
+
+    @classmethod
+    def _encode(cls, codec: bytes, value: Any) -> bytes:
+        if codec == cls.CODEC_MSGPACK:
+            return msgpack.packb(value, use_bin_type=True)
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def _decode(cls, codec: bytes, payload: bytes) -> Any:
+        if codec == cls.CODEC_MSGPACK:
+            if msgpack is None:
+                raise RuntimeError("Кэш сохранен в формате msgpack, но пакет msgpack не установлен.")
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        return json.loads(payload)
+
+    @classmethod
+    def _record(cls, codec: bytes, kind: int, value: Any) -> bytes:
+        payload = cls._encode(codec, value)
+        return cls.RECORD_HEADER.pack(kind, len(payload)) + payload
+
+    @staticmethod
+    def _meta(data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "version": data.get("version") or 0,
+            "last_updated": _serialize_last_updated(data.get("last_updated")),
+            "is_complete": data.get("is_complete", True),
+        }
+
+    def _load_sync(self) -> Optional[Dict[str, Any]]:
+        # Снимок строится по всем строкам сразу, поэтому файл читается целиком одним вызовом
+        try:
+            with open(self._path, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        if len(content) <= len(self.MAGIC):
+            return None
+        if content[:len(self.MAGIC)] != self.MAGIC:
+            raise ValueError(f"Файл {self._path} не является кэшем отчета.")
+        codec = content[len(self.MAGIC):len(self.MAGIC) + 1]
+        offset = len(self.MAGIC) + 1
+        meta: Dict[str, Any] = {}
+        coworkers: List[List[Any]] = []
+        vacancies: List[Dict[str, Any]] = []
+        comments: Dict[str, str] = {}
+        while offset + self.RECORD_HEADER.size <= len(content):
+            kind, length = self.RECORD_HEADER.unpack_from(content, offset)
+            start = offset + self.RECORD_HEADER.size
+            if start + length > len(content):
+                # Запись, недописанная из-за сбоя, отбрасывается
+                logging.warning(f"Кэш {self._path} обрезан: последняя запись пропущена.")
+                break
+            value = self._decode(codec, content[start:start + length])
+            offset = start + length
+            if kind == self.RECORD_META:
+                meta.update(value)
+            elif kind == self.RECORD_COWORKERS:
+                coworkers = value
+            elif kind == self.RECORD_VACANCY:
+                vacancies.append(value)
+            elif kind == self.RECORD_COMMENT:
+                comments[value[0]] = value[1]
+
+        for row in vacancies:
+            row[COMMENT_KEY] = comments.get(row.get(VACANCY_NAME_KEY), "")
+        return {
+            "vacancies": vacancies,
+            "coworkers": {str(cid): name for cid, name in coworkers},
+            "last_updated": _parse_last_updated(meta.get("last_updated")),
+            "version": int(meta.get("version") or 0),
+            "is_complete": meta.get("is_complete", True) not in (False, "0"),
+        }
+
+    def _save_snapshot_sync(self, data: Dict[str, Any]) -> None:
+        _ensure_parent_dir(self._path)
+        codec = self.CODEC_MSGPACK if msgpack is not None else self.CODEC_JSON
+        chunks = [self.MAGIC, codec, self._record(codec, self.RECORD_META, self._meta(data))]
+        chunks.append(self._record(
+            codec, self.RECORD_COWORKERS, [[int(cid), name] for cid, name in data.get("coworkers", {}).items()]
+        ))
+        comments = []
+        for row in data.get("vacancies", []):
+            chunks.append(self._record(
+                codec, self.RECORD_VACANCY, {key: value for key, value in row.items() if key != COMMENT_KEY}
+            ))
+            if row.get(VACANCY_NAME_KEY) and row.get(COMMENT_KEY):
+                comments.append([row[VACANCY_NAME_KEY], row[COMMENT_KEY]])
+        chunks.extend(self._record(codec, self.RECORD_COMMENT, comment) for comment in comments)
+
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(chunks))
+        os.replace(tmp_path, self._path)
+
+    def _append_comment_sync(self, meta: Dict[str, Any], vacancy_name: str, comment: str) -> bool:
+        try:
+            with open(self._path, "rb") as f:
+                header = f.read(len(self.MAGIC) + 1)
+        except FileNotFoundError:
+            header = b""
+        if header[:len(self.MAGIC)] != self.MAGIC:
+            return False
+        codec = header[len(self.MAGIC):]
+        with open(self._path, "ab") as f:
+            f.write(
+                self._record(codec, self.RECORD_COMMENT, [vacancy_name, comment])
+                + self._record(codec, self.RECORD_META, self._meta(meta))
+            )
+        return True
+
+    async def load(self) -> Optional[Dict[str, Any]]:
+        data = await asyncio.to_thread(self._load_sync)
+        if data is None and self._legacy_json_path and os.path.exists(self._legacy_json_path):
+            logging.info(f"Бинарный кэш {self._path} не найден. Импортирую данные из {self._legacy_json_path}...")
+            data = await JsonFileCacheStorage(self._legacy_json_path).load()
+            if data is not None:
+                await self.save_snapshot(data)
+        return data
+
+    async def save_snapshot(self, data: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._save_snapshot_sync, data)
+
+    async def save_comment(self, meta: Dict[str, Any], vacancy_name: str, comment: str,
+                           get_snapshot: Callable[[], Dict[str, Any]]) -> None:
+        if not await asyncio.to_thread(self._append_comment_sync, meta, vacancy_name, comment):
+            # Файла еще нет или он в старом формате: записываем полный снимок
+            await self.save_snapshot(get_snapshot())
+
+    def get_size_bytes(self) -> int:
+        return _file_size(self._path)
+
+    def get_change_token(self) -> Tuple:
+        return (_file_token(self._path),)
+
+
+def create_cache_storage(account_id: Optional[int] = None) -> CacheStorage:
+    cache_file_path = accounts.partition_path(config.CACHE_FILE_PATH, account_id)
+    if config.CACHE_BACKEND == "sqlite":
+        return SqliteCacheStorage(
+            accounts.partition_path(config.CACHE_DB_PATH, account_id), legacy_json_path=cache_file_path
+        )
+    if config.CACHE_BACKEND == "binary":
+        return BinaryCacheStorage(
+            accounts.partition_path(config.CACHE_BINARY_PATH, account_id), legacy_json_path=cache_file_path
+        )
+    return JsonFileCacheStorage(cache_file_path)
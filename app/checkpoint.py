@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import aiofiles
+from . import accounts, config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+RUN_FILE = "run.json"
+ROWS_FILE = "rows.jsonl"
+
+
+class RefreshCheckpoint:
+    def __init__(self, run_id: str, path: str, week_start: str, rows: Dict[int, Dict[str, Any]], attempt: int):
+        self.run_id = run_id
+        self.path = path
+        self.week_start = week_start
+        self.rows = rows
+        self.attempt = attempt
+        self.failed: List[int] = []
+        self._write_lock = asyncio.Lock()
+
+    async def save_row(self, row: Dict[str, Any]) -> None:
+        # Время расчета сохраняется вместе со строкой: продолживший запуск не выдаст ее за свежую
+        row = {**row, "updated_at": datetime.now(timezone.utc).isoformat()}
+        line = json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n"
+        async with self._write_lock:
+            async with aiofiles.open(os.path.join(self.path, ROWS_FILE), mode='a', encoding='utf-8') as f:
+                await f.write(line)
+        self.rows[row["id"]] = row
+
+    async def save_state(self) -> None:
+        state = {
+            "run_id": self.run_id,
+            "week_start": self.week_start,
+            "attempt": self.attempt,
+            "failed_vacancies": self.failed,
+            "updated_at": datetime.now().isoformat(),
+        }
+        tmp_path = os.path.join(self.path, f"{RUN_FILE}.tmp")
+        async with aiofiles.open(tmp_path, mode='w', encoding='utf-8') as f:
+            await f.write(json.dumps(state, ensure_ascii=False))
+        os.replace(tmp_path, os.path.join(self.path, RUN_FILE))
+
+    def complete(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+        logging.info(f"Запуск {self.run_id} завершен, контрольная точка удалена.")
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _read_rows(path: str) -> Dict[int, Dict[str, Any]]:
+    rows = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # Последняя строка могла быть записана не полностью при аварийной остановке
+                    continue
+                rows[row["id"]] = row
+    except FileNotFoundError:
+        pass
+    return rows
+
+
+def _find_resumable(week_start: str, resume: bool) -> Optional[RefreshCheckpoint]:
+    base_dir = accounts.current_partition_path(config.CHECKPOINT_DIR)
+    if not os.path.isdir(base_dir):
+        return None
+
+    resumable = None
+    max_age = config.CHECKPOINT_MAX_AGE_HOURS * 3600
+    for entry in sorted(os.scandir(base_dir), key=lambda e: e.stat().st_mtime, reverse=True):
+        if not entry.is_dir():
+            continue
+        state = _read_json(os.path.join(entry.path, RUN_FILE))
+        is_stale = time.time() - entry.stat().st_mtime > max_age
+        if resume and resumable is None and state and state.get("week_start") == week_start and not is_stale:
+            resumable = RefreshCheckpoint(
+                state["run_id"], entry.path, week_start,
+                _read_rows(os.path.join(entry.path, ROWS_FILE)), int(state.get("attempt", 1)) + 1
+            )
+            continue
+        # Контрольные точки других отчетных недель, слишком старые запуски и все запуски при resume=False
+        # продолжать нельзя
+        shutil.rmtree(entry.path, ignore_errors=True)
+    return resumable
+
+
+async def open_checkpoint(week_start: datetime, resume: bool = True) -> RefreshCheckpoint:
+    week_key = week_start.isoformat()
+    checkpoint = await asyncio.to_thread(_find_resumable, week_key, resume)
+    if checkpoint is not None:
+        logging.info(
+            f"Продолжаю запуск {checkpoint.run_id} (попытка {checkpoint.attempt}): "
+            f"готово вакансий по контрольной точке: {len(checkpoint.rows)}.")
+    else:
+        run_id = f"{week_start:%Y%m%d}-{uuid.uuid4().hex[:8]}"
+        path = os.path.join(accounts.current_partition_path(config.CHECKPOINT_DIR), run_id)
+        os.makedirs(path, exist_ok=True)
+        checkpoint = RefreshCheckpoint(run_id, path, week_key, {}, 1)
+        logging.info(f"Начат запуск обновления {run_id}.")
+    await checkpoint.save_state()
+    return checkpoint
@@ -3,4 +3,109 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-CACHE_FILE_PATH = os.getenv("CACHE_FILE_PATH", "cache/report_cache.json")
\ No newline at end of file
+HUNTFLOW_BASE_URL = os.getenv("HUNTFLOW_BASE_URL", "https://api.huntflow.ru")
+CACHE_FILE_PATH = os.getenv("CACHE_FILE_PATH", "cache/report_cache.json")
+
+# Пустое значение — отчет по всем аккаунтам, доступным токену; иначе список ID через запятую
+HUNTFLOW_ACCOUNT_IDS = [int(value) for value in os.getenv("HUNTFLOW_ACCOUNT_IDS", "").split(",") if value.strip()]
+ACCOUNTS_FILE_PATH = os.getenv("ACCOUNTS_FILE_PATH", os.path.join(os.path.dirname(CACHE_FILE_PATH), "accounts.json"))
+
+SYNC_STATE_FILE_PATH = os.getenv(
+    "SYNC_STATE_FILE_PATH",
+    os.path.join(os.path.dirname(CACHE_FILE_PATH), "sync_state.json")
+)
+INCREMENTAL_SYNC = os.getenv("INCREMENTAL_SYNC", "true").lower() == "true"
+
+HUNTFLOW_RATE_LIMIT_RPS = float(os.getenv("HUNTFLOW_RATE_LIMIT_RPS", "10"))
+HUNTFLOW_RATE_LIMIT_BURST = int(os.getenv("HUNTFLOW_RATE_LIMIT_BURST", "10"))
+HUNTFLOW_MAX_RETRIES = int(os.getenv("HUNTFLOW_MAX_RETRIES", "5"))
+VACANCY_CONCURRENCY = int(os.getenv("VACANCY_CONCURRENCY", "20"))
+APPLICANT_CONCURRENCY = int(os.getenv("APPLICANT_CONCURRENCY", "20"))
+
+# local — итоги по этапам считаются по уже загруженным логам, verify — дополнительно сверяются с /applicants/search
+FUNNEL_TOTALS_MODE = os.getenv("FUNNEL_TOTALS_MODE", "local").lower()
+
+PAGE_CONCURRENCY = int(os.getenv("PAGE_CONCURRENCY", "5"))
+
+# full — полная история логов кандидата, window — только логи начиная с начала отчетной недели
+LOG_FETCH_MODE = os.getenv("LOG_FETCH_MODE", "full").lower()
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join(os.path.dirname(CACHE_FILE_PATH), "http"))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_MB", "200")) * 1024 * 1024
+HTTP_CACHE_TTLS = {
+    endpoint_class: int(os.getenv(f"HTTP_CACHE_TTL_{endpoint_class.upper()}", default_ttl))
+    for endpoint_class, default_ttl in {
+        "accounts": "3600", "statuses": "86400", "coworkers": "21600", "vacancies": "600",
+        "applicants": "600", "search": "600", "logs": "86400",
+    }.items()
+}
+
+# binary — записи с префиксом длины в CACHE_BINARY_PATH, json — весь кэш в одном файле CACHE_FILE_PATH,
+# sqlite — построчное хранение в CACHE_DB_PATH (WAL)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "binary").lower()
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(os.path.dirname(CACHE_FILE_PATH), "report_cache.db"))
+CACHE_BINARY_PATH = os.getenv("CACHE_BINARY_PATH", os.path.join(os.path.dirname(CACHE_FILE_PATH), "report_cache.bin"))
+
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "1"))
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", os.path.join(os.path.dirname(CACHE_FILE_PATH), "exports"))
+EXPORT_MEMORY_ENTRIES = int(os.getenv("EXPORT_MEMORY_ENTRIES", "4"))
+EXPORT_DISK_ENTRIES = int(os.getenv("EXPORT_DISK_ENTRIES", "10"))
+
+REPORT_API_MAX_PAGE_SIZE = int(os.getenv("REPORT_API_MAX_PAGE_SIZE", "500"))
+# Отрисованные страницы дашборда (по версии снимка, ревизии комментариев и фильтрам) с вариантами gzip/brotli
+PAGE_CACHE_ENTRIES = int(os.getenv("PAGE_CACHE_ENTRIES", "16"))
+
+EVENT_STORE_ENABLED = os.getenv("EVENT_STORE_ENABLED", "true").lower() == "true"
+EVENT_STORE_PATH = os.getenv("EVENT_STORE_PATH", os.path.join(os.path.dirname(CACHE_FILE_PATH), "events.db"))
+TREND_MAX_WEEKS = int(os.getenv("TREND_MAX_WEEKS", "104"))
+
+PROGRESS_QUEUE_SIZE = int(os.getenv("PROGRESS_QUEUE_SIZE", "256"))
+PROGRESS_KEEPALIVE_SECONDS = float(os.getenv("PROGRESS_KEEPALIVE_SECONDS", "15"))
+
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join(os.path.dirname(CACHE_FILE_PATH), "checkpoints"))
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv("CHECKPOINT_MAX_AGE_HOURS", "24"))
+VACANCY_MAX_RETRIES = int(os.getenv("VACANCY_MAX_RETRIES", "3"))
+VACANCY_RETRY_BACKOFF_SECONDS = float(os.getenv("VACANCY_RETRY_BACKOFF_SECONDS", "2"))
+# Готовые строки полного обновления публикуются в кэше с этим интервалом и сохраняются на диск не чаще LIVE_SAVE_SECONDS
+LIVE_PUBLISH_SECONDS = float(os.getenv("LIVE_PUBLISH_SECONDS", "5"))
+LIVE_SAVE_SECONDS = float(os.getenv("LIVE_SAVE_SECONDS", "30"))
+REFRESH_RUN_RETRIES = int(os.getenv("REFRESH_RUN_RETRIES", "2"))
+REFRESH_RETRY_BACKOFF_SECONDS = float(os.getenv("REFRESH_RETRY_BACKOFF_SECONDS", "60"))
+
+HUNTFLOW_HTTP2 = os.getenv("HUNTFLOW_HTTP2", "true").lower() == "true"
+HUNTFLOW_MAX_CONNECTIONS = int(os.getenv("HUNTFLOW_MAX_CONNECTIONS", "40"))
+HUNTFLOW_KEEPALIVE_SECONDS = float(os.getenv("HUNTFLOW_KEEPALIVE_SECONDS", "60"))
+HUNTFLOW_TIMEOUT_SECONDS = float(os.getenv("HUNTFLOW_TIMEOUT_SECONDS", "30"))
+# Токен обновляется заранее, если до истечения осталось меньше этого запаса
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("TOKEN_REFRESH_MARGIN_SECONDS", "600"))
+# После неудачного заблаговременного обновления следующая попытка не раньше чем через эту паузу
+TOKEN_REFRESH_RETRY_SECONDS = int(os.getenv("TOKEN_REFRESH_RETRY_SECONDS", "60"))
+
+# Несколько воркеров uvicorn: обновления выполняет только ведущий процесс (блокировка файла), остальные
+# перечитывают общий кэш при его изменении
+WORKER_COORDINATION = os.getenv("WORKER_COORDINATION", "true").lower() == "true"
+COORDINATION_DIR = os.getenv("COORDINATION_DIR", os.path.join(os.path.dirname(CACHE_FILE_PATH), "coordination"))
+COORDINATION_POLL_SECONDS = float(os.getenv("COORDINATION_POLL_SECONDS", "1"))
+TARGETED_REFRESH_TIMEOUT_SECONDS = float(os.getenv("TARGETED_REFRESH_TIMEOUT_SECONDS", "120"))
+
+# process — сбор данных и расчет воронки в отдельном процессе, inline — в цикле событий веб-сервера
+REFRESH_WORKER = os.getenv("REFRESH_WORKER", "process").lower()
+
+# Планировщик: полное обновление раз в сутки и дневные циклы точечного обновления вакансий
+FULL_REFRESH_HOUR = int(os.getenv("FULL_REFRESH_HOUR", "0"))
+FULL_REFRESH_MINUTE = int(os.getenv("FULL_REFRESH_MINUTE", "0"))
+INTRADAY_REFRESH = os.getenv("INTRADAY_REFRESH", "true").lower() == "true"
+REFRESH_CYCLE_MINUTES = float(os.getenv("REFRESH_CYCLE_MINUTES", "15"))
+REFRESH_CYCLE_JITTER_SECONDS = int(os.getenv("REFRESH_CYCLE_JITTER_SECONDS", "120"))
+# Часы по МСК, в которые выполняются дневные циклы, в виде "начало-конец"
+REFRESH_ACTIVE_HOURS = tuple(int(hour) for hour in os.getenv("REFRESH_ACTIVE_HOURS", "8-21").split("-"))
+PRIORITY_REFRESH_MINUTES = float(os.getenv("PRIORITY_REFRESH_MINUTES", "15"))
+REGULAR_REFRESH_MINUTES = float(os.getenv("REGULAR_REFRESH_MINUTES", "180"))
+# Вакансии без изменений кандидатов дольше этого срока обновляются только ночью (кроме приоритетных)
+REFRESH_INACTIVE_DAYS = float(os.getenv("REFRESH_INACTIVE_DAYS", "14"))
+# Суточный бюджет запросов к Huntflow для дневных циклов; 0 — без ограничения
+REFRESH_DAILY_REQUEST_BUDGET = int(os.getenv("REFRESH_DAILY_REQUEST_BUDGET", "50000"))
+REFRESH_CYCLE_MAX_VACANCIES = int(os.getenv("REFRESH_CYCLE_MAX_VACANCIES", "100"))
+REFRESH_VACANCY_COST_ESTIMATE = float(os.getenv("REFRESH_VACANCY_COST_ESTIMATE", "30"))
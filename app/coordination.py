@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from . import config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+LEADER_LOCK_FILE = "leader.lock"
+STATUS_FILE = "status.json"
+REQUESTS_DIR = "requests"
+RESULT_SUFFIX = ".result"
+
+_leader_fd: Optional[int] = None
+
+
+def _path(*parts: str) -> str:
+    return os.path.join(config.COORDINATION_DIR, *parts)
+
+
+def is_enabled() -> bool:
+    return config.WORKER_COORDINATION and fcntl is not None
+
+
+def is_leader() -> bool:
+    # Без координации (или без fcntl) процесс считается единственным и сам выполняет обновления
+    return not is_enabled() or _leader_fd is not None
+
+
+def try_acquire_leadership() -> bool:
+    global _leader_fd
+    if is_leader():
+        return True
+    os.makedirs(config.COORDINATION_DIR, exist_ok=True)
+    fd = os.open(_path(LEADER_LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+    # Блокировка держится, пока открыт дескриптор: при падении процесса ее забирает другой воркер
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    _leader_fd = fd
+    logging.info(f"Процесс {os.getpid()} стал ведущим: он выполняет плановые и ручные обновления.")
+    return True
+
+
+def release_leadership() -> None:
+    global _leader_fd
+    if _leader_fd is not None:
+        fcntl.flock(_leader_fd, fcntl.LOCK_UN)
+        os.close(_leader_fd)
+        _leader_fd = None
+
+
+@asynccontextmanager
+async def file_lock(path: str) -> AsyncIterator[None]:
+    if not is_enabled():
+        yield
+        return
+    lock_dir = os.path.dirname(path)
+    if lock_dir:
+        os.makedirs(lock_dir, exist_ok=True)
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def file_token(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def publish_status(status: Dict[str, Any]) -> None:
+    os.makedirs(config.COORDINATION_DIR, exist_ok=True)
+    _write_json(_path(STATUS_FILE), {**status, "leader_pid": os.getpid(), "published_at": time.time()})
+
+
+def read_status() -> Optional[Dict[str, Any]]:
+    return _read_json(_path(STATUS_FILE))
+
+
+def status_token() -> Optional[Tuple[int, int]]:
+    return file_token(_path(STATUS_FILE))
+
+
+def submit_request(request: Dict[str, Any]) -> str:
+    request_id = uuid.uuid4().hex
+    requests_dir = _path(REQUESTS_DIR)
+    os.makedirs(requests_dir, exist_ok=True)
+    _write_json(os.path.join(requests_dir, f"{request_id}.json"), {**request, "id": request_id})
+    logging.info(f"Запрос {request.get('type')} передан ведущему процессу ({request_id}).")
+    return request_id
+
+
+def take_requests() -> List[Dict[str, Any]]:
+    requests_dir = _path(REQUESTS_DIR)
+    if not os.path.isdir(requests_dir):
+        return []
+    taken = []
+    for entry in sorted(os.scandir(requests_dir), key=lambda e: e.stat().st_mtime):
+        if entry.name.endswith(f"{RESULT_SUFFIX}.json"):
+            # Результат, который никто не дождался, удаляется через час
+            if time.time() - entry.stat().st_mtime > 3600:
+                os.remove(entry.path)
+            continue
+        if not entry.name.endswith(".json"):
+            continue
+        request = _read_json(entry.path)
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            continue
+        if request is not None:
+            taken.append(request)
+    return taken
+
+
+def write_result(request_id: str, result: Dict[str, Any]) -> None:
+    _write_json(_path(REQUESTS_DIR, f"{request_id}{RESULT_SUFFIX}.json"), result)
+
+
+async def wait_result(request_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+    result_path = _path(REQUESTS_DIR, f"{request_id}{RESULT_SUFFIX}.json")
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = _read_json(result_path)
+        if result is not None:
+            try:
+                os.remove(result_path)
+            except FileNotFoundError:
+                pass
+            return result
+        await asyncio.sleep(config.COORDINATION_POLL_SECONDS)
+    return None
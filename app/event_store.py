@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from . import accounts, config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Для подсчета воронки важно только, является ли событие сменой статуса, комментарием или чем-то другим
+KIND_OTHER, KIND_STATUS, KIND_COMMENT = range(3)
+KIND_BY_TYPE = {"STATUS": KIND_STATUS, "COMMENT": KIND_COMMENT}
+TYPE_BY_KIND = {KIND_OTHER: "OTHER", KIND_STATUS: "STATUS", KIND_COMMENT: "COMMENT"}
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS events (
+        vacancy_id INTEGER NOT NULL,
+        applicant_id INTEGER NOT NULL,
+        log_id INTEGER NOT NULL,
+        created_ts REAL NOT NULL,
+        kind INTEGER NOT NULL,
+        status INTEGER,
+        PRIMARY KEY (vacancy_id, applicant_id, log_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS events_created_idx ON events (created_ts, kind);
+    CREATE TABLE IF NOT EXISTS vacancies (
+        vacancy_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        is_priority INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS statuses (status_id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+"""
+
+# (vacancy_id, applicant_id, kind, status, created_ts)
+EventRow = Tuple[int, int, int, Optional[int], float]
+
+_initialized_paths: Set[str] = set()
+
+
+def _connect() -> sqlite3.Connection:
+    # У каждого аккаунта своя база событий; to_thread переносит текущий аккаунт в рабочий поток
+    db_path = accounts.current_partition_path(config.EVENT_STORE_PATH)
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    if db_path not in _initialized_paths:
+        connection.executescript(SCHEMA)
+        _initialized_paths.add(db_path)
+    return connection
+
+
+def _event_rows(entries: Iterable[Tuple[int, int, List[List]]]) -> Iterable[Tuple]:
+    for vacancy_id, applicant_id, logs in entries:
+        for log_id, log_type, status, created in logs:
+            if log_id is None or not created:
+                continue
+            created_ts = datetime.fromisoformat(created).timestamp()
+            yield vacancy_id, applicant_id, log_id, created_ts, KIND_BY_TYPE.get(log_type, KIND_OTHER), status
+
+
+def _is_empty_sync() -> bool:
+    connection = _connect()
+    try:
+        return connection.execute("SELECT 1 FROM events LIMIT 1").fetchone() is None
+    finally:
+        connection.close()
+
+
+def _record_sync(
+    entries: Iterable[Tuple[int, int, List[List]]],
+    vacancies: Sequence[Tuple[int, str, bool]],
+    statuses: Dict[int, str]
+) -> int:
+    connection = _connect()
+    try:
+        with connection:
+            # События только добавляются: история закрытых вакансий и логи вне окна LOG_FETCH_MODE=window сохраняются
+            cursor = connection.executemany(
+                "INSERT OR REPLACE INTO events (vacancy_id, applicant_id, log_id, created_ts, kind, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                _event_rows(entries)
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO vacancies (vacancy_id, name, is_priority) VALUES (?, ?, ?)",
+                [(vacancy_id, name, int(is_priority)) for vacancy_id, name, is_priority in vacancies]
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO statuses (status_id, name) VALUES (?, ?)", list(statuses.items())
+            )
+            return cursor.rowcount
+    finally:
+        connection.close()
+
+
+def _load_events_sync(start_ts: float, end_ts: float, vacancy_ids: Optional[Sequence[int]]) -> List[EventRow]:
+    vacancy_filter = ""
+    params: List = [KIND_STATUS, start_ts, end_ts]
+    if vacancy_ids:
+        vacancy_filter = f" AND vacancy_id IN ({', '.join('?' * len(vacancy_ids))})"
+        params.extend(vacancy_ids)
+    params.append(start_ts)
+
+    # Берем всех кандидатов со сменой статуса в периоде и все их события начиная с начала периода:
+    # правило подсчета смотрит на следующее событие, которое может быть уже за концом периода
+    query = f"""
+        WITH touched AS (
+            SELECT DISTINCT vacancy_id, applicant_id FROM events
+            WHERE kind = ? AND created_ts BETWEEN ? AND ?{vacancy_filter}
+        )
+        SELECT e.vacancy_id, e.applicant_id, e.kind, e.status, e.created_ts
+        FROM touched t
+        JOIN events e ON e.vacancy_id = t.vacancy_id AND e.applicant_id = t.applicant_id
+        WHERE e.created_ts >= ?
+        ORDER BY e.vacancy_id, e.applicant_id, e.created_ts, e.log_id
+    """
+    connection = _connect()
+    try:
+        return connection.execute(query, params).fetchall()
+    finally:
+        connection.close()
+
+
+def _load_dictionaries_sync() -> Tuple[Dict[int, Tuple[str, bool]], Dict[int, str]]:
+    connection = _connect()
+    try:
+        vacancies = {
+            vacancy_id: (name, bool(is_priority))
+            for vacancy_id, name, is_priority in connection.execute("SELECT vacancy_id, name, is_priority FROM vacancies")
+        }
+        statuses = dict(connection.execute("SELECT status_id, name FROM statuses").fetchall())
+    finally:
+        connection.close()
+    return vacancies, statuses
+
+
+async def is_empty() -> bool:
+    return await asyncio.to_thread(_is_empty_sync)
+
+
+async def record_events(
+    entries: Iterable[Tuple[int, int, List[List]]],
+    vacancies: Sequence[Tuple[int, str, bool]],
+    statuses: Dict[int, str]
+) -> int:
+    return await asyncio.to_thread(_record_sync, entries, vacancies, statuses)
+
+
+async def load_events(start_ts: float, end_ts: float, vacancy_ids: Optional[Sequence[int]] = None) -> List[EventRow]:
+    return await asyncio.to_thread(_load_events_sync, start_ts, end_ts, vacancy_ids)
+
+
+async def load_dictionaries() -> Tuple[Dict[int, Tuple[str, bool]], Dict[int, str]]:
+    return await asyncio.to_thread(_load_dictionaries_sync)
@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from . import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ENDPOINT_PATTERNS = [
+    (re.compile(r"/applicants/\d+/logs$"), "logs"),
+    (re.compile(r"/applicants/search$"), "search"),
+    (re.compile(r"/applicants$"), "applicants"),
+    (re.compile(r"/vacancies/statuses$"), "statuses"),
+    (re.compile(r"/vacancies$"), "vacancies"),
+    (re.compile(r"/coworkers$"), "coworkers"),
+    (re.compile(r"^/accounts$"), "accounts"),
+]
+
+# Логи кэшируются только вместе с отметкой изменения кандидата, иначе можно пропустить новые события
+TAG_REQUIRED_CLASSES = {"logs"}
+
+# Вытеснение перечитывает каталог, поэтому кэш освобождается с запасом, а не до самой границы
+EVICTION_TARGET_RATIO = 0.9
+
+
+def classify_endpoint(path: str) -> str:
+    for pattern, endpoint_class in ENDPOINT_PATTERNS:
+        if pattern.search(path):
+            return endpoint_class
+    return "other"
+
+
+class ResponseCache:
+    def __init__(self, cache_dir: str, max_bytes: int, ttls: Dict[str, int]):
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self._ttls = ttls
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._is_indexed = False
+        self._evict_lock = asyncio.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def _ttl_for(self, path: str, cache_tag: Optional[str]) -> int:
+        endpoint_class = classify_endpoint(path)
+        if endpoint_class in TAG_REQUIRED_CLASSES and cache_tag is None:
+            return 0
+        return self._ttls.get(endpoint_class, 0)
+
+    @staticmethod
+    def make_key(method: str, path: str, params: Optional[Dict], cache_tag: Optional[str]) -> str:
+        payload = json.dumps([method.upper(), path, params or {}, cache_tag], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _file_path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, f"{key}.json")
+
+    # Каталог общий для веб-процесса и процесса обновления, поэтому вся работа с файлами идет в потоке,
+    # а индекс перед вытеснением перечитывается с диска: другой процесс мог добавить или удалить записи
+    def _scan_sync(self) -> "OrderedDict[str, Dict[str, Any]]":
+        os.makedirs(self._cache_dir, exist_ok=True)
+        entries = []
+        with os.scandir(self._cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        return OrderedDict((key, {"size": size, "created": created}) for created, key, size in sorted(entries))
+
+    async def _rebuild_index(self) -> None:
+        try:
+            index = await asyncio.to_thread(self._scan_sync)
+        except Exception as e:
+            logging.error(f"Не удалось прочитать каталог HTTP-кэша {self._cache_dir}: {e}")
+            return
+        # Записи, к которым этот процесс уже обращался, сохраняют свой порядок LRU
+        for key in self._index:
+            if key in index:
+                index.move_to_end(key)
+        self._index = index
+        self._total_bytes = sum(entry["size"] for entry in index.values())
+
+    async def _ensure_index(self) -> None:
+        if self._is_indexed:
+            return
+        self._is_indexed = True
+        await self._rebuild_index()
+
+    def _remove_files_sync(self, keys: List[str]) -> None:
+        for key in keys:
+            try:
+                os.remove(self._file_path(key))
+            except FileNotFoundError:
+                pass
+
+    async def _drop(self, keys: List[str]) -> None:
+        for key in keys:
+            entry = self._index.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry["size"]
+        await asyncio.to_thread(self._remove_files_sync, keys)
+
+    def _read_sync(self, key: str) -> Optional[Tuple[float, int, Dict[str, Any]]]:
+        path = self._file_path(key)
+        try:
+            stat = os.stat(path)
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime, stat.st_size, stored
+
+    def _write_sync(self, key: str, payload: str) -> None:
+        tmp_path = f"{self._file_path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self._file_path(key))
+
+    def is_cacheable(self, method: str, path: str, cache_tag: Optional[str] = None) -> bool:
+        return method.upper() == "GET" and self._ttl_for(path, cache_tag) > 0
+
+    async def get(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict],
+        cache_tag: Optional[str] = None
+    ) -> Optional[httpx.Response]:
+        await self._ensure_index()
+        key = self.make_key(method, path, params, cache_tag)
+        # Наличие записи проверяется по файлу, а не по индексу: ее мог сохранить другой процесс
+        try:
+            found = await asyncio.to_thread(self._read_sync, key)
+        except Exception:
+            await self._drop([key])
+            self._stats["misses"] += 1
+            return None
+        if found is None:
+            if key in self._index:
+                self._total_bytes -= self._index.pop(key)["size"]
+            self._stats["misses"] += 1
+            return None
+        created, size, stored = found
+        if time.time() - created > self._ttl_for(path, cache_tag):
+            await self._drop([key])
+            self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return None
+
+        if key in self._index:
+            self._total_bytes -= self._index[key]["size"]
+        self._index[key] = {"size": size, "created": created}
+        self._index.move_to_end(key)
+        self._total_bytes += size
+        self._stats["hits"] += 1
+        return httpx.Response(
+            stored["status_code"],
+            headers={"Content-Type": stored.get("content_type", "application/json")},
+            content=stored["content"].encode("utf-8"),
+            request=httpx.Request(method, path, params=params),
+        )
+
+    async def put(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict],
+        response: httpx.Response,
+        cache_tag: Optional[str] = None
+    ) -> None:
+        if response.status_code != 200:
+            return
+        await self._ensure_index()
+        key = self.make_key(method, path, params, cache_tag)
+        payload = json.dumps({
+            "status_code": response.status_code,
+            "content_type": response.headers.get("Content-Type", "application/json"),
+            "content": response.text,
+        }, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        if size > self._max_bytes:
+            return
+
+        try:
+            await asyncio.to_thread(self._write_sync, key, payload)
+        except Exception as e:
+            logging.warning(f"Не удалось сохранить ответ в HTTP-кэш: {e}")
+            return
+
+        if key in self._index:
+            self._total_bytes -= self._index[key]["size"]
+        self._index[key] = {"size": size, "created": time.time()}
+        self._index.move_to_end(key)
+        self._total_bytes += size
+        self._stats["stores"] += 1
+
+        if self._total_bytes > self._max_bytes:
+            await self._evict()
+
+    async def _evict(self) -> None:
+        async with self._evict_lock:
+            await self._rebuild_index()
+            evicted = []
+            total_bytes = self._total_bytes
+            if total_bytes <= self._max_bytes:
+                return
+            for key, entry in self._index.items():
+                if total_bytes <= self._max_bytes * EVICTION_TARGET_RATIO:
+                    break
+                evicted.append(key)
+                total_bytes -= entry["size"]
+            if evicted:
+                await self._drop(evicted)
+                self._stats["evictions"] += len(evicted)
+
+    async def clear(self) -> int:
+        await self._rebuild_index()
+        removed = len(self._index)
+        await self._drop(list(self._index))
+        logging.info(f"HTTP-кэш очищен. Удалено записей: {removed}.")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests_total = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_ratio": round(self._stats["hits"] / requests_total, 3) if requests_total else 0.0,
+            "entries": len(self._index),
+            "size_bytes": self._total_bytes,
+        }
+
+
+response_cache = ResponseCache(
+    cache_dir=config.HTTP_CACHE_DIR,
+    max_bytes=config.HTTP_CACHE_MAX_BYTES,
+    ttls=config.HTTP_CACHE_TTLS,
+)
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from typing import Optional
+import httpx
+from . import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _create_client() -> httpx.AsyncClient:
+    use_http2 = config.HUNTFLOW_HTTP2 and HTTP2_AVAILABLE
+    if config.HUNTFLOW_HTTP2 and not HTTP2_AVAILABLE:
+        logging.info("Пакет h2 не установлен, запросы к Huntflow идут по HTTP/1.1 (pip install 'httpx[http2]').")
+    return httpx.AsyncClient(
+        http2=use_http2,
+        timeout=httpx.Timeout(config.HUNTFLOW_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=config.HUNTFLOW_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HUNTFLOW_MAX_CONNECTIONS,
+            keepalive_expiry=config.HUNTFLOW_KEEPALIVE_SECONDS,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    # Пул соединений привязан к циклу событий, в котором создан
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = _create_client()
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
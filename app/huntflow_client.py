@@ -0,0 +1,126 @@
+import logging
+import time
+from typing import Dict, Optional
+import httpx
+from huntflow_api_client import HuntflowAPI
+from huntflow_api_client.errors import ApiError, AuthorizationError, TooManyRequestsError
+from huntflow_api_client.errors.response_hooks import raise_for_status
+from . import config, metrics
+from .http_cache import ResponseCache, classify_endpoint, response_cache
+from .http_pool import get_http_client
+from .rate_limiter import AdaptiveRateLimiter, parse_retry_after, rate_limiter
+from .token_manager import token_proxy
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ThrottledHuntflowAPI(HuntflowAPI):
+    def __init__(
+        self,
+        *args,
+        limiter: AdaptiveRateLimiter,
+        max_retries: int,
+        cache: Optional[ResponseCache] = None,
+        read_cache: bool = True,
+        **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self._limiter = limiter
+        self._max_retries = max_retries
+        self._cache = cache
+        self._read_cache = read_cache
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Optional[Dict] = None,
+        cache_tag: Optional[str] = None,
+        **kwargs
+    ) -> httpx.Response:
+        cacheable = self._cache is not None and self._cache.is_cacheable(method, path, cache_tag)
+        if cacheable and self._read_cache:
+            cached_response = await self._cache.get(method, path, params, cache_tag)
+            if cached_response is not None:
+                metrics.HUNTFLOW_CACHED_RESPONSES.labels(classify_endpoint(path)).inc()
+                return cached_response
+
+        response = await super().request(method, path, params=params, **kwargs)
+        if cacheable:
+            await self._cache.put(method, path, params, response, cache_tag)
+        return response
+
+    async def _track_rate_limit(self, response: httpx.Response) -> None:
+        if response.status_code == 429:
+            self._limiter.on_rate_limited(parse_retry_after(response.headers.get("Retry-After")))
+        elif response.status_code < 400:
+            self._limiter.on_success()
+
+    async def _send(self, method: str, path: str, access_token: str, *, headers=None, **kwargs) -> httpx.Response:
+        request_headers = dict(headers or {})
+        request_headers["Authorization"] = f"Bearer {access_token}"
+        if kwargs.get("timeout") is None:
+            # Без явного таймаута действует таймаут общего пула, а не отключенный таймаут httpx
+            kwargs.pop("timeout", None)
+        response = await get_http_client().request(method, self.api_url + path, headers=request_headers, **kwargs)
+        await self._track_rate_limit(response)
+        await raise_for_status(response)
+        return response
+
+    async def _timed_request(self, method: str, path: str, access_token: str, **kwargs) -> httpx.Response:
+        endpoint = classify_endpoint(path)
+        status = "network_error"
+        started = time.perf_counter()
+        try:
+            response = await self._send(method, path, access_token, **kwargs)
+            status = str(response.status_code)
+            return response
+        except ApiError as e:
+            status = str(e.code)
+            raise
+        finally:
+            metrics.HUNTFLOW_REQUEST_DURATION.labels(endpoint, method).observe(time.perf_counter() - started)
+            metrics.HUNTFLOW_REQUESTS.labels(endpoint, method, status).inc()
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        attempt = 0
+        auth_replayed = False
+        while True:
+            await self._token_proxy.ensure_fresh()
+            access_token = self._token_proxy.get_access_token()
+            await self._limiter.acquire()
+            try:
+                return await self._timed_request(method, path, access_token, **kwargs)
+            except TooManyRequestsError:
+                attempt += 1
+                if attempt > self._max_retries:
+                    logging.error(f"Превышено число повторов после 429 для {method} {path}.")
+                    raise
+                logging.info(f"Повтор запроса {method} {path} после 429 (попытка {attempt}).")
+            except AuthorizationError:
+                # Обновление токена выполняется одно на все запросы, получившие 401 с тем же токеном
+                if auth_replayed or not await self._token_proxy.refresh_if_stale(access_token):
+                    logging.error(f"Запрос {method} {path} отклонен с 401, обновить токен не удалось.")
+                    raise
+                auth_replayed = True
+                logging.info(f"Повтор запроса {method} {path} с обновленным токеном.")
+
+
+_api_clients: Dict[bool, "ThrottledHuntflowAPI"] = {}
+
+
+def create_api_client(bypass_cache: bool = False) -> ThrottledHuntflowAPI:
+    api_client = _api_clients.get(bypass_cache)
+    if api_client is None:
+        api_client = ThrottledHuntflowAPI(
+            base_url=config.HUNTFLOW_BASE_URL,
+            token_proxy=token_proxy,
+            auto_refresh_tokens=False,
+            limiter=rate_limiter,
+            max_retries=config.HUNTFLOW_MAX_RETRIES,
+            cache=response_cache if config.HTTP_CACHE_ENABLED else None,
+            read_cache=not bypass_cache,
+        )
+        _api_clients[bypass_cache] = api_client
+    return api_client
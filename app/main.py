@@ -1,97 +1,275 @@
 import asyncio
 import logging
-from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Query, Request, BackgroundTasks
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
-from fastapi.staticfiles import StaticFiles
 from starlette.responses import JSONResponse
 
-from . import cache_manager, config, report_generator
+from . import (
+    accounts, cache_manager, config, coordination, http_pool, metrics, page_cache, progress, refresh_scheduler, refresh_worker,
+    report_export, report_generator
+)
+from .http_cache import response_cache
 from .token_manager import token_proxy
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 app = FastAPI(title="Hiring Report Dashboard", version="1.0.0")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount(
+    page_cache.STATIC_MOUNT_PATH, page_cache.FingerprintedStaticFiles(directory=page_cache.STATIC_DIR), name="static"
+)
 templates = Jinja2Templates(directory="templates")
 scheduler = AsyncIOScheduler()
+_coordination_task: Optional[asyncio.Task] = None
+_warm_up_task: Optional[asyncio.Task] = None
+REPORT_SORT_KEYS = {"name", *report_generator.FUNNEL_STAGES_ORDER}
+
+
+@app.middleware("http")
+async def observe_handler_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        handler = getattr(route, "path", None) or "unmatched"
+        metrics.HTTP_REQUEST_DURATION.labels(handler, request.method, str(status)).observe(
+            time.perf_counter() - started
+        )
+
+
 class CommentUpdateRequest(BaseModel):
     vacancy_name: str
     comment: str
+    account_id: Optional[int] = None
+
+
+def _resolve_account(account_id: Optional[int]) -> Optional[int]:
+    if account_id is not None and not accounts.is_known_account(account_id):
+        raise HTTPException(status_code=404, detail=f"Аккаунт Huntflow {account_id} не найден.")
+    return accounts.resolve_account_id(account_id)
+
+
+def _is_warming_up(account_id: Optional[int]) -> bool:
+    # Данных еще нет: кэш читается с диска или идет первое обновление
+    if cache_manager.get_snapshot(account_id).vacancies or cache_manager.get_last_updated_time_msk(account_id):
+        return False
+    return (_warm_up_task is not None and not _warm_up_task.done()) or cache_manager.get_update_status(account_id)
+
+
+def _start_scheduler() -> None:
+    refresh_scheduler.schedule_jobs(scheduler)
+    scheduler.start()
+    logging.info(
+        f"Планировщик запущен. Полное обновление будет выполняться ежедневно "
+        f"в {config.FULL_REFRESH_HOUR:02d}:{config.FULL_REFRESH_MINUTE:02d} по МСК.")
+    if config.INTRADAY_REFRESH:
+        logging.info(
+            f"Дневные циклы обновления: каждые {config.REFRESH_CYCLE_MINUTES} мин "
+            f"(разброс до {config.REFRESH_CYCLE_JITTER_SECONDS} с).")
+
+
+async def _handle_leader_request(request: Dict[str, Any]) -> None:
+    try:
+        if request.get("type") == "targeted":
+            rows = await cache_manager.refresh_vacancies(
+                request["vacancies"], request.get("bypass_cache", False), request.get("account_id")
+            )
+            coordination.write_result(request["id"], {"rows": rows})
+            return
+        if request.get("invalidate_cache"):
+            await response_cache.clear()
+        await cache_manager.update_cached_data(request.get("bypass_cache", False), request.get("account_id"))
+    except Exception as e:
+        logging.error(f"Ошибка при выполнении запроса {request.get('id')} от другого воркера: {e}", exc_info=True)
+        if request.get("type") == "targeted":
+            coordination.write_result(request["id"], {"rows": None})
+
+
+async def _coordination_loop() -> None:
+    published_status = None
+    mirrored_token = None
+    while True:
+        try:
+            if not coordination.is_leader() and coordination.try_acquire_leadership():
+                token_proxy.reload()
+                if token_proxy.get_access_token() and not scheduler.running:
+                    _start_scheduler()
+
+            await cache_manager.reload_if_changed()
+
+            if coordination.is_leader():
+                status = {
+                    "progress": progress.get_progress(),
+                    "updating": cache_manager.get_updating_account_ids(),
+                    "scheduler": refresh_scheduler.get_status(),
+                }
+                if status != published_status:
+                    coordination.publish_status(status)
+                    published_status = status
+                for request in coordination.take_requests():
+                    asyncio.create_task(_handle_leader_request(request))
+            else:
+                status_token = coordination.status_token()
+                if status_token != mirrored_token:
+                    mirrored_token = status_token
+                    status = coordination.read_status()
+                    if status:
+                        progress.mirror(status.get("progress", {}))
+                        cache_manager.set_remote_updating(status.get("updating", []))
+                        refresh_scheduler.mirror(status.get("scheduler"))
+        except Exception as e:
+            logging.error(f"Ошибка в цикле координации воркеров: {e}", exc_info=True)
+        await asyncio.sleep(config.COORDINATION_POLL_SECONDS)
+
+
+async def _warm_up(refresh_if_empty: bool) -> None:
+    global _coordination_task
+    try:
+        await cache_manager.load_cache()
+        if coordination.is_enabled():
+            _coordination_task = asyncio.create_task(_coordination_loop())
+        if refresh_if_empty and not cache_manager.get_cached_vacancies():
+            logging.info("Кэш пуст. Запускаю первое обновление в фоновом режиме...")
+            await cache_manager.update_cached_data()
+    except Exception as e:
+        logging.error(f"Ошибка при подготовке кэша: {e}", exc_info=True)
 
 
 @app.on_event("startup")
 async def startup_event():
+    global _warm_up_task
     logging.info("Инициализация приложения...")
-    await cache_manager.load_cache()
+    is_leader = coordination.try_acquire_leadership()
 
-    if token_proxy.get_access_token():
-        logging.info("Токен Huntflow успешно загружен.")
-        cache_exists = bool(cache_manager.get_cached_vacancies())
-        if not cache_exists:
-            logging.info("Кэш пуст. Запускаю ПЕРВОЕ обновление (блокирующее)...")
-            await cache_manager.update_cached_data()
-        # else:
-        #     logging.info("Кэш найден. Запускаю ПЛАНОВОЕ обновление в фоновом режиме...")
-        #     asyncio.create_task(cache_manager.update_cached_data())
-
-        msk_tz = timezone(timedelta(hours=3))
-
-        scheduler.add_job(
-            cache_manager.update_cached_data,
-            trigger="cron",
-            hour=0,
-            minute=0,
-            timezone=msk_tz,
-            id="update_report_job",
-            replace_existing=True
-        )
-        scheduler.start()
-        logging.info("Планировщик запущен. Обновление будет выполняться ежедневно в 00:00 по МСК.")
-    else:
+    has_token = bool(token_proxy.get_access_token())
+    if not has_token:
         logging.error("ВНИМАНИЕ: Токены HUNTFLOW не найдены. Проверьте .env или cache/tokens.json")
         logging.warning("Планировщик не запущен, т.к. токен API не предоставлен.")
+    elif is_leader:
+        logging.info("Токен Huntflow успешно загружен.")
+        _start_scheduler()
+    else:
+        logging.info("Процесс работает как ведомый: обновления выполняет ведущий воркер, кэш перечитывается при изменении.")
+
+    # Сервер принимает запросы сразу: кэш читается, а пустой кэш заполняется в фоне
+    _warm_up_task = asyncio.create_task(_warm_up(has_token and is_leader))
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logging.info("Остановка приложения...")
+    for task in (_warm_up_task, _coordination_task):
+        if task is not None:
+            task.cancel()
     if scheduler.running:
         scheduler.shutdown()
     logging.info("Планировщик остановлен.")
+    report_export.shutdown()
+    refresh_worker.shutdown()
+    await http_pool.close_http_client()
+    coordination.release_leadership()
 
 
 @app.get("/", response_class=HTMLResponse)
-async def show_report_table(request: Request):
-    report_data = cache_manager.get_cached_vacancies()
-    coworkers = cache_manager.get_cached_coworkers()
-    last_updated = cache_manager.get_last_updated_time_msk()
-    headers = ["Название вакансии"] + report_generator.FUNNEL_STAGES_ORDER + ["Комментарий"]
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "headers": headers,
-        "report_data": report_data,
-        "last_updated": last_updated,
-        "coworkers": coworkers
-    })
+async def show_report_table(
+    request: Request,
+    recruiter_id: Optional[List[int]] = Query(None),
+    priority: bool = False,
+    account_id: Optional[int] = None
+):
+    account_id = _resolve_account(account_id)
+    last_updated = cache_manager.get_last_updated_time_msk(account_id)
+    warming_up = _is_warming_up(account_id)
+    account_list = accounts.get_accounts()
+    root_path = request.scope.get("root_path", "")
+    page_key = (
+        "index", account_id, tuple(recruiter_id or ()), priority, cache_manager.get_cache_version(account_id),
+        last_updated, warming_up, tuple((account["id"], account["name"]) for account in account_list), root_path
+    )
+
+    def render() -> str:
+        if recruiter_id or priority:
+            _, report_data = cache_manager.query_vacancies(
+                recruiter_ids=recruiter_id, priority_only=priority, account_id=account_id
+            )
+        else:
+            report_data = cache_manager.get_cached_vacancies(account_id)
+        return templates.get_template("index.html").render({
+            "headers": ["Название вакансии"] + report_generator.FUNNEL_STAGES_ORDER + ["Комментарий"],
+            "report_data": report_data,
+            "last_updated": last_updated,
+            "coworkers": cache_manager.get_cached_coworkers(account_id),
+            "accounts": account_list,
+            "account_id": account_id,
+            "warming_up": warming_up,
+            "static_url": lambda path: page_cache.static_url(path, root_path),
+        })
+
+    # Готовая страница и ее сжатые варианты переиспользуются до следующего обновления или комментария
+    page = await page_cache.get_page(page_key, render, last_updated)
+    return page_cache.respond(request, page)
 
 @app.get("/status")
-async def get_status():
+async def get_status(account_id: Optional[int] = None):
+    selected_account_id = _resolve_account(account_id)
     return {
-        "is_updating": cache_manager.get_update_status(),
-        "last_updated_str": cache_manager.get_last_updated_time_msk()
+        "is_updating": cache_manager.get_update_status(selected_account_id),
+        "warming_up": _is_warming_up(selected_account_id),
+        "is_complete": cache_manager.get_snapshot(selected_account_id).is_complete,
+        "last_updated_str": cache_manager.get_last_updated_time_msk(selected_account_id),
+        "progress": progress.get_account_progress(selected_account_id),
+        "accounts": [
+            {
+                **account,
+                "is_updating": cache_manager.get_update_status(account["id"]),
+                "last_updated_str": cache_manager.get_last_updated_time_msk(account["id"]),
+            }
+            for account in accounts.get_accounts()
+        ]
     }
 
+
+@app.get("/status/stream")
+async def status_stream(request: Request, account_id: Optional[int] = None):
+    # Страница открыта для одного аккаунта: ход и завершение обновлений других аккаунтов ей не нужны
+    selected_account_id = _resolve_account(account_id)
+    queue = progress.subscribe(selected_account_id, scoped=True)
+
+    async def event_source():
+        try:
+            yield progress.format_sse("progress", progress.get_account_progress(selected_account_id))
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=config.PROGRESS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield progress.format_sse(event, data)
+        finally:
+            progress.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/update-comment", status_code=200)
 async def update_comment_endpoint(request_data: CommentUpdateRequest):
     logging.info(f"Запрос на обновление комментария для: '{request_data.vacancy_name}'")
     success = await cache_manager.update_comment(
         request_data.vacancy_name,
-        request_data.comment
+        request_data.comment,
+        _resolve_account(request_data.account_id)
     )
     if not success:
         raise HTTPException(
@@ -102,29 +280,174 @@ async def update_comment_endpoint(request_data: CommentUpdateRequest):
 
 
 @app.get("/download-report")
-async def download_report_endpoint():
-    report_data = cache_manager.get_cached_vacancies()
+async def download_report_endpoint(format: str = "xlsx", account_id: Optional[int] = None):
+    account_id = _resolve_account(account_id)
+    report_data = cache_manager.get_cached_vacancies(account_id)
     if not report_data:
         raise HTTPException(status_code=404, detail="Нет данных для генерации отчета.")
-    xlsx_file = report_generator.create_xlsx_report(report_data)
-    return StreamingResponse(
-        xlsx_file,
+
+    if format == "csv":
+        return StreamingResponse(
+            report_export.iter_csv_report(report_data, report_generator.REPORT_HEADERS),
+            media_type="text/csv; charset=utf-8",
+            headers={'Content-Disposition': 'attachment; filename="hiring_funnel_report.csv"'}
+        )
+    if format != "xlsx":
+        raise HTTPException(status_code=400, detail=f"Неподдерживаемый формат отчета: '{format}'.")
+
+    xlsx_content = await report_export.get_xlsx_report(
+        report_data, report_generator.REPORT_HEADERS, (account_id,) + cache_manager.get_cache_version(account_id)
+    )
+    return Response(
+        content=xlsx_content,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={'Content-Disposition': 'attachment; filename="hiring_funnel_report.xlsx"'}
     )
 
 
+@app.get("/api/report")
+async def report_api_endpoint(
+    recruiter_id: Optional[List[int]] = Query(None),
+    priority: bool = False,
+    vacancy: Optional[List[str]] = Query(None),
+    q: Optional[str] = None,
+    sort: Optional[str] = None,
+    order: str = "asc",
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=config.REPORT_API_MAX_PAGE_SIZE),
+    account_id: Optional[int] = None
+):
+    if sort is not None and sort not in REPORT_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Неподдерживаемое поле сортировки: '{sort}'.")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail=f"Неподдерживаемый порядок сортировки: '{order}'.")
+    account_id = _resolve_account(account_id)
+
+    total, rows = cache_manager.query_vacancies(
+        recruiter_ids=recruiter_id,
+        priority_only=priority,
+        vacancy_names=vacancy,
+        search=q,
+        sort=sort,
+        descending=order == "desc",
+        offset=(page - 1) * page_size,
+        limit=page_size,
+        account_id=account_id
+    )
+    return {
+        "account_id": account_id,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "version": cache_manager.get_snapshot(account_id).version,
+        "warming_up": _is_warming_up(account_id),
+        "is_complete": cache_manager.get_snapshot(account_id).is_complete,
+        "items": rows,
+    }
+
+
+@app.get("/report")
+async def range_report_endpoint(
+    start_day: date = Query(..., alias="from"),
+    end_day: date = Query(..., alias="to"),
+    vacancy_id: Optional[List[int]] = Query(None),
+    account_id: Optional[int] = None
+):
+    if start_day > end_day:
+        raise HTTPException(status_code=400, detail="Дата начала периода позже даты окончания.")
+    if not config.EVENT_STORE_ENABLED:
+        raise HTTPException(status_code=404, detail="Локальное хранилище событий отключено.")
+
+    rows = await report_generator.get_range_report(start_day, end_day, vacancy_id, _resolve_account(account_id))
+    return {"from": start_day.isoformat(), "to": end_day.isoformat(), "vacancies": rows}
+
+
+@app.get("/api/trend")
+async def weekly_trend_endpoint(
+    weeks: int = Query(8, ge=1, le=config.TREND_MAX_WEEKS),
+    vacancy_id: Optional[List[int]] = Query(None),
+    account_id: Optional[int] = None
+):
+    if not config.EVENT_STORE_ENABLED:
+        raise HTTPException(status_code=404, detail="Локальное хранилище событий отключено.")
+
+    trend = await report_generator.get_weekly_trend(
+        weeks, datetime.now(timezone.utc), vacancy_id, _resolve_account(account_id)
+    )
+    return {"weeks": trend}
+
+
+@app.get("/scheduler")
+async def get_scheduler_status():
+    return refresh_scheduler.get_status()
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    content, content_type = metrics.render()
+    return Response(content=content, media_type=content_type)
+
+
+@app.get("/cache-stats")
+async def get_cache_stats():
+    return response_cache.get_stats()
+
+
 @app.post("/refresh-report")
-async def refresh_report_endpoint(background_tasks: BackgroundTasks):
+async def refresh_report_endpoint(
+    background_tasks: BackgroundTasks,
+    bypass_cache: bool = False,
+    invalidate_cache: bool = False,
+    vacancy_id: Optional[List[int]] = Query(None),
+    recruiter_id: Optional[int] = None,
+    account_id: Optional[int] = None
+):
     if not token_proxy._access_token:
         raise HTTPException(status_code=403, detail="Токен API не задан.")
 
-    if cache_manager.get_update_status():
+    if vacancy_id or recruiter_id is not None:
+        selected_account_id = _resolve_account(account_id)
+        vacancies, missing_ids = cache_manager.resolve_vacancies(vacancy_id, recruiter_id, selected_account_id)
+        if missing_ids:
+            raise HTTPException(status_code=404, detail=f"Вакансии {missing_ids} не найдены в кэше.")
+        if not vacancies:
+            raise HTTPException(status_code=404, detail=f"У рекрутера {recruiter_id} нет вакансий в отчете.")
+
+        # Точечное обновление нужно сразу после правки в Huntflow: ответы из HTTP-кэша (список кандидатов
+        # хранится 10 минут, рекрутеры — 6 часов) вернули бы прежнюю строку. Кэш только пополняется
+        if coordination.is_leader():
+            rows = await cache_manager.refresh_vacancies(vacancies, True, selected_account_id)
+        else:
+            request_id = coordination.submit_request({
+                "type": "targeted", "vacancies": vacancies, "bypass_cache": True,
+                "account_id": selected_account_id,
+            })
+            result = await coordination.wait_result(request_id, config.TARGETED_REFRESH_TIMEOUT_SECONDS)
+            if result is None:
+                raise HTTPException(status_code=504, detail="Ведущий процесс не ответил на запрос обновления.")
+            rows = result.get("rows")
+            await cache_manager.reload_if_changed()
+        if rows is None:
+            raise HTTPException(status_code=502, detail="Не удалось обновить вакансии из Huntflow.")
+        return {"message": f"Обновлено вакансий: {len(rows)}.", "vacancies": rows}
+
+    if account_id is not None:
+        _resolve_account(account_id)
+    # Без account_id обновляются все аккаунты; обновление одного аккаунта не ждет остальные
+    if cache_manager.get_update_status(account_id):
         return JSONResponse(
             status_code=409,
             content={"message": "Обновление уже выполняется."}
         )
 
-    logging.info("Запрос на принудительное обновление отчета.")
-    background_tasks.add_task(cache_manager.update_cached_data)
+    logging.info(f"Запрос на принудительное обновление отчета (аккаунт: {account_id or 'все'}).")
+    if not coordination.is_leader():
+        coordination.submit_request({
+            "type": "refresh", "bypass_cache": bypass_cache, "invalidate_cache": invalidate_cache,
+            "account_id": account_id,
+        })
+        return {"message": "Обновление запущено в фоновом режиме."}
+    if invalidate_cache:
+        await response_cache.clear()
+    background_tasks.add_task(cache_manager.update_cached_data, bypass_cache, account_id)
     return {"message": "Обновление запущено в фоновом режиме."}
\ No newline at end of file
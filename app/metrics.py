@@ -0,0 +1,112 @@
+import os
+from typing import Any, Dict, Iterator, List, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.metrics_core import Metric
+
+REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PHASE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+HUNTFLOW_REQUESTS = Counter(
+    "huntflow_requests_total", "Запросы к API Huntflow по типу эндпоинта и коду ответа",
+    ["endpoint", "method", "status"]
+)
+HUNTFLOW_REQUEST_DURATION = Histogram(
+    "huntflow_request_duration_seconds", "Время ответа API Huntflow",
+    ["endpoint", "method"], buckets=REQUEST_BUCKETS
+)
+HUNTFLOW_CACHED_RESPONSES = Counter(
+    "huntflow_cached_responses_total", "Ответы Huntflow, отданные из HTTP-кэша", ["endpoint"]
+)
+HUNTFLOW_PAGES = Counter("huntflow_pages_fetched_total", "Загруженные страницы списков Huntflow", ["endpoint"])
+
+REFRESH_RUNS = Counter("report_refresh_runs_total", "Запуски обновления отчета", ["result"])
+REFRESH_DURATION = Histogram("report_refresh_duration_seconds", "Полное время обновления отчета", buckets=PHASE_BUCKETS)
+REFRESH_PHASE_DURATION = Histogram(
+    "report_refresh_phase_duration_seconds", "Время этапов обновления отчета", ["phase"], buckets=PHASE_BUCKETS
+)
+VACANCIES_PROCESSED = Counter("report_vacancies_processed_total", "Обработанные вакансии")
+APPLICANTS_PROCESSED = Counter(
+    "report_applicants_processed_total", "Обработанные кандидаты (fetched — логи загружены, unchanged — без изменений)",
+    ["sync"]
+)
+
+CACHE_SAVE_DURATION = Histogram(
+    "report_cache_save_duration_seconds", "Время сохранения кэша отчета", ["backend", "operation"],
+    buckets=REQUEST_BUCKETS
+)
+CACHE_SIZE = Gauge(
+    "report_cache_size_bytes", "Размер сохраненного кэша отчета", ["backend"], multiprocess_mode="mostrecent"
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Время обработки запросов к дашборду", ["handler", "method", "status"],
+    buckets=REQUEST_BUCKETS
+)
+
+
+def is_multiprocess() -> bool:
+    # Переменную читает и сам prometheus_client: каждый процесс (воркеры uvicorn и процесс обновления)
+    # пишет значения в свои файлы в этом каталоге, а /metrics любого воркера суммирует их все
+    return bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+
+# Метрики обновления, собранные в отдельном процессе обновления отчета
+EXTERNAL_PREFIXES = ("huntflow_", "report_")
+ExportedSample = Tuple[str, Dict[str, str], float]
+ExportedFamily = Tuple[str, str, str, str, List[ExportedSample]]
+_external_families: List[ExportedFamily] = []
+
+
+def export_families() -> List[ExportedFamily]:
+    if is_multiprocess():
+        # Процесс обновления сам пишет метрики в общий каталог
+        return []
+    return [
+        (family.name, family.documentation, family.type, family.unit,
+         [(sample.name, sample.labels, sample.value) for sample in family.samples])
+        for family in REGISTRY.collect() if family.name.startswith(EXTERNAL_PREFIXES)
+    ]
+
+
+def set_external_families(families: List[ExportedFamily]) -> None:
+    global _external_families
+    _external_families = families
+
+
+def _merge_family(family: Any, external_samples: List[ExportedSample]) -> Metric:
+    values = {(sample.name, tuple(sorted(sample.labels.items()))): sample.value for sample in family.samples}
+    for name, labels, value in external_samples:
+        key = (name, tuple(sorted(labels.items())))
+        if key not in values:
+            values[key] = value
+        elif name.endswith("_created"):
+            values[key] = min(values[key], value)
+        else:
+            values[key] += value
+    merged = Metric(family.name, family.documentation, family.type, family.unit)
+    for (name, labels), value in values.items():
+        merged.add_sample(name, dict(labels), value)
+    return merged
+
+
+class _MergedRegistry:
+    def collect(self) -> Iterator[Any]:
+        external = {family[0]: family for family in _external_families}
+        for family in REGISTRY.collect():
+            external_family = external.pop(family.name, None)
+            yield family if external_family is None else _merge_family(family, external_family[4])
+        for name, documentation, metric_type, unit, samples in external.values():
+            family = Metric(name, documentation, metric_type, unit)
+            for sample_name, labels, value in samples:
+                family.add_sample(sample_name, labels, value)
+            yield family
+
+
+def render() -> Tuple[bytes, str]:
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(_MergedRegistry()), CONTENT_TYPE_LATEST
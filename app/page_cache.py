@@ -0,0 +1,153 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import parse_qs
+from fastapi import Request, Response
+from fastapi.staticfiles import StaticFiles
+from . import config
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+STATIC_DIR = "static"
+STATIC_MOUNT_PATH = "/static"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class CachedPage:
+    def __init__(self, body: bytes, last_modified: datetime):
+        # Слабый ETag по содержимому совпадает во всех воркерах и у всех вариантов сжатия
+        self.etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.last_modified = last_modified.replace(microsecond=0)
+        self.variants: Dict[str, bytes] = {"identity": body, "gzip": gzip.compress(body, compresslevel=6)}
+        if BROTLI_AVAILABLE:
+            self.variants["br"] = brotli.compress(body, quality=5)
+
+
+# Страница отрисовывается один раз на версию снимка, ревизию комментариев и набор фильтров
+_pages: "OrderedDict[Hashable, CachedPage]" = OrderedDict()
+_in_flight: Dict[Hashable, asyncio.Future] = {}
+_static_digests: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+
+def _build_page(render: Callable[[], str], last_modified: datetime) -> CachedPage:
+    return CachedPage(render().encode("utf-8"), last_modified)
+
+
+async def get_page(key: Hashable, render: Callable[[], str], last_modified: Optional[datetime]) -> CachedPage:
+    page = _pages.get(key)
+    if page is not None:
+        _pages.move_to_end(key)
+        return page
+
+    future = _in_flight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(
+            asyncio.to_thread(_build_page, render, last_modified or datetime.now(timezone.utc))
+        )
+        _in_flight[key] = future
+        future.add_done_callback(lambda _: _in_flight.pop(key, None))
+
+    page = await asyncio.shield(future)
+    _pages[key] = page
+    _pages.move_to_end(key)
+    while len(_pages) > config.PAGE_CACHE_ENTRIES:
+        _pages.popitem(last=False)
+    return page
+
+
+def clear() -> None:
+    _pages.clear()
+
+
+def _accepted_encodings(request: Request) -> Dict[str, float]:
+    accepted = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def _is_not_modified(request: Request, page: CachedPage) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        # Сравнение слабое: W/"x" и "x" считаются одним и тем же тегом
+        return "*" in tags or page.etag in tags or page.etag[2:] in tags
+    # If-Modified-Since не учитывается: время снимка откатывается назад, когда сбрасывается время
+    # последнего комментария, и измененная страница могла бы получить 304. Проверка идет только по ETag
+    return False
+
+
+def respond(request: Request, page: CachedPage, media_type: str = "text/html; charset=utf-8") -> Response:
+    headers = {
+        "ETag": page.etag,
+        "Last-Modified": format_datetime(page.last_modified.astimezone(timezone.utc), usegmt=True),
+        # Браузер хранит страницу, но перепроверяет ее при каждом открытии
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if _is_not_modified(request, page):
+        return Response(status_code=304, headers=headers)
+
+    accepted = _accepted_encodings(request)
+    encoding = "identity"
+    for candidate in ("br", "gzip"):
+        if candidate in page.variants and accepted.get(candidate, 0) > 0:
+            encoding = candidate
+            break
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=page.variants[encoding], media_type=media_type, headers=headers)
+
+
+def _static_digest(path: str) -> Optional[str]:
+    full_path = os.path.join(STATIC_DIR, path)
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        return None
+    token = (stat.st_mtime_ns, stat.st_size)
+    cached = _static_digests.get(path)
+    if cached is None or cached[0] != token:
+        with open(full_path, "rb") as f:
+            cached = (token, hashlib.sha256(f.read()).hexdigest()[:12])
+        _static_digests[path] = cached
+    return cached[1]
+
+
+def static_url(path: str, root_path: str = "") -> str:
+    digest = _static_digest(path)
+    url = f"{root_path}{STATIC_MOUNT_PATH}/{path}"
+    return f"{url}?v={digest}" if digest else url
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+            # Адрес с отпечатком содержимого меняется вместе с файлом, поэтому кэшируется навсегда.
+            # Модули, импортируемые из main.js по относительному пути, перепроверяются по ETag
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if "v" in query else "no-cache"
+        return response
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Mapping, Optional
+from . import accounts, config, metrics
+from .rate_limiter import rate_limiter
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+PHASE_IDLE = "idle"
+PHASE_STARTING = "starting"
+PHASE_DICTIONARIES = "dictionaries"
+PHASE_VACANCIES = "vacancies"
+PHASE_SAVING = "saving"
+
+_state: Dict[str, Any] = {
+    "is_updating": False,
+    "phase": PHASE_IDLE,
+    "vacancies_total": 0,
+    "vacancies_done": 0,
+    "requests": 0,
+    "elapsed_seconds": 0.0,
+    "eta_seconds": None,
+    "last_updated": None,
+}
+_run_started_at: Optional[float] = None
+_vacancies_started_at: Optional[float] = None
+_phase_started_at: Optional[float] = None
+_requests_at_start = 0
+# Несколько аккаунтов обновляются в одном общем запуске: учет вакансий ведется по каждому аккаунту
+_active_runs = 0
+_vacancies_total: Dict[Optional[int], int] = {}
+_vacancies_done: Dict[Optional[int], int] = {}
+# У ведомого воркера состояние копируется из статуса ведущего процесса
+_is_mirrored = False
+# В процессе обновления события этапов и вакансий передаются веб-процессу, а не применяются на месте
+_event_sink: Optional[Callable[[str, tuple], None]] = None
+# Получатели готовых строк вакансий (кэш публикует их до завершения обновления)
+_row_listeners: List[Callable[[Optional[int], Mapping[str, Any]], None]] = []
+# Запросы к Huntflow, выполненные процессом обновления
+_external_requests = 0
+# Подписчик получает события одного аккаунта (ключ аккаунта) или общий ход обновления (None)
+_subscribers: Dict[asyncio.Queue, Optional[str]] = {}
+# Ход обновления по аккаунтам: страница показывает только свой аккаунт
+_account_states: Dict[str, Dict[str, Any]] = {}
+_account_vacancies_started_at: Dict[str, float] = {}
+
+
+def _format_msk(value: Optional[datetime]) -> Optional[str]:
+    if not isinstance(value, datetime):
+        return None
+    return value.astimezone(timezone(timedelta(hours=3))).strftime('%d.%m.%Y %H:%M:%S')
+
+
+def account_key(account_id: Optional[int] = None) -> str:
+    return str(accounts.resolve_account_id(account_id))
+
+
+def _account_state(key: str) -> Dict[str, Any]:
+    state = _account_states.get(key)
+    if state is None:
+        state = _account_states[key] = {
+            "is_updating": False, "phase": PHASE_IDLE, "vacancies_total": 0, "vacancies_done": 0, "last_updated": None,
+        }
+    return state
+
+
+def get_requests_total() -> int:
+    return int(rate_limiter.get_stats()["requests"]) + _external_requests
+
+
+def set_external_requests(count: int) -> None:
+    global _external_requests
+    _external_requests = count
+
+
+def add_row_listener(listener: Callable[[Optional[int], Mapping[str, Any]], None]) -> None:
+    _row_listeners.append(listener)
+
+
+def set_event_sink(sink: Optional[Callable[[str, tuple], None]]) -> None:
+    global _event_sink
+    _event_sink = sink
+
+
+def _refresh_counters() -> None:
+    now = time.monotonic()
+    if _run_started_at is not None:
+        _state["elapsed_seconds"] = round(now - _run_started_at, 1)
+    _state["requests"] = get_requests_total() - _requests_at_start
+
+    done, total = _state["vacancies_done"], _state["vacancies_total"]
+    if _state["phase"] == PHASE_VACANCIES and _vacancies_started_at is not None and 0 < done < total:
+        _state["eta_seconds"] = round((now - _vacancies_started_at) / done * (total - done), 1)
+    elif _state["phase"] != PHASE_VACANCIES:
+        _state["eta_seconds"] = None
+
+
+def _broadcast(event: str, data: Mapping[str, Any], key: Optional[str] = None) -> None:
+    message = (event, dict(data))
+    for queue, scope in list(_subscribers.items()):
+        # Общий поток получает общий ход обновления и строки всех аккаунтов
+        if scope != key and not (scope is None and event == "row"):
+            continue
+        if queue.full():
+            # Медленный клиент теряет самое старое событие, а не тормозит обновление
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(message)
+
+
+def _publish_progress(key: Optional[str] = None) -> None:
+    _refresh_counters()
+    _broadcast("progress", _state)
+    if key is not None:
+        _broadcast("progress", get_account_progress(key=key), key)
+
+
+def get_progress() -> Dict[str, Any]:
+    if _state["is_updating"] and not _is_mirrored:
+        _refresh_counters()
+    return {**_state, "accounts": {key: dict(state) for key, state in _account_states.items()}}
+
+
+def get_account_progress(account_id: Optional[int] = None, key: Optional[str] = None) -> Dict[str, Any]:
+    key = key if key is not None else account_key(account_id)
+    if _state["is_updating"] and not _is_mirrored:
+        _refresh_counters()
+    # Запросы и длительность общие для запуска, этап и число вакансий — свои у аккаунта
+    progress = {**_state, **_account_state(key), "eta_seconds": None}
+    done, total = progress["vacancies_done"], progress["vacancies_total"]
+    started_at = _account_vacancies_started_at.get(key)
+    if progress["phase"] == PHASE_VACANCIES and started_at is not None and 0 < done < total and not _is_mirrored:
+        progress["eta_seconds"] = round((time.monotonic() - started_at) / done * (total - done), 1)
+    return progress
+
+
+def _close_phase(now: float) -> None:
+    if _phase_started_at is not None and _state["phase"] != PHASE_IDLE:
+        metrics.REFRESH_PHASE_DURATION.labels(_state["phase"]).observe(now - _phase_started_at)
+
+
+def start_run(last_updated: Optional[datetime] = None, account_id: Optional[int] = None) -> None:
+    global _run_started_at, _vacancies_started_at, _phase_started_at, _requests_at_start, _active_runs, _is_mirrored
+    _is_mirrored = False
+    _active_runs += 1
+    key = account_key(account_id)
+    _account_state(key).update({
+        "is_updating": True, "phase": PHASE_STARTING, "vacancies_total": 0, "vacancies_done": 0,
+        "last_updated": _format_msk(last_updated),
+    })
+    _account_vacancies_started_at.pop(key, None)
+    if _active_runs > 1:
+        # Независимое обновление другого аккаунта присоединяется к уже идущему запуску
+        _publish_progress(key)
+        return
+    _vacancies_total.clear()
+    _vacancies_done.clear()
+    _run_started_at = time.monotonic()
+    _phase_started_at = _run_started_at
+    _vacancies_started_at = None
+    _requests_at_start = get_requests_total()
+    _state.update({
+        "is_updating": True,
+        "phase": PHASE_STARTING,
+        "vacancies_total": 0,
+        "vacancies_done": 0,
+        "eta_seconds": None,
+        "last_updated": _format_msk(last_updated),
+    })
+    _publish_progress(key)
+
+
+def set_phase(phase: str, vacancies_total: Optional[int] = None, account_id: Optional[int] = None) -> None:
+    global _vacancies_started_at, _phase_started_at
+    if _event_sink is not None:
+        _event_sink("set_phase", (phase, vacancies_total))
+        return
+    now = time.monotonic()
+    _close_phase(now)
+    _phase_started_at = now
+    _state["phase"] = phase
+    if account_id is None:
+        account_id = accounts.current_account_id.get()
+    key = account_key(account_id)
+    account_state = _account_state(key)
+    account_state["phase"] = phase
+    if phase == PHASE_VACANCIES:
+        _account_vacancies_started_at[key] = now
+    if vacancies_total is not None:
+        account_state.update({"vacancies_total": vacancies_total, "vacancies_done": 0})
+        _vacancies_total[account_id] = vacancies_total
+        _vacancies_done[account_id] = 0
+        _state["vacancies_total"] = sum(_vacancies_total.values())
+        _state["vacancies_done"] = sum(_vacancies_done.values())
+    if phase == PHASE_VACANCIES:
+        _vacancies_started_at = now
+    _publish_progress(key)
+
+
+def vacancy_done(row: Mapping[str, Any]) -> None:
+    if _event_sink is not None:
+        _event_sink("vacancy_done", (dict(row),))
+        return
+    account_id = accounts.current_account_id.get()
+    key = account_key(account_id)
+    _vacancies_done[account_id] = _vacancies_done.get(account_id, 0) + 1
+    _state["vacancies_done"] += 1
+    _account_state(key)["vacancies_done"] += 1
+    _broadcast("row", {**row, "account_id": account_id}, key)
+    for listener in _row_listeners:
+        listener(account_id, row)
+    _publish_progress(key)
+
+
+def _finish_account(key: str, success: Optional[bool], last_updated: Optional[str]) -> None:
+    account_state = _account_state(key)
+    account_state.update({
+        "is_updating": False, "phase": PHASE_IDLE, "last_updated": last_updated or account_state["last_updated"],
+    })
+    _account_vacancies_started_at.pop(key, None)
+    _broadcast("progress", get_account_progress(key=key), key)
+    _broadcast("done", {"success": success, "last_updated": account_state["last_updated"]}, key)
+
+
+def finish_run(success: bool, last_updated: Optional[datetime] = None, account_id: Optional[int] = None) -> None:
+    global _active_runs
+    _active_runs = max(_active_runs - 1, 0)
+    _finish_account(account_key(account_id), success, _format_msk(last_updated))
+    if _active_runs:
+        metrics.REFRESH_RUNS.labels("success" if success else "failure").inc()
+        _publish_progress()
+        return
+    now = time.monotonic()
+    _close_phase(now)
+    if _run_started_at is not None:
+        metrics.REFRESH_DURATION.observe(now - _run_started_at)
+    metrics.REFRESH_RUNS.labels("success" if success else "failure").inc()
+    _refresh_counters()
+    _state.update({
+        "is_updating": False,
+        "phase": PHASE_IDLE,
+        "eta_seconds": None,
+        "last_updated": _format_msk(last_updated) or _state["last_updated"],
+    })
+    _broadcast("progress", _state)
+    _broadcast("done", {"success": success, "last_updated": _state["last_updated"]})
+
+
+def mirror(state: Mapping[str, Any]) -> None:
+    global _is_mirrored
+    if _active_runs:
+        return
+    _is_mirrored = True
+    was_updating = _state["is_updating"]
+    _state.update({key: state[key] for key in _state if key in state})
+    _broadcast("progress", _state)
+    if was_updating and not _state["is_updating"]:
+        _broadcast("done", {"success": None, "last_updated": _state["last_updated"]})
+    for key, account_state in (state.get("accounts") or {}).items():
+        was_account_updating = _account_state(key)["is_updating"]
+        if account_state.get("is_updating") or not was_account_updating:
+            _account_state(key).update(account_state)
+            _broadcast("progress", get_account_progress(key=key), key)
+        else:
+            _finish_account(key, None, account_state.get("last_updated"))
+
+
+def subscribe(account_id: Optional[int] = None, scoped: bool = False) -> asyncio.Queue:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=config.PROGRESS_QUEUE_SIZE)
+    _subscribers[queue] = account_key(account_id) if scoped else None
+    return queue
+
+
+def unsubscribe(queue: asyncio.Queue) -> None:
+    _subscribers.pop(queue, None)
+
+
+def format_sse(event: str, data: Mapping[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
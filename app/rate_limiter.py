@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from . import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+
+
+def parse_retry_after(value: Optional[str]) -> float:
+    if not value:
+        return DEFAULT_RETRY_AFTER_SECONDS
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SECONDS
+
+
+# Token bucket, общий для всех запросов к API Huntflow. После 429 скорость уменьшается вдвое,
+# а выдача токенов приостанавливается на Retry-After; успешные ответы плавно возвращают скорость к максимальной.
+class AdaptiveRateLimiter:
+    def __init__(self, max_rate: float, burst: int, min_rate: float = 1.0, recovery_step: float = 0.05):
+        self._max_rate = max_rate
+        self._min_rate = min(min_rate, max_rate)
+        self._rate = max_rate
+        self._burst = max(burst, 1)
+        self._recovery = max_rate * recovery_step
+        self._tokens = float(self._burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self._stats = {"requests": 0, "rate_limited": 0}
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._tokens = min(float(self._burst), self._tokens + elapsed * self._rate)
+        self._last_refill = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self._stats["requests"] += 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    def on_success(self) -> None:
+        if self._rate < self._max_rate:
+            self._rate = min(self._max_rate, self._rate + self._recovery)
+
+    def on_rate_limited(self, retry_after: float) -> None:
+        now = time.monotonic()
+        self._stats["rate_limited"] += 1
+        self._rate = max(self._min_rate, self._rate / 2)
+        self._tokens = 0.0
+        self._last_refill = now
+        self._blocked_until = max(self._blocked_until, now + retry_after)
+        logging.warning(
+            f"Huntflow вернул 429. Пауза {retry_after:.1f} с, скорость снижена до {self._rate:.1f} запр/с.")
+
+    def get_stats(self) -> Dict[str, float]:
+        return {**self._stats, "current_rate": round(self._rate, 2)}
+
+
+rate_limiter = AdaptiveRateLimiter(
+    max_rate=config.HUNTFLOW_RATE_LIMIT_RPS,
+    burst=config.HUNTFLOW_RATE_LIMIT_BURST,
+)
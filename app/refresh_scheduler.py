@@ -0,0 +1,252 @@
+import logging
+import math
+import time
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from . import accounts, cache_manager, config, progress
+from .snapshot import VACANCY_ID_KEY, VACANCY_NAME_KEY
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MSK_TZ = timezone(timedelta(hours=3))
+FULL_REFRESH_JOB_ID = "update_report_job"
+CYCLE_JOB_ID = "intraday_refresh_job"
+DECISIONS_LIMIT = 50
+# Сглаживание оценки числа запросов на одну вакансию
+COST_SMOOTHING = 0.3
+
+_scheduler: Optional[AsyncIOScheduler] = None
+_decisions: Deque[Dict[str, Any]] = deque(maxlen=DECISIONS_LIMIT)
+# Время последнего точечного обновления вакансии; после полного обновления действует время снимка
+_refreshed_at: Dict[Tuple[Optional[int], int], datetime] = {}
+_cost_per_vacancy = config.REFRESH_VACANCY_COST_ESTIMATE
+_budget_day: Optional[date] = None
+_requests_used = 0
+_requests_seen = 0
+# Ведомый воркер показывает состояние планировщика ведущего процесса
+_mirrored_status: Optional[Dict[str, Any]] = None
+
+
+def _observe_requests(now: datetime) -> None:
+    global _budget_day, _requests_used, _requests_seen
+    total = progress.get_requests_total()
+    # Счетчик процесса обновления начинается с нуля после его перезапуска
+    delta = total - _requests_seen if total >= _requests_seen else total
+    _requests_seen = total
+    today = now.astimezone(MSK_TZ).date()
+    if today != _budget_day:
+        _budget_day = today
+        _requests_used = 0
+    else:
+        _requests_used += delta
+
+
+def _remaining_budget() -> float:
+    if config.REFRESH_DAILY_REQUEST_BUDGET <= 0:
+        return math.inf
+    return max(config.REFRESH_DAILY_REQUEST_BUDGET - _requests_used, 0)
+
+
+def _record(decision: Dict[str, Any]) -> None:
+    _decisions.append(decision)
+    logging.info(f"Планировщик: {decision}")
+
+
+def _is_active_hour(now: datetime) -> bool:
+    start_hour, end_hour = config.REFRESH_ACTIVE_HOURS
+    return start_hour <= now.astimezone(MSK_TZ).hour < end_hour
+
+
+def _is_inactive(row: Dict[str, Any], now: datetime) -> bool:
+    last_activity = row.get("last_activity")
+    if not last_activity:
+        return False
+    last_activity_at = datetime.fromisoformat(last_activity)
+    if last_activity_at.tzinfo is None:
+        last_activity_at = last_activity_at.replace(tzinfo=timezone.utc)
+    return now - last_activity_at > timedelta(days=config.REFRESH_INACTIVE_DAYS)
+
+
+def _plan_account(account_id: Optional[int], now: datetime) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    snapshot = cache_manager.get_snapshot(account_id)
+    counts = {"not_due": 0, "inactive": 0}
+    due = []
+    for row in snapshot.vacancies:
+        vacancy_id = row.get(VACANCY_ID_KEY)
+        refreshed_at = max(filter(None, (_refreshed_at.get((account_id, vacancy_id)), snapshot.last_updated)), default=None)
+        is_priority = bool(row.get("is_priority"))
+        interval = timedelta(minutes=config.PRIORITY_REFRESH_MINUTES if is_priority else config.REGULAR_REFRESH_MINUTES)
+        if refreshed_at is not None and now - refreshed_at < interval:
+            counts["not_due"] += 1
+        elif not is_priority and _is_inactive(row, now):
+            counts["inactive"] += 1
+        else:
+            due.append({
+                "id": vacancy_id, "position": row.get(VACANCY_NAME_KEY), "is_priority": is_priority,
+                "refreshed_at": refreshed_at,
+            })
+    # Сначала приоритетные, внутри группы — самые давно обновленные
+    due.sort(key=lambda item: (not item["is_priority"], item["refreshed_at"] or datetime.min.replace(tzinfo=timezone.utc)))
+    return due, counts
+
+
+async def _refresh_account(account_id: Optional[int], now: datetime) -> Dict[str, Any]:
+    global _cost_per_vacancy
+    decision: Dict[str, Any] = {"type": "cycle", "account_id": account_id, "started_at": now.isoformat()}
+    if cache_manager.get_update_status(account_id):
+        return {**decision, "action": "skipped", "reason": "идет полное обновление"}
+
+    due, counts = _plan_account(account_id, now)
+    cycle_limit = min(config.REFRESH_CYCLE_MAX_VACANCIES, len(due))
+    remaining = _remaining_budget()
+    limit = cycle_limit if remaining == math.inf else min(cycle_limit, int(remaining // max(_cost_per_vacancy, 1)))
+    selected = due[:limit]
+    decision.update({
+        "due": len(due), "selected": len(selected), "priority_selected": sum(item["is_priority"] for item in selected),
+        "skipped_not_due": counts["not_due"], "skipped_inactive": counts["inactive"],
+        "deferred_by_cycle_limit": len(due) - cycle_limit, "deferred_by_budget": cycle_limit - limit,
+    })
+    if not selected:
+        return {**decision, "action": "idle"}
+
+    started = time.monotonic()
+    requests_before = progress.get_requests_total()
+    # Без чтения HTTP-кэша: срок хранения списка кандидатов сравним с интервалом цикла, а рекрутеров — дольше дня
+    # работы, и цикл тратил бы бюджет запросов, не видя изменений
+    rows = await cache_manager.refresh_vacancies(
+        [{"id": item["id"], "position": item["position"]} for item in selected], bypass_http_cache=True,
+        account_id=account_id
+    )
+    requests = max(progress.get_requests_total() - requests_before, 0)
+    decision.update({"duration_seconds": round(time.monotonic() - started, 1), "requests": requests})
+    if rows is None:
+        return {**decision, "action": "failed"}
+
+    # Отметка — время начала цикла: следующий цикл сравнивает с интервалом свое время начала,
+    # и длительность обновления не сдвигает вакансию на цикл позже. Пропущенные вакансии не отмечаются
+    for row in rows:
+        _refreshed_at[(account_id, row[VACANCY_ID_KEY])] = now
+    if rows:
+        _cost_per_vacancy += COST_SMOOTHING * (requests / len(rows) - _cost_per_vacancy)
+    return {**decision, "action": "refreshed", "refreshed": len(rows)}
+
+
+async def run_cycle() -> None:
+    now = datetime.now(timezone.utc)
+    _observe_requests(now)
+    if not _is_active_hour(now):
+        _record({"type": "cycle", "started_at": now.isoformat(), "action": "skipped", "reason": "вне рабочих часов"})
+        return
+    for account_id in accounts.get_account_ids() or [None]:
+        if _remaining_budget() <= 0:
+            _record({
+                "type": "cycle", "account_id": account_id, "started_at": now.isoformat(), "action": "skipped",
+                "reason": "исчерпан суточный бюджет запросов",
+            })
+            continue
+        try:
+            decision = await _refresh_account(account_id, now)
+        except Exception as e:
+            logging.error(f"Ошибка в цикле планировщика для аккаунта {account_id}: {e}", exc_info=True)
+            decision = {"type": "cycle", "account_id": account_id, "started_at": now.isoformat(), "action": "failed"}
+        _observe_requests(datetime.now(timezone.utc))
+        _record(decision)
+
+
+async def run_full_refresh() -> None:
+    started_at = datetime.now(timezone.utc)
+    _observe_requests(started_at)
+    started = time.monotonic()
+    requests_before = progress.get_requests_total()
+    await cache_manager.update_cached_data()
+    _observe_requests(datetime.now(timezone.utc))
+    _record({
+        "type": "full", "started_at": started_at.isoformat(), "action": "refreshed",
+        "duration_seconds": round(time.monotonic() - started, 1),
+        "requests": max(progress.get_requests_total() - requests_before, 0),
+    })
+
+
+def schedule_jobs(scheduler: AsyncIOScheduler) -> None:
+    global _scheduler
+    _scheduler = scheduler
+    scheduler.add_job(
+        run_full_refresh,
+        trigger="cron",
+        hour=config.FULL_REFRESH_HOUR,
+        minute=config.FULL_REFRESH_MINUTE,
+        timezone=MSK_TZ,
+        id=FULL_REFRESH_JOB_ID,
+        replace_existing=True
+    )
+    if config.INTRADAY_REFRESH:
+        # Разброс времени запуска не дает циклам совпадать с чужими задачами, бьющими в API в ровные минуты
+        scheduler.add_job(
+            run_cycle,
+            trigger="interval",
+            minutes=config.REFRESH_CYCLE_MINUTES,
+            jitter=config.REFRESH_CYCLE_JITTER_SECONDS,
+            id=CYCLE_JOB_ID,
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
+
+def _next_run(job_id: str) -> Optional[str]:
+    job = _scheduler.get_job(job_id) if _scheduler is not None else None
+    next_run_time = getattr(job, "next_run_time", None)
+    return next_run_time.isoformat() if next_run_time else None
+
+
+def _freshness(account_id: Optional[int]) -> Dict[str, Any]:
+    snapshot = cache_manager.get_snapshot(account_id)
+    oldest: Dict[str, Optional[datetime]] = {"priority": None, "regular": None}
+    for row in snapshot.vacancies:
+        group = "priority" if row.get("is_priority") else "regular"
+        refreshed_at = max(
+            filter(None, (_refreshed_at.get((account_id, row.get(VACANCY_ID_KEY))), snapshot.last_updated)), default=None
+        )
+        if refreshed_at is not None and (oldest[group] is None or refreshed_at < oldest[group]):
+            oldest[group] = refreshed_at
+    return {
+        "account_id": account_id,
+        **{f"{group}_oldest_refresh": value.isoformat() if value else None for group, value in oldest.items()},
+    }
+
+
+def get_status() -> Dict[str, Any]:
+    if _scheduler is None and _mirrored_status is not None:
+        return _mirrored_status
+    if _scheduler is not None:
+        _observe_requests(datetime.now(timezone.utc))
+    return {
+        "is_running": bool(_scheduler is not None and _scheduler.running),
+        "next_full_refresh": _next_run(FULL_REFRESH_JOB_ID),
+        "next_cycle": _next_run(CYCLE_JOB_ID),
+        "settings": {
+            "intraday_refresh": config.INTRADAY_REFRESH,
+            "cycle_minutes": config.REFRESH_CYCLE_MINUTES,
+            "cycle_jitter_seconds": config.REFRESH_CYCLE_JITTER_SECONDS,
+            "active_hours_msk": list(config.REFRESH_ACTIVE_HOURS),
+            "priority_refresh_minutes": config.PRIORITY_REFRESH_MINUTES,
+            "regular_refresh_minutes": config.REGULAR_REFRESH_MINUTES,
+            "inactive_days": config.REFRESH_INACTIVE_DAYS,
+            "cycle_max_vacancies": config.REFRESH_CYCLE_MAX_VACANCIES,
+        },
+        "budget": {
+            "daily_requests": config.REFRESH_DAILY_REQUEST_BUDGET or None,
+            "used_today": _requests_used,
+            "remaining": None if _remaining_budget() == math.inf else _remaining_budget(),
+            "requests_per_vacancy": round(_cost_per_vacancy, 1),
+        },
+        "freshness": [_freshness(account_id) for account_id in accounts.get_account_ids() or [None]],
+        "decisions": list(reversed(_decisions)),
+    }
+
+
+def mirror(status: Optional[Dict[str, Any]]) -> None:
+    global _mirrored_status
+    _mirrored_status = status
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+import threading
+import uuid
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional
+from . import accounts, config, http_pool, metrics, progress, report_generator
+from .rate_limiter import rate_limiter
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+METRICS_INTERVAL_SECONDS = 5
+WORKER_STOP_TIMEOUT_SECONDS = 5
+
+# Сбор данных из Huntflow и расчет воронки выполняются в отдельном процессе, чтобы разбор JSON и дат
+# не занимал цикл событий, который отвечает пользователям. Процесс один: он держит общий лимит запросов,
+# токен и состояние синхронизации для всех запусков
+_process: Optional[multiprocessing.Process] = None
+_conn: Optional[Connection] = None
+_pending: Dict[str, asyncio.Future] = {}
+
+
+def is_enabled() -> bool:
+    return config.REFRESH_WORKER == "process"
+
+
+def _dispatch(message: tuple) -> None:
+    kind = message[0]
+    if kind == "result":
+        _, job_id, result = message
+        future = _pending.pop(job_id, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+    elif kind == "progress":
+        _, event, args, account_id = message
+        with accounts.use_account(account_id):
+            getattr(progress, event)(*args)
+    elif kind == "metrics":
+        _, families, requests = message
+        metrics.set_external_families(families)
+        progress.set_external_requests(requests)
+
+
+def _on_worker_exit(conn: Connection) -> None:
+    global _process, _conn
+    if conn is not _conn:
+        return
+    logging.error("Процесс обновления отчета завершился. Он будет перезапущен при следующем обновлении.")
+    _process = None
+    _conn = None
+    for future in _pending.values():
+        if not future.done():
+            future.set_result(None)
+    _pending.clear()
+
+
+def _read_messages(conn: Connection, loop: asyncio.AbstractEventLoop) -> None:
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        loop.call_soon_threadsafe(_dispatch, message)
+    try:
+        loop.call_soon_threadsafe(_on_worker_exit, conn)
+    except RuntimeError:
+        # Цикл событий уже закрыт при остановке приложения
+        pass
+
+
+def _ensure_worker() -> Connection:
+    global _process, _conn
+    if _conn is not None and _process is not None and _process.is_alive():
+        return _conn
+    # spawn, а не fork: родитель уже держит цикл событий, потоки и открытые соединения
+    context = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=_worker_main, args=(child_conn,), name="report-refresh-worker", daemon=True)
+    process.start()
+    child_conn.close()
+    _process = process
+    _conn = parent_conn
+    threading.Thread(
+        target=_read_messages, args=(parent_conn, asyncio.get_running_loop()), name="report-refresh-reader", daemon=True
+    ).start()
+    logging.info(f"Запущен процесс обновления отчета (pid {process.pid}).")
+    return parent_conn
+
+
+async def _call(command: str, *args: Any) -> Any:
+    conn = _ensure_worker()
+    job_id = uuid.uuid4().hex
+    future = asyncio.get_running_loop().create_future()
+    _pending[job_id] = future
+    try:
+        conn.send((command, job_id, args))
+        return await future
+    except (OSError, ValueError) as e:
+        logging.error(f"Не удалось передать задание процессу обновления: {e}")
+        return None
+    except asyncio.CancelledError:
+        try:
+            conn.send(("cancel", job_id, ()))
+        except (OSError, ValueError):
+            pass
+        raise
+    finally:
+        _pending.pop(job_id, None)
+
+
+async def discover_accounts(bypass_http_cache: bool = False) -> Optional[List[Dict[str, Any]]]:
+    if not is_enabled():
+        return await report_generator.discover_accounts(bypass_http_cache)
+    account_list = await _call("discover_accounts", bypass_http_cache)
+    if account_list is not None:
+        await accounts.remember_accounts(account_list)
+    return account_list
+
+
+async def generate_report(bypass_http_cache: bool = False, account_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    if not is_enabled():
+        return await report_generator.generate_recruitment_funnel_report(bypass_http_cache, account_id)
+    return await _call("generate_report", bypass_http_cache, account_id)
+
+
+async def generate_vacancy_rows(
+    vacancies: List[Dict[str, Any]],
+    bypass_http_cache: bool = False,
+    account_id: Optional[int] = None
+) -> Optional[List[Dict[str, Any]]]:
+    if not is_enabled():
+        return await report_generator.generate_vacancy_rows(vacancies, bypass_http_cache, account_id)
+    return await _call("generate_vacancy_rows", vacancies, bypass_http_cache, account_id)
+
+
+def shutdown() -> None:
+    global _process, _conn
+    if _conn is not None:
+        # Процесс обновления завершается сам, когда канал закрыт
+        _conn.close()
+    if _process is not None:
+        _process.join(WORKER_STOP_TIMEOUT_SECONDS)
+        if _process.is_alive():
+            _process.terminate()
+    _process = None
+    _conn = None
+
+
+# --- Процесс обновления ---
+
+_JOBS = {
+    "discover_accounts": report_generator.discover_accounts,
+    "generate_report": report_generator.generate_recruitment_funnel_report,
+    "generate_vacancy_rows": report_generator.generate_vacancy_rows,
+}
+
+
+def _send_metrics(conn: Connection) -> None:
+    conn.send(("metrics", metrics.export_families(), int(rate_limiter.get_stats()["requests"])))
+
+
+async def _run_job(conn: Connection, command: str, job_id: str, args: tuple) -> None:
+    try:
+        result = await _JOBS[command](*args)
+    except asyncio.CancelledError:
+        logging.info(f"Задание {command} ({job_id}) отменено.")
+        return
+    except Exception as e:
+        logging.error(f"Ошибка при выполнении задания {command} в процессе обновления: {e}", exc_info=True)
+        result = None
+    # Метрики отправляются раньше результата: веб-процесс видит число запросов уже завершенного задания
+    _send_metrics(conn)
+    conn.send(("result", job_id, result))
+
+
+async def _publish_metrics(conn: Connection, jobs: Dict[str, asyncio.Task]) -> None:
+    while True:
+        await asyncio.sleep(METRICS_INTERVAL_SECONDS)
+        if jobs:
+            _send_metrics(conn)
+
+
+async def _serve(conn: Connection) -> None:
+    accounts.load_accounts()
+    jobs: Dict[str, asyncio.Task] = {}
+    progress.set_event_sink(
+        lambda event, args: conn.send(("progress", event, args, accounts.current_account_id.get()))
+    )
+    metrics_task = asyncio.create_task(_publish_metrics(conn, jobs))
+    while True:
+        try:
+            command, job_id, args = await asyncio.to_thread(conn.recv)
+        except (EOFError, OSError):
+            break
+        if command == "cancel":
+            if job_id in jobs:
+                jobs[job_id].cancel()
+            continue
+        task = asyncio.create_task(_run_job(conn, command, job_id, args))
+        jobs[job_id] = task
+        task.add_done_callback(lambda _, finished_id=job_id: jobs.pop(finished_id, None))
+
+    remaining = [*jobs.values(), metrics_task]
+    for task in remaining:
+        task.cancel()
+    await asyncio.gather(*remaining, return_exceptions=True)
+    await http_pool.close_http_client()
+
+
+def _worker_main(conn: Connection) -> None:
+    # Ctrl+C получает вся группа процессов; процесс обновления останавливается по закрытию канала
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(conn))
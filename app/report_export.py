@@ -0,0 +1,166 @@
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO, StringIO
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+from . import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SHEET_TITLE = "Воронка кандидатов"
+PRIORITY_COLOR = "FFFF99"
+CSV_BATCH_SIZE = 500
+
+_executor: Optional[ProcessPoolExecutor] = None
+_memory_cache: "OrderedDict[Tuple, bytes]" = OrderedDict()
+_in_flight: Dict[Tuple, asyncio.Future] = {}
+
+
+def _row_values(row_data: Dict[str, Any], headers: Sequence[str]) -> List[Any]:
+    values = []
+    for header in headers:
+        cell_data = row_data.get(header)
+        if isinstance(cell_data, dict):
+            values.append(f"{cell_data.get('total', 0)} ({cell_data.get('current', 0)})")
+        else:
+            values.append(cell_data if cell_data is not None else "")
+    return values
+
+
+def build_xlsx_bytes(data: List[Dict[str, Any]], headers: Sequence[str]) -> bytes:
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=SHEET_TITLE)
+    priority_fill = PatternFill(start_color=PRIORITY_COLOR, end_color=PRIORITY_COLOR, fill_type="solid")
+    sheet.append(list(headers))
+
+    for row_data in data:
+        values = _row_values(row_data, headers)
+        if row_data.get('is_priority', False):
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(sheet, value=value)
+                cell.fill = priority_fill
+                cells.append(cell)
+            sheet.append(cells)
+        else:
+            sheet.append(values)
+
+    virtual_workbook = BytesIO()
+    workbook.save(virtual_workbook)
+    return virtual_workbook.getvalue()
+
+
+def iter_csv_report(data: List[Dict[str, Any]], headers: Sequence[str]) -> Iterator[str]:
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    # BOM нужен, чтобы Excel открыл файл в UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(headers)
+    for index, row_data in enumerate(data, start=1):
+        writer.writerow(_row_values(row_data, headers))
+        if index % CSV_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _rows_digest(data: List[Dict[str, Any]], headers: Sequence[str]) -> str:
+    payload = json.dumps([list(headers), data], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _read_file(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_file(path: str, content: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+    exports = sorted(
+        (entry for entry in os.scandir(os.path.dirname(path)) if entry.name.endswith(".xlsx")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for stale in exports[config.EXPORT_DISK_ENTRIES:]:
+        try:
+            os.remove(stale.path)
+        except FileNotFoundError:
+            pass
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if config.EXPORT_WORKERS <= 0:
+        return None
+    if _executor is None:
+        # spawn, а не fork: веб-процесс держит цикл событий, потоки и открытые соединения
+        _executor = ProcessPoolExecutor(
+            max_workers=config.EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _build_or_load_xlsx(data: List[Dict[str, Any]], headers: Sequence[str]) -> bytes:
+    digest = await asyncio.to_thread(_rows_digest, data, headers)
+    path = os.path.join(config.EXPORT_CACHE_DIR, f"hiring_funnel_report_{digest}.xlsx")
+    cached_file = await asyncio.to_thread(_read_file, path)
+    if cached_file is not None:
+        logging.info(f"XLSX-отчет отдан из дискового кэша {path}.")
+        return cached_file
+
+    executor = _get_executor()
+    if executor is not None:
+        content = await asyncio.get_running_loop().run_in_executor(executor, build_xlsx_bytes, data, list(headers))
+    else:
+        content = await asyncio.to_thread(build_xlsx_bytes, data, list(headers))
+
+    try:
+        await asyncio.to_thread(_write_file, path, content)
+    except Exception as e:
+        logging.warning(f"Не удалось сохранить XLSX-отчет в дисковый кэш: {e}")
+    return content
+
+
+async def get_xlsx_report(data: List[Dict[str, Any]], headers: Sequence[str], version_key: Tuple) -> bytes:
+    key = ("xlsx",) + tuple(version_key)
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return _memory_cache[key]
+
+    future = _in_flight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_build_or_load_xlsx(data, headers))
+        _in_flight[key] = future
+        future.add_done_callback(lambda _: _in_flight.pop(key, None))
+
+    content = await asyncio.shield(future)
+    _memory_cache[key] = content
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > config.EXPORT_MEMORY_ENTRIES:
+        _memory_cache.popitem(last=False)
+    return content
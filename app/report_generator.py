@@ -1,14 +1,18 @@
 import asyncio
-import openpyxl
+from bisect import bisect_right
 from huntflow_api_client import HuntflowAPI
+from huntflow_api_client.errors import AuthorizationError
 from huntflow_api_client.tokens.token import ApiToken
-import httpx
-from openpyxl.styles import PatternFill
-from datetime import datetime, timedelta, timezone, time
+from itertools import groupby
+from operator import itemgetter
+from datetime import date, datetime, timedelta, timezone, time
 import logging
 from io import BytesIO
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, AsyncIterator, List, Optional, Sequence, Set, Tuple
 import traceback
+from . import accounts, checkpoint, config, event_store, metrics, progress, report_export, sync_state
+from .http_cache import classify_endpoint
+from .huntflow_client import create_api_client
 from .token_manager import token_proxy
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,6 +30,20 @@ HUNTFLOW_STATUSES_TO_COLUMNS = {
     "Интервью с заказчиком": "интервью с заказчиком", "Финальное интервью": "финальное интервью",
     "Выставлен оффер": "выставлен оффер", "Вышел на работу": "вышел на работу",
 }
+REPORT_HEADERS = ["название вакансии"] + FUNNEL_STAGES_ORDER + ["комментарий"]
+PAGE_SIZE = 100
+
+# Лимит параллельной обработки кандидатов общий для всех вакансий аккаунта; общий для всех аккаунтов
+# бюджет запросов к Huntflow задает rate_limiter
+_applicant_semaphores: Dict[Optional[int], asyncio.Semaphore] = {}
+
+
+def _get_applicant_semaphore() -> asyncio.Semaphore:
+    account_id = accounts.current_account_id.get()
+    semaphore = _applicant_semaphores.get(account_id)
+    if semaphore is None:
+        semaphore = _applicant_semaphores[account_id] = asyncio.Semaphore(config.APPLICANT_CONCURRENCY)
+    return semaphore
 
 
 def get_report_week_range(today: datetime) -> Tuple[datetime, datetime]:
@@ -45,89 +63,278 @@ def get_report_week_range(today: datetime) -> Tuple[datetime, datetime]:
 
     return start_date.astimezone(timezone.utc), end_date.astimezone(timezone.utc)
 
-async def _fetch_all_paginated_items(api_client: HuntflowAPI, url: str, params: Dict = None) -> List[Dict]:
-    all_items = []
+
+def get_date_range(start_day: date, end_day: date) -> Tuple[datetime, datetime]:
+    msk_tz = timezone(timedelta(hours=3))
+    start_date = datetime.combine(start_day, time.min, tzinfo=msk_tz)
+    end_date = datetime.combine(end_day, time.max, tzinfo=msk_tz)
+    return start_date.astimezone(timezone.utc), end_date.astimezone(timezone.utc)
+
+async def _fetch_page(
+    api_client: HuntflowAPI,
+    url: str,
+    base_params: Dict,
+    page: int,
+    cache_tag: Optional[str] = None
+) -> Dict:
+    params = {**base_params, "page": page, "count": PAGE_SIZE}
+    response = await api_client.request("GET", url, params=params, cache_tag=cache_tag)
+    metrics.HUNTFLOW_PAGES.labels(classify_endpoint(url)).inc()
+    return response.json()
+
+
+async def _iter_paginated_items(
+    api_client: HuntflowAPI,
+    url: str,
+    params: Dict = None,
+    concurrency: Optional[int] = None
+) -> AsyncIterator[Dict]:
+    base_params = params.copy() if params else {}
+    first_page = await _fetch_page(api_client, url, base_params, 1)
+    items = first_page.get("items", [])
+    if not items:
+        return
+    for item in items:
+        yield item
+
+    total_pages = first_page.get("total_pages", 1)
+    if total_pages <= 1:
+        return
+
+    semaphore = asyncio.Semaphore(concurrency or config.PAGE_CONCURRENCY)
+
+    async def fetch_with_semaphore(page: int) -> Dict:
+        async with semaphore:
+            return await _fetch_page(api_client, url, base_params, page)
+
+    tasks = [asyncio.ensure_future(fetch_with_semaphore(page)) for page in range(2, total_pages + 1)]
+    try:
+        for task in tasks:
+            page_items = (await task).get("items", [])
+            if not page_items:
+                break
+            for item in page_items:
+                yield item
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _fetch_all_paginated_items(
+    api_client: HuntflowAPI,
+    url: str,
+    params: Dict = None,
+    concurrency: Optional[int] = None
+) -> List[Dict]:
+    return [item async for item in _iter_paginated_items(api_client, url, params, concurrency)]
+
+
+def _applicant_change_marker(applicant: Dict, vacancy_id: int) -> Optional[str]:
+    for link in applicant.get("links") or []:
+        if link.get("vacancy") == vacancy_id:
+            return link.get("updated")
+    return None
+
+
+def _is_inactive_since(applicant: Dict, vacancy_id: int, since: datetime) -> bool:
+    marker = _applicant_change_marker(applicant, vacancy_id)
+    if not marker:
+        return False
+    return datetime.fromisoformat(marker) < since
+
+
+async def _fetch_new_applicant_logs(
+    api_client: HuntflowAPI,
+    logs_url: str,
+    vacancy_id: int,
+    known_log_ids: Set[int],
+    since: Optional[datetime] = None,
+    cache_tag: Optional[str] = None
+) -> List[Dict]:
+    new_logs = []
     current_page = 1
     total_pages = 1
-    base_params = params.copy() if params else {}
 
     while current_page <= total_pages:
-        base_params["page"] = current_page
-        base_params["count"] = 100
-        response = await api_client.request("GET", url, params=base_params)
-        data = response.json()
+        data = await _fetch_page(api_client, logs_url, {"vacancy": vacancy_id}, current_page, cache_tag)
         items = data.get("items", [])
         if not items:
             break
-        all_items.extend(items)
+
+        reached_known_log = False
+        for log in items:
+            if log.get("id") in known_log_ids:
+                reached_known_log = True
+                break
+            new_logs.append(log)
+        if reached_known_log:
+            break
+        # Логи приходят от новых к старым: страница, ушедшая раньше начала окна, последняя нужная
+        oldest_created = items[-1].get("created")
+        if since is not None and oldest_created and datetime.fromisoformat(oldest_created) < since:
+            break
+
         if current_page == 1:
             total_pages = data.get("total_pages", 1)
         current_page += 1
-    return all_items
+    return new_logs
 
 
-async def _process_applicant_logs(
+async def _sync_applicant_logs(
     api_client: HuntflowAPI,
     account_id: int,
     applicant: Dict,
     vacancy_id: int,
-    status_id_to_name_map: Dict,
-    start_date: datetime,
-    end_date: datetime
-) -> Dict:
-    weekly_counts = {stage: 0 for stage in FUNNEL_STAGES_ORDER}
+    since: Optional[datetime] = None
+) -> List[List]:
     applicant_id = applicant.get("id")
-    counted_stages = set()
+    marker = _applicant_change_marker(applicant, vacancy_id)
+    entry = sync_state.get_applicant_entry(vacancy_id, applicant_id) if config.INCREMENTAL_SYNC else None
+    since_iso = since.isoformat() if since is not None else None
+    stored_since = entry.get("since") if entry is not None else None
+    # История, обрезанная по окну, не годится для полной загрузки и для окна, начинающегося раньше
+    if stored_since is not None and (since is None or datetime.fromisoformat(stored_since) > since):
+        entry = None
+
+    if entry is not None and marker is not None and entry.get("marker") == marker:
+        sync_state.mark_unchanged(vacancy_id, applicant_id)
+        return entry["logs"]
+
+    stored_logs = entry["logs"] if entry is not None else []
+    known_log_ids = {log[sync_state.LOG_ID] for log in stored_logs}
+    logs_url = f"/accounts/{account_id}/applicants/{applicant_id}/logs"
+    new_logs = await _fetch_new_applicant_logs(
+        api_client, logs_url, vacancy_id, known_log_ids, since, cache_tag=marker
+    )
+
+    logs = stored_logs + [sync_state.compact_log(log) for log in reversed(new_logs)]
+    if since is not None:
+        logs = [
+            log for log in logs
+            if log[sync_state.LOG_CREATED] and datetime.fromisoformat(log[sync_state.LOG_CREATED]) >= since
+        ]
+    sync_state.set_applicant_entry(vacancy_id, applicant_id, marker, logs, since_iso)
+    return logs
+
+
+def _count_stages_by_period(
+    events: Sequence[Tuple[str, Optional[int], Optional[float]]],
+    status_id_to_name_map: Dict,
+    period_starts: Sequence[float],
+    period_ends: Sequence[float]
+) -> Dict[int, Dict[str, int]]:
+    period_counts: Dict[int, Dict[str, int]] = {}
+    counted_stages: Dict[int, Set[str]] = {}
 
     STAGES_WITHOUT_COMMENT = {"коннект", "выставлен оффер", "вышел на работу"}
 
-    try:
-        logs_url = f"/accounts/{account_id}/applicants/{applicant_id}/logs"
-        all_logs = await _fetch_all_paginated_items(api_client, logs_url, params={"vacancy": vacancy_id})
-        logs = list(reversed(all_logs))
+    for i, (event_type, status_id, created_ts) in enumerate(events):
+        if event_type != "STATUS" or created_ts is None:
+            continue
+
+        period = bisect_right(period_starts, created_ts) - 1
+        if period < 0 or created_ts > period_ends[period]:
+            continue
+
+        status_name = status_id_to_name_map.get(status_id)
+        column_name = HUNTFLOW_STATUSES_TO_COLUMNS.get(status_name)
 
-        for i, log in enumerate(logs):
-            if log.get("type") != "STATUS":
-                continue
+        if not column_name:
+            continue
 
-            created_at_str = log.get("created")
-            if not created_at_str:
-                continue
+        should_count_stage = False
+        next_log_exists = (i + 1) < len(events)
 
-            log_date = datetime.fromisoformat(created_at_str)
-            if not (start_date <= log_date <= end_date):
-                continue
+        if column_name in STAGES_WITHOUT_COMMENT:
+            should_count_stage = True
 
-            status_name = status_id_to_name_map.get(log.get("status"))
-            column_name = HUNTFLOW_STATUSES_TO_COLUMNS.get(status_name)
+        elif next_log_exists and events[i + 1][0] == "COMMENT":
+            should_count_stage = True
 
-            if not column_name:
-                continue
+        elif next_log_exists and events[i + 1][0] == "STATUS":
+            should_count_stage = True
+
+        if should_count_stage:
+            counts = period_counts.get(period)
+            if counts is None:
+                counts = period_counts[period] = {stage: 0 for stage in FUNNEL_STAGES_ORDER}
+                counted_stages[period] = set()
+            stage_index = FUNNEL_STAGES_ORDER.index(column_name)
+            for stage in FUNNEL_STAGES_ORDER[0:stage_index + 1]:
+                if stage not in counted_stages[period]:
+                    counts[stage] += 1
+                    counted_stages[period].add(stage)
+
+    return period_counts
+
+
+def _count_weekly_stages(
+    logs: List[List],
+    status_id_to_name_map: Dict,
+    start_date: datetime,
+    end_date: datetime
+) -> Dict:
+    events = [
+        (
+            log[sync_state.LOG_TYPE],
+            log[sync_state.LOG_STATUS],
+            datetime.fromisoformat(log[sync_state.LOG_CREATED]).timestamp()
+            if log[sync_state.LOG_TYPE] == "STATUS" and log[sync_state.LOG_CREATED] else None,
+        )
+        for log in logs
+    ]
+    period_counts = _count_stages_by_period(
+        events, status_id_to_name_map, [start_date.timestamp()], [end_date.timestamp()]
+    )
+    return period_counts.get(0) or {stage: 0 for stage in FUNNEL_STAGES_ORDER}
 
-            should_count_stage = False
-            next_log_exists = (i + 1) < len(logs)
 
-            if column_name in STAGES_WITHOUT_COMMENT:
-                should_count_stage = True
+def _collect_applicant_columns(
+    logs: List[List],
+    applicant: Dict,
+    vacancy_id: int,
+    status_id_to_name_map: Dict
+) -> Set[str]:
+    status_ids = {log[sync_state.LOG_STATUS] for log in logs if log[sync_state.LOG_STATUS]}
+    for link in applicant.get("links") or []:
+        if link.get("vacancy") == vacancy_id and link.get("status"):
+            status_ids.add(link["status"])
 
-            elif next_log_exists and logs[i + 1].get("type") == "COMMENT":
-                should_count_stage = True
+    columns = set()
+    for status_id in status_ids:
+        column_name = HUNTFLOW_STATUSES_TO_COLUMNS.get(status_id_to_name_map.get(status_id))
+        if column_name:
+            columns.add(column_name)
+    return columns
 
-            elif next_log_exists and logs[i + 1].get("type") == "STATUS":
-                should_count_stage = True
 
-            if should_count_stage:
-                stage_index = FUNNEL_STAGES_ORDER.index(column_name)
-                for stage in FUNNEL_STAGES_ORDER[0:stage_index + 1]:
-                    if stage not in counted_stages:
-                        weekly_counts[stage] += 1
-                        counted_stages.add(stage)
+async def _process_applicant_logs(
+    api_client: HuntflowAPI,
+    account_id: int,
+    applicant: Dict,
+    vacancy_id: int,
+    status_id_to_name_map: Dict,
+    start_date: datetime,
+    end_date: datetime
+) -> Tuple[Dict, Set[str]]:
+    applicant_id = applicant.get("id")
+    windowed = config.LOG_FETCH_MODE == "window"
+    if windowed and _is_inactive_since(applicant, vacancy_id, start_date):
+        return {stage: 0 for stage in FUNNEL_STAGES_ORDER}, set()
 
+    # Ошибка загрузки логов уходит выше: вакансия повторяется целиком, а не считается с нулями
+    logs = await _sync_applicant_logs(
+        api_client, account_id, applicant, vacancy_id, since=start_date if windowed else None
+    )
+    try:
+        weekly_counts = _count_weekly_stages(logs, status_id_to_name_map, start_date, end_date)
+        return weekly_counts, _collect_applicant_columns(logs, applicant, vacancy_id, status_id_to_name_map)
     except Exception as e:
         logging.warning(
-            f"Ошибка при обработке логов кандидата {applicant_id} для вакансии {vacancy_id}: {e}\n{traceback.format_exc()}")
-
-    return weekly_counts
+            f"Ошибка при разборе логов кандидата {applicant_id} для вакансии {vacancy_id}: {e}\n{traceback.format_exc()}")
+        return {stage: 0 for stage in FUNNEL_STAGES_ORDER}, set()
 
 
 async def _build_funnel_row(
@@ -142,38 +349,76 @@ async def _build_funnel_row(
     vacancy_id = vacancy["id"]
     member_ids = await get_vacancy_coworkers(api_client, account_id, vacancy_id)
 
-    funnel_row = {"название вакансии": vacancy_position, "is_priority": vacancy_position in PRIORITY_VACANCIES,
-                  "members": member_ids}
+    funnel_row = {"id": vacancy_id, "название вакансии": vacancy_position,
+                  "is_priority": vacancy_position in PRIORITY_VACANCIES, "members": member_ids}
     for column_name in FUNNEL_STAGES_ORDER:
         funnel_row[column_name] = {"total": 0, "current": 0}
 
-    weekly_counts = await get_factual_weekly_funnel_counts(
+    weekly_counts, total_counts, funnel_row["last_activity"] = await get_factual_weekly_funnel_counts(
         api_client, account_id, vacancy_id, status_maps['id_to_name'], start_date, end_date
     )
     for stage_name, count in weekly_counts.items():
         funnel_row[stage_name]["current"] = count
 
-    for status_hf, column in HUNTFLOW_STATUSES_TO_COLUMNS.items():
-        status_id = status_maps['name_to_id'].get(status_hf)
-        if status_id:
-            total_count = await get_total_applicants_on_stage(api_client, account_id, vacancy_id, status_id)
-            funnel_row[column]["total"] = total_count
+    if config.LOG_FETCH_MODE == "window":
+        # В оконном режиме полной истории нет, поэтому итоги берутся из API
+        total_counts = await _get_api_stage_totals(api_client, account_id, vacancy_id, status_maps, total_counts)
+    elif config.FUNNEL_TOTALS_MODE == "verify":
+        total_counts = await _verify_stage_totals(api_client, account_id, vacancy_id, status_maps, total_counts)
+    for stage_name, count in total_counts.items():
+        funnel_row[stage_name]["total"] = count
 
     return funnel_row
 
 
+async def _get_api_stage_totals(
+    api_client: HuntflowAPI,
+    account_id: int,
+    vacancy_id: int,
+    status_maps: Dict,
+    default_totals: Dict
+) -> Dict:
+    columns_with_ids = [
+        (column, status_maps['name_to_id'][status_hf])
+        for status_hf, column in HUNTFLOW_STATUSES_TO_COLUMNS.items()
+        if status_maps['name_to_id'].get(status_hf)
+    ]
+    api_counts = await asyncio.gather(*(
+        get_total_applicants_on_stage(api_client, account_id, vacancy_id, status_id)
+        for _, status_id in columns_with_ids
+    ))
+
+    api_totals = dict(default_totals)
+    for (column, _), api_count in zip(columns_with_ids, api_counts):
+        api_totals[column] = api_count
+    return api_totals
+
+
+async def _verify_stage_totals(
+    api_client: HuntflowAPI,
+    account_id: int,
+    vacancy_id: int,
+    status_maps: Dict,
+    local_totals: Dict
+) -> Dict:
+    api_totals = await _get_api_stage_totals(api_client, account_id, vacancy_id, status_maps, local_totals)
+    for column, api_count in api_totals.items():
+        if api_count != local_totals.get(column, 0):
+            logging.warning(
+                f"Расхождение итогов для вакансии {vacancy_id}, этап '{column}': "
+                f"локально {local_totals.get(column, 0)}, API {api_count}.")
+    return api_totals
+
+
 async def get_vacancy_coworkers(api_client: HuntflowAPI, account_id: int, vacancy_id: int) -> List[int]:
-    try:
-        params = {
-            "vacancy_id": [vacancy_id],
-            "type": ["owner", "manager"]
-        }
-        response = await api_client.request("GET", f"/accounts/{account_id}/coworkers", params=params)
-        data = response.json()
-        return [item['id'] for item in data.get("items", [])]
-    except Exception as e:
-        logging.error(f"Не удалось получить рекрутеров для вакансии {vacancy_id}: {e}")
-        return []
+    # Без обработки ошибок: пустой список рекрутеров попал бы в отчет как готовый результат
+    params = {
+        "vacancy_id": [vacancy_id],
+        "type": ["owner", "manager"]
+    }
+    response = await api_client.request("GET", f"/accounts/{account_id}/coworkers", params=params)
+    data = response.json()
+    return [item['id'] for item in data.get("items", [])]
 
 
 async def get_coworkers(api_client: HuntflowAPI, account_id: int) -> Dict[int, str]:
@@ -189,14 +434,10 @@ async def get_coworkers(api_client: HuntflowAPI, account_id: int) -> Dict[int, s
 
 
 async def get_total_applicants_on_stage(api_client: HuntflowAPI, account_id: int, vacancy_id: int, status_id: int) -> int:
-    try:
-        url = f"/accounts/{account_id}/applicants/search"
-        params = {"vacancy": [vacancy_id], "status": [status_id], "only_current_status": "false", "count": 1}
-        response = await api_client.request("GET", url, params=params)
-        return response.json().get("total_items", 0)
-    except Exception as e:
-        logging.error(f"Ошибка при получении общего числа для status_id {status_id}: {e}")
-        return 0
+    url = f"/accounts/{account_id}/applicants/search"
+    params = {"vacancy": [vacancy_id], "status": [status_id], "only_current_status": "false", "count": 1}
+    response = await api_client.request("GET", url, params=params)
+    return response.json().get("total_items", 0)
 
 
 async def get_factual_weekly_funnel_counts(
@@ -206,59 +447,206 @@ async def get_factual_weekly_funnel_counts(
     status_id_to_name_map: Dict,
     start_date: datetime,
     end_date: datetime
-) -> Dict:
+) -> Tuple[Dict, Dict, Optional[str]]:
     weekly_factual_counts = {stage: 0 for stage in FUNNEL_STAGES_ORDER}
-    applicants_url = f"/accounts/{account_id}/applicants/search"
-    all_applicants = await _fetch_all_paginated_items(api_client, applicants_url, params={"vacancy": [vacancy_id]})
+    total_counts = {stage: 0 for stage in FUNNEL_STAGES_ORDER}
+    applicants_url = f"/accounts/{account_id}/applicants"
+    # Последнее изменение кандидата на вакансии: по нему планировщик пропускает неактивные вакансии
+    last_activity: Optional[datetime] = None
+
+    async def process_with_semaphore(applicant: Dict) -> Tuple[Dict, Set[str]]:
+        async with _get_applicant_semaphore():
+            return await _process_applicant_logs(
+                api_client, account_id, applicant, vacancy_id, status_id_to_name_map, start_date, end_date
+            )
+
+    applicant_tasks = []
+    try:
+        async for applicant in _iter_paginated_items(api_client, applicants_url, params={"vacancy_id": vacancy_id}):
+            marker = _applicant_change_marker(applicant, vacancy_id)
+            if marker and (last_activity is None or datetime.fromisoformat(marker) > last_activity):
+                last_activity = datetime.fromisoformat(marker)
+            applicant_tasks.append(asyncio.ensure_future(process_with_semaphore(applicant)))
+    except Exception:
+        for task in applicant_tasks:
+            task.cancel()
+        raise
 
-    for applicant in all_applicants:
-        applicant_counts = await _process_applicant_logs(
-            api_client, account_id, applicant, vacancy_id, status_id_to_name_map, start_date, end_date
-        )
+    try:
+        all_applicant_results = await asyncio.gather(*applicant_tasks)
+    except Exception:
+        # Вакансия будет повторена целиком, оставшиеся запросы по ней не нужны
+        for task in applicant_tasks:
+            task.cancel()
+        raise
+    for applicant_counts, applicant_columns in all_applicant_results:
         for stage, count in applicant_counts.items():
             weekly_factual_counts[stage] += count
+        for column in applicant_columns:
+            total_counts[column] += 1
 
-    return weekly_factual_counts
+    return weekly_factual_counts, total_counts, last_activity.isoformat() if last_activity else None
 
 
-async def generate_recruitment_funnel_report() -> Optional[Dict[str, Any]]:
+async def _record_run_events(vacancies_data: List[Dict], status_id_to_name_map: Dict) -> None:
+    try:
+        # Пустое хранилище заполняется всей историей из состояния синхронизации, дальше пишутся только обновленные кандидаты
+        only_fetched = not await event_store.is_empty()
+        entries = list(sync_state.iter_entries(only_fetched=only_fetched))
+        vacancies = [(row["id"], row["название вакансии"], row.get("is_priority", False)) for row in vacancies_data]
+        recorded = await event_store.record_events(entries, vacancies, status_id_to_name_map)
+        logging.info(f"В локальное хранилище событий записано {recorded} событий ({len(entries)} кандидатов).")
+    except Exception as e:
+        logging.error(f"Ошибка при записи событий в локальное хранилище: {e}", exc_info=True)
+
+
+def _aggregate_events(
+    rows: List[event_store.EventRow],
+    status_id_to_name_map: Dict,
+    period_starts: List[float],
+    period_ends: List[float]
+) -> Dict[int, List[Dict[str, int]]]:
+    vacancy_counts: Dict[int, List[Dict[str, int]]] = {}
+    for (vacancy_id, _), applicant_rows in groupby(rows, key=itemgetter(0, 1)):
+        events = [
+            (event_store.TYPE_BY_KIND.get(kind, "OTHER"), status, created_ts)
+            for _, _, kind, status, created_ts in applicant_rows
+        ]
+        period_counts = _count_stages_by_period(events, status_id_to_name_map, period_starts, period_ends)
+        if not period_counts:
+            continue
+        totals = vacancy_counts.get(vacancy_id)
+        if totals is None:
+            totals = vacancy_counts[vacancy_id] = [{stage: 0 for stage in FUNNEL_STAGES_ORDER} for _ in period_starts]
+        for period, counts in period_counts.items():
+            for stage, value in counts.items():
+                totals[period][stage] += value
+    return vacancy_counts
+
+
+async def _count_stored_events(
+    periods: List[Tuple[datetime, datetime]],
+    vacancy_ids: Optional[List[int]] = None,
+    account_id: Optional[int] = None
+) -> Tuple[Dict[int, List[Dict[str, int]]], Dict[int, Tuple[str, bool]]]:
+    period_starts = [start.timestamp() for start, _ in periods]
+    period_ends = [end.timestamp() for _, end in periods]
+    with accounts.use_account(account_id):
+        rows = await event_store.load_events(period_starts[0], period_ends[-1], vacancy_ids)
+        vacancies, statuses = await event_store.load_dictionaries()
+    vacancy_counts = await asyncio.to_thread(_aggregate_events, rows, statuses, period_starts, period_ends)
+    return vacancy_counts, vacancies
+
+
+async def get_range_report(
+    start_day: date,
+    end_day: date,
+    vacancy_ids: Optional[List[int]] = None,
+    account_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    vacancy_counts, vacancies = await _count_stored_events(
+        [get_date_range(start_day, end_day)], vacancy_ids, account_id
+    )
+    rows = []
+    for vacancy_id, periods in vacancy_counts.items():
+        name, is_priority = vacancies.get(vacancy_id, (str(vacancy_id), False))
+        rows.append({"id": vacancy_id, "название вакансии": name, "is_priority": is_priority, **periods[0]})
+    rows.sort(key=lambda row: (not row["is_priority"], row["название вакансии"]))
+    return rows
+
+
+async def get_weekly_trend(
+    weeks: int,
+    today: datetime,
+    vacancy_ids: Optional[List[int]] = None,
+    account_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    last_start, last_end = get_report_week_range(today)
+    periods = [
+        (last_start - timedelta(weeks=offset), last_end - timedelta(weeks=offset))
+        for offset in reversed(range(weeks))
+    ]
+    vacancy_counts, _ = await _count_stored_events(periods, vacancy_ids, account_id)
+
+    msk_tz = timezone(timedelta(hours=3))
+    trend = []
+    for index, (start, end) in enumerate(periods):
+        week_totals = {stage: 0 for stage in FUNNEL_STAGES_ORDER}
+        for totals in vacancy_counts.values():
+            for stage, value in totals[index].items():
+                week_totals[stage] += value
+        trend.append({
+            "week_start": start.astimezone(msk_tz).date().isoformat(),
+            "week_end": end.astimezone(msk_tz).date().isoformat(),
+            **week_totals,
+        })
+    return trend
+
+
+async def discover_accounts(bypass_http_cache: bool = False) -> Optional[List[Dict[str, Any]]]:
+    if not token_proxy._access_token:
+        logging.error("Токен Huntflow не предоставлен.")
+        return None
+
+    api_client = create_api_client(bypass_cache=bypass_http_cache)
+    # Ответы 401 обрабатываются в клиенте: токен обновляется один раз, запрос повторяется
+    try:
+        accounts_response = await api_client.request("GET", "/accounts")
+    except AuthorizationError:
+        logging.critical("Не удалось обновить токен. Процесс сбора данных прерван.")
+        return None
+    except Exception as e:
+        logging.error(f"Ошибка при получении списка аккаунтов Huntflow: {e}")
+        return None
+
+    selected = accounts.select_accounts(accounts_response.json().get("items", []))
+    if not selected:
+        logging.error("Нет доступных аккаунтов Huntflow для формирования отчета.")
+        return None
+    await accounts.remember_accounts(selected)
+    return selected
+
+
+async def generate_recruitment_funnel_report(
+    bypass_http_cache: bool = False,
+    account_id: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    if account_id is None:
+        if await discover_accounts(bypass_http_cache) is None:
+            return None
+        account_id = accounts.get_default_account_id()
+
+    with accounts.use_account(account_id):
+        return await _generate_account_report(account_id, bypass_http_cache)
+
+
+async def _generate_account_report(account_id: int, bypass_http_cache: bool) -> Optional[Dict[str, Any]]:
     if not token_proxy._access_token:
         logging.error("Токен Huntflow не предоставлен.")
         return None
 
     start_date, end_date = get_report_week_range(datetime.now(timezone.utc))
-    logging.info(f"Формирование отчета за период: с {start_date.isoformat()} по {end_date.isoformat()} UTC")
+    logging.info(
+        f"Формирование отчета аккаунта {account_id} за период: "
+        f"с {start_date.isoformat()} по {end_date.isoformat()} UTC")
 
-    api_client = HuntflowAPI(
-        base_url="https://api.huntflow.ru",
-        token_proxy=token_proxy,
-        auto_refresh_tokens=False
-    )
+    api_client = create_api_client(bypass_cache=bypass_http_cache)
+
+    await sync_state.ensure_loaded()
+    sync_state.begin_run()
 
     try:
-        try:
-            accounts_response = await api_client.request("GET", "/accounts")
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 401:
-                logging.warning("Токен истек. Запускаю принудительное обновление...")
-
-                success = await token_proxy.refresh_tokens_manually()
-
-                if success:
-                    logging.info("Токен успешно обновлен. Повторяю запрос к /accounts...")
-                    accounts_response = await api_client.request("GET", "/accounts")
-                else:
-                    logging.critical("Не удалось обновить токен. Процесс сбора данных прерван.")
-                    return None
-            else:
-                raise
-
-        account_id = accounts_response.json()["items"][0]["id"]
-        logging.info(f"Успешно подключились к аккаунту ID: {account_id}")
+        progress.set_phase(progress.PHASE_DICTIONARIES)
 
         coworkers_task = _fetch_all_paginated_items(api_client, f"/accounts/{account_id}/coworkers")
         statuses_task = api_client.request("GET", f"/accounts/{account_id}/vacancies/statuses")
-        coworkers_items, statuses_response = await asyncio.gather(coworkers_task, statuses_task)
+        try:
+            coworkers_items, statuses_response = await asyncio.gather(coworkers_task, statuses_task)
+        except AuthorizationError:
+            # Ответы 401 обрабатываются в клиенте: токен обновляется один раз, запрос повторяется
+            logging.critical("Не удалось обновить токен. Процесс сбора данных прерван.")
+            return None
+        logging.info(f"Успешно подключились к аккаунту ID: {account_id}")
 
         coworkers_map = {item["id"]: item["name"] for item in coworkers_items}
         logging.info(f"Успешно загружено {len(coworkers_map)} рекрутеров (общий список).")
@@ -272,52 +660,153 @@ async def generate_recruitment_funnel_report() -> Optional[Dict[str, Any]]:
         all_vacancies = await _fetch_all_paginated_items(api_client, f"/accounts/{account_id}/vacancies",
                                                          params={"opened": "true"})
         logging.info(f"Найдено {len(all_vacancies)} активных вакансий. Начинаю сбор данных...")
+        progress.set_phase(progress.PHASE_VACANCIES, vacancies_total=len(all_vacancies))
 
-        semaphore = asyncio.Semaphore(7)
-
-        async def build_row_with_semaphore(vacancy: Dict) -> Dict:
-            async with semaphore:
-                return await _build_funnel_row(
-                    api_client, account_id, vacancy, status_maps, start_date, end_date
-                )
-        tasks = [build_row_with_semaphore(v) for v in all_vacancies]
-
-        all_vacancies_data = await asyncio.gather(*tasks)
+        # Обновление без HTTP-кэша должно дать свежие данные, поэтому готовые строки прежнего запуска не берутся
+        run_checkpoint = (
+            await checkpoint.open_checkpoint(start_date, resume=not bypass_http_cache)
+            if config.CHECKPOINT_ENABLED else None
+        )
+        resumed_rows = run_checkpoint.rows if run_checkpoint else {}
+        resumed_ids = {v["id"] for v in all_vacancies if v["id"] in resumed_rows}
+        sync_state.mark_vacancies_seen(resumed_ids)
+        for vacancy_id in resumed_ids:
+            progress.vacancy_done(resumed_rows[vacancy_id])
+
+        semaphore = asyncio.Semaphore(config.VACANCY_CONCURRENCY)
+        failed_vacancy_ids = []
+
+        async def build_row_with_retries(vacancy: Dict) -> Optional[Dict]:
+            for attempt in range(config.VACANCY_MAX_RETRIES + 1):
+                try:
+                    async with semaphore:
+                        row = await _build_funnel_row(
+                            api_client, account_id, vacancy, status_maps, start_date, end_date
+                        )
+                    break
+                except Exception as e:
+                    if attempt >= config.VACANCY_MAX_RETRIES:
+                        logging.error(f"Вакансия {vacancy['id']} не обработана после {attempt + 1} попыток: {e}")
+                        failed_vacancy_ids.append(vacancy["id"])
+                        return None
+                    delay = config.VACANCY_RETRY_BACKOFF_SECONDS * 2 ** attempt
+                    logging.warning(f"Ошибка при обработке вакансии {vacancy['id']}: {e}. Повтор через {delay} с.")
+                    await asyncio.sleep(delay)
+
+            if run_checkpoint is not None:
+                await run_checkpoint.save_row(row)
+            metrics.VACANCIES_PROCESSED.inc()
+            progress.vacancy_done(row)
+            return row
+        tasks = [build_row_with_retries(v) for v in all_vacancies if v["id"] not in resumed_ids]
+
+        # Готовая строка сразу уходит в progress.vacancy_done и публикуется в кэше, не дожидаясь медленных вакансий
+        new_rows = {}
+        for next_row in asyncio.as_completed(tasks):
+            row = await next_row
+            if row is not None:
+                new_rows[row["id"]] = row
+        all_vacancies_data = [
+            resumed_rows.get(v["id"]) or new_rows[v["id"]]
+            for v in all_vacancies if v["id"] in resumed_ids or v["id"] in new_rows
+        ]
+
+        if config.EVENT_STORE_ENABLED:
+            await _record_run_events(all_vacancies_data, status_maps['id_to_name'])
+
+        run_stats = sync_state.get_run_stats()
+        for sync_result, count in run_stats.items():
+            metrics.APPLICANTS_PROCESSED.labels(sync_result).inc(count)
+
+        if failed_vacancy_ids:
+            if run_checkpoint is not None:
+                run_checkpoint.failed = failed_vacancy_ids
+                await run_checkpoint.save_state()
+            logging.error(
+                f"Не обработано вакансий: {len(failed_vacancy_ids)} из {len(all_vacancies)}. "
+                f"Отчет не опубликован, готовые строки сохранены в контрольной точке.")
+            return None
+
+        removed = sync_state.prune_unseen()
+        logging.info(
+            f"Синхронизация логов: без изменений {run_stats['unchanged']}, "
+            f"загружено {run_stats['fetched']}, удалено устаревших записей {removed}.")
+
+        if run_checkpoint is not None:
+            run_checkpoint.complete()
 
         all_vacancies_data.sort(key=lambda x: not x.get('is_priority', False))
         return {"vacancies": all_vacancies_data, "coworkers": coworkers_map}
     except Exception as e:
-        logging.error(f"КРИТИЧЕСКАЯ ОШИБКА в generate_recruitment_funnel_report: {e}")
+        logging.error(f"КРИТИЧЕСКАЯ ОШИБКА при формировании отчета аккаунта {account_id}: {e}")
         logging.error(traceback.format_exc())
         return None
+    finally:
+        await sync_state.save_sync_state()
+
+
+async def generate_vacancy_rows(
+    vacancies: List[Dict],
+    bypass_http_cache: bool = False,
+    account_id: Optional[int] = None
+) -> Optional[List[Dict[str, Any]]]:
+    account_id = accounts.resolve_account_id(account_id)
+    with accounts.use_account(account_id):
+        return await _generate_account_vacancy_rows(vacancies, bypass_http_cache, account_id)
+
+
+async def _generate_account_vacancy_rows(
+    vacancies: List[Dict],
+    bypass_http_cache: bool,
+    account_id: int
+) -> Optional[List[Dict[str, Any]]]:
+    if not token_proxy._access_token:
+        logging.error("Токен Huntflow не предоставлен.")
+        return None
+
+    start_date, end_date = get_report_week_range(datetime.now(timezone.utc))
+    api_client = create_api_client(bypass_cache=bypass_http_cache)
+    # begin_run не вызывается: точечное обновление может идти параллельно с полным и не должно сбрасывать его учет
+    await sync_state.ensure_loaded()
+
+    try:
+        statuses_response = await api_client.request("GET", f"/accounts/{account_id}/vacancies/statuses")
+        statuses_items = statuses_response.json().get("items", [])
+        status_maps = {
+            'name_to_id': {s["name"]: s["id"] for s in statuses_items},
+            'id_to_name': {s["id"]: s["name"] for s in statuses_items}
+        }
+
+        semaphore = asyncio.Semaphore(config.VACANCY_CONCURRENCY)
+
+        async def build_row_with_semaphore(vacancy: Dict) -> Optional[Dict]:
+            try:
+                async with semaphore:
+                    row = await _build_funnel_row(
+                        api_client, account_id, vacancy, status_maps, start_date, end_date
+                    )
+            except Exception as e:
+                # Строка не обновляется: в кэше остается прежняя, следующий цикл попробует снова
+                logging.error(f"Вакансия {vacancy['id']} не обновлена: {e}")
+                return None
+            metrics.VACANCIES_PROCESSED.inc()
+            return row
+
+        rows = [row for row in await asyncio.gather(*[build_row_with_semaphore(v) for v in vacancies]) if row is not None]
+
+        if config.EVENT_STORE_ENABLED:
+            await _record_run_events(rows, status_maps['id_to_name'])
+        return rows
+    except Exception as e:
+        logging.error(f"Ошибка при точечном обновлении вакансий {[v['id'] for v in vacancies]}: {e}")
+        logging.error(traceback.format_exc())
+        return None
+    finally:
+        await sync_state.save_sync_state()
 
 
 def create_xlsx_report(data: List[Dict]) -> Optional[BytesIO]:
     if not data:
         logging.warning("Нет данных для создания отчета.")
         return None
-
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    sheet.title = "Воронка кандидатов"
-    priority_fill = PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid")
-    headers = ["название вакансии"] + FUNNEL_STAGES_ORDER + ["комментарий"]
-    sheet.append(headers)
-
-    for row_data in data:
-        row_to_append = []
-        for header in headers:
-            cell_data = row_data.get(header)
-            if isinstance(cell_data, dict):
-                row_to_append.append(f"{cell_data.get('total', 0)} ({cell_data.get('current', 0)})")
-            else:
-                row_to_append.append(cell_data if cell_data is not None else "")
-        sheet.append(row_to_append)
-        if row_data.get('is_priority', False):
-            for cell in sheet[sheet.max_row]:
-                cell.fill = priority_fill
-
-    virtual_workbook = BytesIO()
-    workbook.save(virtual_workbook)
-    virtual_workbook.seek(0)
-    return virtual_workbook
\ No newline at end of file
+    return BytesIO(report_export.build_xlsx_bytes(data, REPORT_HEADERS))
@@ -0,0 +1,151 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Collection, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+VACANCY_NAME_KEY = "название вакансии"
+VACANCY_ID_KEY = "id"
+COMMENT_KEY = "комментарий"
+MEMBERS_KEY = "members"
+PRIORITY_KEY = "is_priority"
+SORT_BY_NAME = "name"
+
+
+@dataclass(frozen=True)
+class ReportSnapshot:
+    version: int
+    vacancies: Tuple[Mapping[str, Any], ...]
+    coworkers: Dict[Any, str]
+    last_updated: Optional[datetime]
+    # False, пока полное обновление публикует готовые строки по мере их получения
+    is_complete: bool = True
+    by_name: Mapping[str, int] = field(default_factory=dict)
+    by_id: Mapping[int, int] = field(default_factory=dict)
+    # Индексы для серверной фильтрации строятся один раз на снимок: позиции строк по рекрутеру,
+    # приоритетные позиции, имена в нижнем регистре и готовые порядки сортировки
+    by_member: Mapping[int, Tuple[int, ...]] = field(default_factory=dict)
+    priority_positions: Tuple[int, ...] = ()
+    search_names: Tuple[str, ...] = ()
+    sort_orders: Mapping[str, Tuple[int, ...]] = field(default_factory=dict)
+
+    def find_by_name(self, vacancy_name: str) -> Optional[Mapping[str, Any]]:
+        position = self.by_name.get(vacancy_name)
+        return self.vacancies[position] if position is not None else None
+
+    def find_by_id(self, vacancy_id: int) -> Optional[Mapping[str, Any]]:
+        position = self.by_id.get(vacancy_id)
+        return self.vacancies[position] if position is not None else None
+
+
+def _stage_total(row: Mapping[str, Any], stage: str) -> int:
+    value = row.get(stage)
+    if isinstance(value, Mapping):
+        return value.get("total", 0) or 0
+    return value or 0
+
+
+def _build_sort_orders(rows: Sequence[Mapping[str, Any]], stages: Iterable[str]) -> Dict[str, Tuple[int, ...]]:
+    positions = range(len(rows))
+    sort_orders = {
+        SORT_BY_NAME: tuple(sorted(positions, key=lambda p: str(rows[p].get(VACANCY_NAME_KEY) or "").lower())),
+    }
+    for stage in stages:
+        sort_orders[stage] = tuple(sorted(positions, key=lambda p: _stage_total(rows[p], stage)))
+    return sort_orders
+
+
+def build_snapshot(
+    version: int,
+    vacancies: Iterable[Dict[str, Any]],
+    coworkers: Dict[Any, str],
+    last_updated: Optional[datetime],
+    stages: Iterable[str] = (),
+    is_complete: bool = True
+) -> ReportSnapshot:
+    rows = []
+    by_name = {}
+    by_id = {}
+    by_member: Dict[int, List[int]] = {}
+    priority_positions = []
+    search_names = []
+    for position, row in enumerate(vacancies):
+        frozen_row = MappingProxyType({key: value for key, value in row.items() if key != COMMENT_KEY})
+        rows.append(frozen_row)
+        if row.get(VACANCY_NAME_KEY) is not None:
+            by_name.setdefault(row[VACANCY_NAME_KEY], position)
+        if row.get(VACANCY_ID_KEY) is not None:
+            by_id[row[VACANCY_ID_KEY]] = position
+        for member_id in row.get(MEMBERS_KEY) or ():
+            by_member.setdefault(int(member_id), []).append(position)
+        if row.get(PRIORITY_KEY):
+            priority_positions.append(position)
+        search_names.append(str(row.get(VACANCY_NAME_KEY) or "").lower())
+
+    return ReportSnapshot(
+        version=version,
+        vacancies=tuple(rows),
+        coworkers=dict(coworkers),
+        last_updated=last_updated,
+        is_complete=is_complete,
+        by_name=MappingProxyType(by_name),
+        by_id=MappingProxyType(by_id),
+        by_member=MappingProxyType({member_id: tuple(positions) for member_id, positions in by_member.items()}),
+        priority_positions=tuple(priority_positions),
+        search_names=tuple(search_names),
+        sort_orders=MappingProxyType(_build_sort_orders(rows, stages)),
+    )
+
+
+def query_positions(
+    snapshot: ReportSnapshot,
+    recruiter_ids: Optional[Collection[int]] = None,
+    priority_only: bool = False,
+    vacancy_names: Optional[Collection[str]] = None,
+    search: Optional[str] = None,
+    sort: Optional[str] = None,
+    descending: bool = False
+) -> List[int]:
+    candidates: Optional[set] = None
+    if recruiter_ids:
+        candidates = set()
+        for recruiter_id in recruiter_ids:
+            candidates.update(snapshot.by_member.get(recruiter_id, ()))
+    if priority_only:
+        priority = set(snapshot.priority_positions)
+        candidates = priority if candidates is None else candidates & priority
+    if vacancy_names:
+        named = {snapshot.by_name[name] for name in vacancy_names if name in snapshot.by_name}
+        candidates = named if candidates is None else candidates & named
+    if search:
+        needle = search.lower()
+        candidates = {
+            position for position in (candidates if candidates is not None else range(len(snapshot.vacancies)))
+            if needle in snapshot.search_names[position]
+        }
+
+    order = snapshot.sort_orders.get(sort) if sort else None
+    if order is None:
+        order = range(len(snapshot.vacancies))
+    if descending:
+        order = reversed(order)
+    if candidates is None:
+        return list(order)
+    return [position for position in order if position in candidates]
+
+
+def extract_comments(vacancies: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+    return {
+        row[VACANCY_NAME_KEY]: row[COMMENT_KEY]
+        for row in vacancies
+        if row.get(VACANCY_NAME_KEY) and row.get(COMMENT_KEY)
+    }
+
+
+def merge_comments(snapshot: ReportSnapshot, comments: Mapping[str, str]) -> List[Dict[str, Any]]:
+    return [
+        {**row, COMMENT_KEY: comments.get(row.get(VACANCY_NAME_KEY), "")}
+        for row in snapshot.vacancies
+    ]
+
+
+EMPTY_SNAPSHOT = build_snapshot(0, [], {}, None)
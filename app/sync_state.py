@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import aiofiles
+from . import accounts, config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Версия 2: запись кандидата хранит начало окна загрузки логов (since), None — полная история
+SYNC_STATE_VERSION = 2
+
+# Логи кандидата хранятся компактно, в хронологическом порядке: [id, type, status, created]
+LOG_ID, LOG_TYPE, LOG_STATUS, LOG_CREATED = range(4)
+
+
+class _SyncPartition:
+    def __init__(self):
+        self.state: Dict[str, Any] = _empty_state()
+        self.is_loaded = False
+        self.seen_keys: Set[str] = set()
+        self.fetched_keys: Set[str] = set()
+        self.run_stats: Dict[str, int] = {"unchanged": 0, "fetched": 0}
+        # Полные и точечные запуски одного аккаунта сохраняют состояние из своих finally одновременно
+        self.save_lock = asyncio.Lock()
+
+
+# Состояние ведется отдельно для каждого аккаунта Huntflow, текущий аккаунт берется из accounts.current_account_id
+_partitions: Dict[Optional[int], _SyncPartition] = {}
+
+
+def _empty_state() -> Dict[str, Any]:
+    return {"version": SYNC_STATE_VERSION, "applicants": {}}
+
+
+def _current() -> _SyncPartition:
+    account_id = accounts.resolve_account_id(accounts.current_account_id.get())
+    partition = _partitions.get(account_id)
+    if partition is None:
+        partition = _partitions[account_id] = _SyncPartition()
+    return partition
+
+
+def _applicant_key(vacancy_id: int, applicant_id: int) -> str:
+    return f"{vacancy_id}:{applicant_id}"
+
+
+def compact_log(log: Dict) -> List:
+    return [log.get("id"), log.get("type"), log.get("status"), log.get("created")]
+
+
+async def load_sync_state() -> None:
+    partition = _current()
+    path = accounts.current_partition_path(config.SYNC_STATE_FILE_PATH)
+    try:
+        async with aiofiles.open(path, mode='r', encoding='utf-8') as f:
+            loaded = json.loads(await f.read())
+        if loaded.get("version") != SYNC_STATE_VERSION:
+            logging.warning(f"Версия состояния синхронизации {path} не поддерживается. Будет выполнена полная загрузка.")
+            loaded = _empty_state()
+        partition.state = loaded
+        logging.info(f"Состояние синхронизации {path} загружено. Кандидатов: {len(loaded['applicants'])}.")
+    except FileNotFoundError:
+        logging.info(f"Файл состояния синхронизации {path} не найден. Будет выполнена полная загрузка.")
+        partition.state = _empty_state()
+    except Exception:
+        logging.error(f"Ошибка при чтении состояния синхронизации {path}. Состояние сброшено.")
+        partition.state = _empty_state()
+    partition.is_loaded = True
+
+
+async def ensure_loaded() -> None:
+    if not _current().is_loaded:
+        await load_sync_state()
+
+
+async def save_sync_state() -> None:
+    partition = _current()
+    path = accounts.current_partition_path(config.SYNC_STATE_FILE_PATH)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    async with partition.save_lock:
+        state = partition.state
+        try:
+            state_dir = os.path.dirname(path)
+            if state_dir:
+                os.makedirs(state_dir, exist_ok=True)
+            async with aiofiles.open(tmp_path, mode='w', encoding='utf-8') as f:
+                await f.write(json.dumps(state, ensure_ascii=False, separators=(",", ":")))
+            os.replace(tmp_path, path)
+            logging.info(f"Состояние синхронизации сохранено в {path}. Кандидатов: {len(state['applicants'])}.")
+        except Exception as e:
+            logging.error(f"Ошибка при сохранении состояния синхронизации: {e}", exc_info=True)
+
+
+def begin_run() -> None:
+    partition = _current()
+    partition.seen_keys.clear()
+    partition.fetched_keys.clear()
+    for key in partition.run_stats:
+        partition.run_stats[key] = 0
+
+
+def get_applicant_entry(vacancy_id: int, applicant_id: int) -> Optional[Dict[str, Any]]:
+    return _current().state["applicants"].get(_applicant_key(vacancy_id, applicant_id))
+
+
+def mark_unchanged(vacancy_id: int, applicant_id: int) -> None:
+    partition = _current()
+    partition.seen_keys.add(_applicant_key(vacancy_id, applicant_id))
+    partition.run_stats["unchanged"] += 1
+
+
+def set_applicant_entry(
+    vacancy_id: int, applicant_id: int, marker: Optional[str], logs: List[List], since: Optional[str] = None
+) -> None:
+    partition = _current()
+    key = _applicant_key(vacancy_id, applicant_id)
+    partition.state["applicants"][key] = {"marker": marker, "logs": logs, "since": since}
+    partition.seen_keys.add(key)
+    partition.fetched_keys.add(key)
+    partition.run_stats["fetched"] += 1
+
+
+def mark_vacancies_seen(vacancy_ids: Set[int]) -> None:
+    partition = _current()
+    vacancy_prefixes = {str(vacancy_id) for vacancy_id in vacancy_ids}
+    partition.seen_keys.update(
+        key for key in partition.state["applicants"] if key.partition(":")[0] in vacancy_prefixes
+    )
+
+
+def prune_unseen() -> int:
+    partition = _current()
+    applicants = partition.state["applicants"]
+    stale_keys = [key for key in applicants if key not in partition.seen_keys]
+    for key in stale_keys:
+        del applicants[key]
+    return len(stale_keys)
+
+
+def iter_entries(only_fetched: bool = False) -> Iterator[Tuple[int, int, List[List]]]:
+    partition = _current()
+    applicants = partition.state["applicants"]
+    keys = list(partition.fetched_keys) if only_fetched else list(applicants)
+    for key in keys:
+        entry = applicants.get(key)
+        if entry is None:
+            continue
+        vacancy_id, applicant_id = key.split(":")
+        yield int(vacancy_id), int(applicant_id), entry["logs"]
+
+
+def get_run_stats() -> Dict[str, int]:
+    return dict(_current().run_stats)
@@ -2,11 +2,14 @@ import asyncio
 import json
 import logging
 import os
-from typing import Any, Dict
+import time
+from typing import Any, Dict, Optional
 import httpx
 
 from dotenv import load_dotenv
 from huntflow_api_client.tokens.proxy import AbstractTokenProxy
+from . import config
+from .http_pool import get_http_client
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 load_dotenv()
@@ -16,13 +19,16 @@ TOKEN_FILE_PATH = os.path.join(CACHE_DIR, "tokens.json")
 TOKEN_FILE_TMP = os.path.join(CACHE_DIR, "tokens.json.tmp")
 TOKEN_FILE_BAK = os.path.join(CACHE_DIR, "tokens.json.bak")
 
-REFRESH_URL = "https://api.huntflow.ru/v2/token/refresh"
+REFRESH_URL = f"{config.HUNTFLOW_BASE_URL}/v2/token/refresh"
 
 
 class FileTokenProxy(AbstractTokenProxy):
     def __init__(self):
         self._access_token: str = ""
         self._refresh_token: str = ""
+        self._access_expires_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Future] = None
+        self._proactive_retry_at = 0.0
         self._update_lock = asyncio.Lock()
         self._is_updated = False
         self._load_initial_tokens()
@@ -33,6 +39,7 @@ class FileTokenProxy(AbstractTokenProxy):
                 tokens = json.load(f)
                 self._access_token = tokens.get("HUNTFLOW_API_TOKEN", "")
                 self._refresh_token = tokens.get("HUNTFLOW_REFRESH_TOKEN", "")
+                self._access_expires_at = tokens.get("HUNTFLOW_API_TOKEN_EXPIRES_AT")
                 if self._access_token and self._refresh_token:
                     logging.info(f"Токены успешно загружены из файла {TOKEN_FILE_PATH}")
                     return
@@ -44,6 +51,10 @@ class FileTokenProxy(AbstractTokenProxy):
         if self._access_token:
             logging.info("Токены успешно загружены из .env файла.")
 
+    def reload(self) -> None:
+        # Токены в файле мог обновить другой процесс, который до этого был ведущим
+        self._load_initial_tokens()
+
     def get_access_token(self) -> str:
         return self._access_token
 
@@ -54,6 +65,29 @@ class FileTokenProxy(AbstractTokenProxy):
     async def get_refresh_data(self) -> Dict[str, str]:
         return {"refresh_token": self._refresh_token}
 
+    async def refresh_if_stale(self, used_access_token: str) -> bool:
+        if used_access_token != self._access_token:
+            # Пока запрос ждал ответа, токен уже обновил кто-то другой
+            return True
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self.refresh_tokens_manually())
+        return await asyncio.shield(self._refresh_task)
+
+    async def ensure_fresh(self) -> None:
+        expires_at = self._access_expires_at
+        if expires_at is None or time.time() < expires_at - config.TOKEN_REFRESH_MARGIN_SECONDS:
+            return
+        if time.time() < self._proactive_retry_at:
+            # Прошлая попытка не удалась: истекший токен обновит путь с ответом 401
+            return
+        logging.info("Срок действия токена подходит к концу. Обновляю заранее...")
+        if not await self.refresh_if_stale(self._access_token) and time.time() >= self._proactive_retry_at:
+            self._proactive_retry_at = time.time() + config.TOKEN_REFRESH_RETRY_SECONDS
+            logging.warning(
+                f"Заблаговременное обновление токена не удалось. Повтор не раньше чем через "
+                f"{config.TOKEN_REFRESH_RETRY_SECONDS} с."
+            )
+
     async def refresh_tokens_manually(self) -> bool:
         logging.warning(f"Запускаю ручное обновление токена...")
 
@@ -64,8 +98,7 @@ class FileTokenProxy(AbstractTokenProxy):
         payload = {"refresh_token": self._refresh_token}
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(REFRESH_URL, json=payload)
+            response = await get_http_client().post(REFRESH_URL, json=payload)
 
             if response.status_code == 200:
                 new_tokens = response.json()
@@ -84,6 +117,8 @@ class FileTokenProxy(AbstractTokenProxy):
         async with self._update_lock:
             new_access_token = data.get("access_token")
             new_refresh_token = data.get("refresh_token")
+            expires_in = data.get("expires_in")
+            new_expires_at = time.time() + float(expires_in) if expires_in else None
 
             if not new_access_token or not new_refresh_token:
                 logging.critical(
@@ -101,7 +136,8 @@ class FileTokenProxy(AbstractTokenProxy):
                 with open(TOKEN_FILE_TMP, 'w') as f:
                     json.dump({
                         "HUNTFLOW_API_TOKEN": new_access_token,
-                        "HUNTFLOW_REFRESH_TOKEN": new_refresh_token
+                        "HUNTFLOW_REFRESH_TOKEN": new_refresh_token,
+                        "HUNTFLOW_API_TOKEN_EXPIRES_AT": new_expires_at
                     }, f, indent=4)
                 if os.path.exists(TOKEN_FILE_PATH):
                     os.rename(TOKEN_FILE_PATH, TOKEN_FILE_BAK)
@@ -113,6 +149,7 @@ class FileTokenProxy(AbstractTokenProxy):
 
             self._access_token = new_access_token
             self._refresh_token = new_refresh_token
+            self._access_expires_at = new_expires_at
             self._is_updated = True
 
     async def is_updated(self) -> bool:
@@ -0,0 +1,301 @@
+import asyncio
+import math
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional
+from fastapi import FastAPI, Request
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+MSK_TZ = timezone(timedelta(hours=3))
+
+STATUSES = [
+    {"id": 1, "name": "Новые", "order": 1},
+    {"id": 2, "name": "Коннект", "order": 2},
+    {"id": 3, "name": "Интервью с HR", "order": 3},
+    {"id": 4, "name": "Интервью с заказчиком", "order": 4},
+    {"id": 5, "name": "Финальное интервью", "order": 5},
+    {"id": 6, "name": "Выставлен оффер", "order": 6},
+    {"id": 7, "name": "Вышел на работу", "order": 7},
+    {"id": 8, "name": "Отказ", "order": 8},
+]
+FUNNEL_STATUS_IDS = [1, 2, 3, 4, 5, 6, 7]
+REJECTED_STATUS_ID = 8
+# Вероятность перейти на следующий этап воронки
+STAGE_PASS_PROBABILITY = 0.55
+COMMENT_PROBABILITY = 0.7
+OTHER_EVENT_TYPES = ["EMAIL", "SMS", "AGREEMENT"]
+
+ACCOUNT_ID = 1
+PRIORITY_POSITIONS = [
+    "Проджект в PD с потенциалом лида", "Старший системный администратор",
+    "Специалист КПД с потенциалом руководителя",
+]
+
+
+@dataclass
+class FakeAccountSpec:
+    vacancies: int = 50
+    mean_applicants: float = 30.0
+    zipf_exponent: float = 1.1
+    coworkers: int = 40
+    history_days: int = 120
+    seed: int = 42
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    retry_after_seconds: float = 1.0
+    # Через сколько авторизованных запросов текущий access token «истекает» (0 — никогда)
+    token_expire_after_requests: int = 0
+    # Число организаций; у всех одинаковый набор данных, но свой ID аккаунта
+    accounts: int = 1
+    anchor: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class FakeHuntflowData:
+    def __init__(self, spec: FakeAccountSpec):
+        self.spec = spec
+        rng = random.Random(spec.seed)
+
+        ranks = list(range(1, spec.vacancies + 1))
+        rng.shuffle(ranks)
+        harmonic = sum(rank ** -spec.zipf_exponent for rank in ranks)
+        scale = spec.vacancies * spec.mean_applicants / harmonic if harmonic else 0
+
+        self.coworkers = [{"id": 500 + i, "name": f"Рекрутер {i + 1}"} for i in range(spec.coworkers)]
+        self.vacancies: List[Dict] = []
+        self.vacancy_applicants: Dict[int, List[int]] = {}
+        self.vacancy_members: Dict[int, List[int]] = {}
+
+        next_applicant_id = 100000
+        for index, rank in enumerate(ranks):
+            vacancy_id = 1000 + index
+            position = (
+                PRIORITY_POSITIONS[index] if index < len(PRIORITY_POSITIONS) else f"Вакансия {index + 1}"
+            )
+            self.vacancies.append({"id": vacancy_id, "position": position, "state": "OPEN"})
+
+            applicants_count = max(1, math.ceil(scale * rank ** -spec.zipf_exponent))
+            self.vacancy_applicants[vacancy_id] = list(range(next_applicant_id, next_applicant_id + applicants_count))
+            next_applicant_id += applicants_count
+
+            if self.coworkers:
+                members = rng.sample(self.coworkers, k=min(len(self.coworkers), rng.randint(1, 3)))
+                self.vacancy_members[vacancy_id] = [member["id"] for member in members]
+            else:
+                self.vacancy_members[vacancy_id] = []
+
+        self.applicant_vacancy = {
+            applicant_id: vacancy_id
+            for vacancy_id, applicant_ids in self.vacancy_applicants.items()
+            for applicant_id in applicant_ids
+        }
+
+    @property
+    def total_applicants(self) -> int:
+        return len(self.applicant_vacancy)
+
+    @lru_cache(maxsize=65536)
+    def applicant_logs(self, applicant_id: int) -> List[Dict]:
+        rng = random.Random(self.spec.seed * 1_000_003 + applicant_id)
+        vacancy_id = self.applicant_vacancy[applicant_id]
+        created = self.spec.anchor - timedelta(days=rng.uniform(0, self.spec.history_days))
+
+        logs = []
+
+        def add_log(log_type: str, status: Optional[int] = None) -> None:
+            logs.append({
+                "id": applicant_id * 100 + len(logs),
+                "type": log_type,
+                "status": status,
+                "vacancy": vacancy_id,
+                "created": created.astimezone(MSK_TZ).isoformat(timespec="seconds"),
+            })
+
+        add_log("ADD", FUNNEL_STATUS_IDS[0])
+        for status_id in FUNNEL_STATUS_IDS[1:]:
+            if rng.random() > STAGE_PASS_PROBABILITY:
+                if rng.random() < 0.5:
+                    created += timedelta(hours=rng.uniform(1, 72))
+                    add_log("STATUS", REJECTED_STATUS_ID)
+                break
+            created += timedelta(hours=rng.uniform(2, 120))
+            add_log("STATUS", status_id)
+            if rng.random() < COMMENT_PROBABILITY:
+                created += timedelta(minutes=rng.uniform(1, 90))
+                add_log("COMMENT")
+            elif rng.random() < 0.3:
+                created += timedelta(minutes=rng.uniform(1, 90))
+                add_log(rng.choice(OTHER_EVENT_TYPES))
+        return logs
+
+    def applicant_item(self, applicant_id: int) -> Dict:
+        logs = self.applicant_logs(applicant_id)
+        status_logs = [log for log in logs if log["status"]]
+        return {
+            "id": applicant_id,
+            "first_name": "Кандидат",
+            "last_name": str(applicant_id),
+            "account": ACCOUNT_ID,
+            "created": logs[0]["created"],
+            "links": [{
+                "id": applicant_id,
+                "vacancy": self.applicant_vacancy[applicant_id],
+                "status": status_logs[-1]["status"],
+                "updated": logs[-1]["created"],
+                "changed": status_logs[-1]["created"],
+            }],
+        }
+
+    def applicants_ever_on_status(self, vacancy_id: int, status_id: int) -> int:
+        return sum(
+            1 for applicant_id in self.vacancy_applicants.get(vacancy_id, [])
+            if any(log["status"] == status_id for log in self.applicant_logs(applicant_id))
+        )
+
+
+def _paginate(items: List, request: Request) -> Dict:
+    count = int(request.query_params.get("count", 30))
+    page = int(request.query_params.get("page", 1))
+    total_pages = max(1, math.ceil(len(items) / count))
+    return {
+        "page": page,
+        "count": count,
+        "total_pages": total_pages,
+        "total_items": len(items),
+        "items": items[(page - 1) * count:page * count],
+    }
+
+
+def _int_params(request: Request, name: str) -> List[int]:
+    return [int(value) for value in request.query_params.getlist(name) if value]
+
+
+def create_fake_huntflow_app(spec: FakeAccountSpec) -> FastAPI:
+    data = FakeHuntflowData(spec)
+    app = FastAPI(title="Fake Huntflow API")
+    app.state.data = data
+    app.state.request_counts = Counter()
+    app.state.status_counts = Counter()
+    app.state.token = {"current": None, "authorized_requests": 0, "refreshes": 0}
+    rng = random.Random(spec.seed + 1)
+
+    def reset_stats() -> None:
+        app.state.request_counts.clear()
+        app.state.status_counts.clear()
+
+    app.state.reset_stats = reset_stats
+
+    @app.middleware("http")
+    async def simulate_network(request: Request, call_next):
+        template = request.url.path
+        for route in app.router.routes:
+            match, _ = route.matches(request.scope)
+            if match == Match.FULL:
+                template = route.path
+                break
+        app.state.request_counts[template] += 1
+
+        if spec.latency_ms or spec.latency_jitter_ms:
+            delay = spec.latency_ms + rng.uniform(-spec.latency_jitter_ms, spec.latency_jitter_ms)
+            await asyncio.sleep(max(delay, 0) / 1000)
+
+        if spec.error_rate and rng.random() < spec.error_rate:
+            app.state.status_counts[429] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"Retry-After": str(spec.retry_after_seconds)},
+                content={"errors": [{"type": "too_many_requests", "title": "Too many requests"}]},
+            )
+
+        if spec.token_expire_after_requests and not request.url.path.endswith("/token/refresh"):
+            token_state = app.state.token
+            access_token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+            if token_state["current"] is None:
+                token_state["current"] = access_token
+            if access_token != token_state["current"]:
+                app.state.status_counts[401] += 1
+                return JSONResponse(
+                    status_code=401,
+                    content={"errors": [{"type": "authorization_error", "title": "Authorization Error",
+                                         "detail": "token_expired"}]},
+                )
+            token_state["authorized_requests"] += 1
+            if token_state["authorized_requests"] % spec.token_expire_after_requests == 0:
+                token_state["current"] = ""
+
+        response = await call_next(request)
+        app.state.status_counts[response.status_code] += 1
+        return response
+
+    @app.get("/v2/accounts")
+    async def accounts():
+        return {"items": [
+            {"id": ACCOUNT_ID + index, "name": f"Fake account {index + 1}", "nick": f"fake{index + 1}"}
+            for index in range(spec.accounts)
+        ]}
+
+    @app.post("/v2/token/refresh")
+    async def token_refresh():
+        access_token = f"fake-access-{rng.random()}"
+        app.state.token["current"] = access_token
+        app.state.token["refreshes"] += 1
+        return {
+            "access_token": access_token,
+            "refresh_token": f"fake-refresh-{rng.random()}",
+            "expires_in": 86400,
+            "refresh_token_expires_in": 1209600,
+            "token_type": "bearer",
+        }
+
+    @app.get("/v2/accounts/{account_id}/vacancies/statuses")
+    async def vacancy_statuses(account_id: int):
+        return {"items": STATUSES}
+
+    @app.get("/v2/accounts/{account_id}/vacancies")
+    async def vacancies(account_id: int, request: Request):
+        return _paginate(data.vacancies, request)
+
+    @app.get("/v2/accounts/{account_id}/coworkers")
+    async def coworkers(account_id: int, request: Request):
+        vacancy_ids = _int_params(request, "vacancy_id")
+        if vacancy_ids:
+            member_ids = {member for vacancy_id in vacancy_ids for member in data.vacancy_members.get(vacancy_id, [])}
+            return _paginate([c for c in data.coworkers if c["id"] in member_ids], request)
+        return _paginate(data.coworkers, request)
+
+    @app.get("/v2/accounts/{account_id}/applicants/search")
+    async def applicants_search(account_id: int, request: Request):
+        vacancy_ids = _int_params(request, "vacancy")
+        status_ids = _int_params(request, "status")
+        if vacancy_ids and status_ids:
+            total = sum(data.applicants_ever_on_status(v, s) for v in vacancy_ids for s in status_ids)
+            count = int(request.query_params.get("count", 30))
+            return {"page": 1, "count": count, "total_pages": max(1, math.ceil(total / count)),
+                    "total_items": total, "items": []}
+        applicant_ids = [a for v in vacancy_ids for a in data.vacancy_applicants.get(v, [])]
+        items = [{"id": a, "first_name": "Кандидат", "last_name": str(a), "created": data.applicant_logs(a)[0]["created"]}
+                 for a in applicant_ids]
+        return _paginate(items, request)
+
+    @app.get("/v2/accounts/{account_id}/applicants")
+    async def applicants(account_id: int, request: Request):
+        vacancy_ids = _int_params(request, "vacancy_id")
+        applicant_ids = [a for v in vacancy_ids for a in data.vacancy_applicants.get(v, [])]
+        page = _paginate(applicant_ids, request)
+        page["items"] = [data.applicant_item(a) for a in page["items"]]
+        return page
+
+    @app.get("/v2/accounts/{account_id}/applicants/{applicant_id}/logs")
+    async def applicant_logs(account_id: int, applicant_id: int, request: Request):
+        if applicant_id not in data.applicant_vacancy:
+            return JSONResponse(status_code=404, content={"errors": [{"type": "not_found", "title": "Not found"}]})
+        vacancy_ids = _int_params(request, "vacancy")
+        logs = [log for log in reversed(data.applicant_logs(applicant_id))
+                if not vacancy_ids or log["vacancy"] in vacancy_ids]
+        return _paginate(logs, request)
+
+    return app
@@ -0,0 +1,188 @@
+# Замер полного обновления отчета на локальной имитации Huntflow:
+#     python -m benchmarks.refresh_benchmark --vacancies 500 --latency-ms 30 --runs 2
+# Первый прогон начинается с пустого состояния синхронизации, следующие — инкрементальные
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+
+from .fake_huntflow import FakeAccountSpec, create_fake_huntflow_app
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_server(spec: FakeAccountSpec, port: int):
+    fake_app = create_fake_huntflow_app(spec)
+    server = uvicorn.Server(uvicorn.Config(fake_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Fake Huntflow server failed to start")
+        time.sleep(0.05)
+    return fake_app, server, thread
+
+
+def report_checksum(report: Optional[Dict[str, Any]]) -> Optional[str]:
+    if report is None:
+        return None
+    # Время расчета строки (updated_at) меняется от запуска к запуску и в сравнение не входит
+    rows = sorted(
+        ({key: value for key, value in row.items() if key != "updated_at"} for row in report.get("vacancies", [])),
+        key=lambda row: json.dumps(row, sort_keys=True, ensure_ascii=False)
+    )
+    payload = json.dumps({"vacancies": rows, "coworkers": report.get("coworkers", {})}, sort_keys=True,
+                         ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def _generate_all_accounts(report_generator) -> List[Optional[Dict[str, Any]]]:
+    # Так же, как cache_manager.update_cached_data: аккаунты обновляются параллельно под общим лимитом
+    account_list = await report_generator.discover_accounts()
+    if not account_list:
+        return [None]
+    return await asyncio.gather(*(
+        report_generator.generate_recruitment_funnel_report(account_id=account["id"]) for account in account_list
+    ))
+
+
+async def _timed_run(report_generator, trace_memory: bool = False) -> Dict[str, Any]:
+    # tracemalloc заметно замедляет этот прогон, поэтому время с ним не сравнимо с обычными прогонами
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    reports = await _generate_all_accounts(report_generator)
+    wall_time = time.perf_counter() - started
+    peak_traced_mb = None
+    if trace_memory:
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_traced_mb = round(peak_bytes / 1024 / 1024, 2)
+    return {
+        "wall_time_s": round(wall_time, 3),
+        "peak_traced_memory_mb": peak_traced_mb,
+        "accounts": len(reports),
+        "vacancies": sum(len(report.get("vacancies", [])) for report in reports if report),
+        "checksum": report_checksum(reports[0]),
+        "accounts_checksums": [report_checksum(report) for report in reports],
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Замер полного обновления отчета на локальной имитации Huntflow")
+    parser.add_argument("--vacancies", type=int, default=50)
+    parser.add_argument("--mean-applicants", type=float, default=30.0)
+    parser.add_argument("--zipf-exponent", type=float, default=1.1)
+    parser.add_argument("--coworkers", type=int, default=40)
+    parser.add_argument("--history-days", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--token-expire-after", type=int, default=0,
+                        help="Expire the access token every N authorized requests (0 = never)")
+    parser.add_argument("--accounts", type=int, default=1, help="Number of Huntflow organizations to serve")
+    parser.add_argument("--rps", type=float, default=200.0, help="HUNTFLOW_RATE_LIMIT_RPS for the run")
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--http-cache", action="store_true", help="Keep the HTTP response cache enabled")
+    parser.add_argument("--full-sync", action="store_true", help="Disable incremental log sync")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Trace peak Python allocations with tracemalloc (slows the runs; times are not comparable)")
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="hiring-report-bench-")
+    port = _free_port()
+
+    # Настройки приложения читаются при импорте, поэтому окружение готовится до импорта app.*
+    os.environ.update({
+        "HUNTFLOW_BASE_URL": f"http://127.0.0.1:{port}",
+        "HUNTFLOW_API_TOKEN": "bench-access-token",
+        "HUNTFLOW_REFRESH_TOKEN": "bench-refresh-token",
+        "CACHE_FILE_PATH": os.path.join(workdir, "report_cache.json"),
+        "HUNTFLOW_RATE_LIMIT_RPS": str(args.rps),
+        "HUNTFLOW_RATE_LIMIT_BURST": str(max(int(args.rps), 1)),
+        "HTTP_CACHE_ENABLED": "true" if args.http_cache else "false",
+        "INCREMENTAL_SYNC": "false" if args.full_sync else "true",
+    })
+    from app import report_generator
+
+    _, week_end = report_generator.get_report_week_range(datetime.now(timezone.utc))
+    spec = FakeAccountSpec(
+        vacancies=args.vacancies,
+        mean_applicants=args.mean_applicants,
+        zipf_exponent=args.zipf_exponent,
+        coworkers=args.coworkers,
+        history_days=args.history_days,
+        seed=args.seed,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        retry_after_seconds=args.retry_after,
+        token_expire_after_requests=args.token_expire_after,
+        accounts=args.accounts,
+        anchor=week_end,
+    )
+    fake_app, server, thread = start_fake_server(spec, port)
+
+    result = {
+        "params": vars(args),
+        "dataset": {
+            "accounts": args.accounts,
+            "vacancies": args.vacancies,
+            "applicants": fake_app.state.data.total_applicants,
+        },
+        "runs": [],
+    }
+    async def run_all() -> None:
+        for run_index in range(args.runs):
+            fake_app.state.reset_stats()
+            run_result = await _timed_run(report_generator, args.trace_memory)
+            run_result["run"] = run_index + 1
+            run_result["requests_total"] = sum(fake_app.state.request_counts.values())
+            run_result["requests_by_endpoint"] = dict(fake_app.state.request_counts.most_common())
+            run_result["responses_by_status"] = {str(k): v for k, v in fake_app.state.status_counts.items()}
+            result["runs"].append(run_result)
+            print(
+                f"run {run_index + 1}: {run_result['wall_time_s']} s, "
+                f"{run_result['requests_total']} requests, checksum {str(run_result['checksum'])[:12]}",
+                file=sys.stderr,
+            )
+
+    try:
+        asyncio.run(run_all())
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    result["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+    output = json.dumps(result, ensure_ascii=False, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+# Нагрузочный замер эндпоинтов дашборда на синтетическом кэше (httpx.ASGITransport, без сокетов):
+#     python -m benchmarks.web_benchmark --vacancies 100 2000 20000 --concurrency 16 --output web.json
+#     python -m benchmarks.web_benchmark --vacancies 2000 --baseline web.json
+# Каждый эндпоинт замеряется без нагрузки и во время фоновых полных обновлений
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+
+from .fake_huntflow import FakeAccountSpec
+from .refresh_benchmark import _free_port, start_fake_server
+
+ENDPOINTS = ("/", "/status", "/update-comment", "/download-report")
+SCENARIOS = ("idle", "refresh")
+# ID синтетических вакансий не пересекаются с вакансиями имитации Huntflow
+SYNTHETIC_ID_OFFSET = 1_000_000
+COMMENT_SHARE = 0.3
+PRIORITY_SHARE = 0.1
+
+
+def build_synthetic_cache(vacancies: int, coworkers: int, stages: List[str], seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    coworker_ids = list(range(SYNTHETIC_ID_OFFSET, SYNTHETIC_ID_OFFSET + coworkers))
+    rows = []
+    for index in range(vacancies):
+        row: Dict[str, Any] = {
+            "id": SYNTHETIC_ID_OFFSET + index,
+            "название вакансии": f"Синтетическая вакансия {index + 1}",
+            "is_priority": rng.random() < PRIORITY_SHARE,
+            "members": rng.sample(coworker_ids, k=min(len(coworker_ids), rng.randint(1, 3))),
+        }
+        total = rng.randint(0, 60)
+        for stage in stages:
+            row[stage] = {"total": total, "current": rng.randint(0, min(total, 5))}
+            total = int(total * rng.uniform(0.3, 0.8))
+        row["last_activity"] = (now - timedelta(days=rng.randint(0, 30))).isoformat()
+        row["updated_at"] = now.isoformat()
+        row["комментарий"] = f"Комментарий {index + 1}" if rng.random() < COMMENT_SHARE else ""
+        rows.append(row)
+    return {
+        "vacancies": rows,
+        "coworkers": {str(coworker_id): f"Рекрутер {coworker_id - SYNTHETIC_ID_OFFSET + 1}" for coworker_id in coworker_ids},
+        "last_updated": now.isoformat(),
+        "version": 1,
+        "is_complete": True,
+    }
+
+
+async def seed_cache(data: Dict[str, Any]) -> None:
+    # Снимок проходит тот же путь, что и при запуске: запись в хранилище и загрузка через cache_manager
+    from app import accounts, cache_manager
+    from app.cache_storage import create_cache_storage
+
+    await create_cache_storage(accounts.resolve_account_id(None)).save_snapshot(data)
+    await cache_manager.load_cache()
+    await cache_manager.reload_if_changed()
+
+
+def current_rss_mb(pid: str = "self") -> float:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 2)
+    except OSError:
+        return 0.0
+
+
+def children_rss_mb() -> float:
+    # Процесс обновления (REFRESH_WORKER=process) держит данные отдельно от веб-процесса
+    pids = set()
+    for task in os.listdir("/proc/self/task") if os.path.isdir("/proc/self/task") else []:
+        try:
+            with open(f"/proc/self/task/{task}/children") as f:
+                pids.update(f.read().split())
+        except OSError:
+            continue
+    return round(sum(current_rss_mb(pid) for pid in pids), 2)
+
+
+def _percentile(sorted_values: List[float], share: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(share * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _request_factory(endpoint: str, names: List[str]) -> Callable[[httpx.AsyncClient, int], Any]:
+    if endpoint == "/update-comment":
+        return lambda client, i: client.post(endpoint, json={
+            "vacancy_name": names[i % len(names)], "comment": f"Нагрузочный комментарий {i}",
+        })
+    return lambda client, i: client.get(endpoint)
+
+
+async def measure_endpoint(
+    client: httpx.AsyncClient, endpoint: str, names: List[str], requests: int, concurrency: int, warmup: int
+) -> Dict[str, Any]:
+    send = _request_factory(endpoint, names)
+    for i in range(warmup):
+        await send(client, i)
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def user() -> None:
+        for i in counter:
+            started = time.perf_counter()
+            response = await send(client, warmup + i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    wall_time = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_rps": round(len(latencies) / wall_time, 1) if wall_time else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50), 2),
+            "p95": round(_percentile(latencies, 0.95), 2),
+            "p99": round(_percentile(latencies, 0.99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        },
+        "responses_by_status": statuses,
+        "rss_before_mb": rss_before,
+        "rss_after_mb": current_rss_mb(),
+        "children_rss_mb": children_rss_mb(),
+    }
+
+
+async def _refresh_loop(stop: asyncio.Event, data: Dict[str, Any], stats: Dict[str, int]) -> None:
+    from app import cache_manager
+
+    while not stop.is_set():
+        await cache_manager.update_cached_data()
+        stats["refreshes"] += 1
+        # Полное обновление заменяет снимок данными имитации; исходный размер кэша восстанавливается сразу
+        await seed_cache(data)
+
+
+async def run_size(args: argparse.Namespace, vacancies: int, stages: List[str]) -> Dict[str, Any]:
+    from app.main import app
+
+    data = build_synthetic_cache(vacancies, args.coworkers, stages, args.seed)
+    rss_before_seed = current_rss_mb()
+    seed_started = time.perf_counter()
+    await seed_cache(data)
+    result: Dict[str, Any] = {
+        "vacancies": vacancies,
+        "coworkers": args.coworkers,
+        "seed_time_s": round(time.perf_counter() - seed_started, 3),
+        "seed_rss_delta_mb": round(current_rss_mb() - rss_before_seed, 2),
+        "scenarios": {},
+    }
+    names = [row["название вакансии"] for row in data["vacancies"]]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for scenario in args.scenarios:
+            stop = asyncio.Event()
+            refresh_stats = {"refreshes": 0}
+            refresh_task = None
+            if scenario == "refresh":
+                refresh_task = asyncio.create_task(_refresh_loop(stop, data, refresh_stats))
+                # Замеры начинаются, когда обновление уже идет
+                await asyncio.sleep(args.refresh_lead_seconds)
+            endpoints = {}
+            try:
+                for endpoint in args.endpoints:
+                    endpoints[endpoint] = await measure_endpoint(
+                        client, endpoint, names, args.requests, args.concurrency, args.warmup
+                    )
+                    print(
+                        f"{vacancies} vacancies, {scenario}, {endpoint}: "
+                        f"p50 {endpoints[endpoint]['latency_ms']['p50']} ms, "
+                        f"p99 {endpoints[endpoint]['latency_ms']['p99']} ms, "
+                        f"{endpoints[endpoint]['throughput_rps']} rps",
+                        file=sys.stderr,
+                    )
+            finally:
+                stop.set()
+                if refresh_task is not None:
+                    await refresh_task
+                    await seed_cache(data)
+            result["scenarios"][scenario] = {"endpoints": endpoints, **refresh_stats}
+    return result
+
+
+def compare_with_baseline(result: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def index(payload: Dict[str, Any]) -> Dict[Tuple[int, str, str], Dict[str, Any]]:
+        return {
+            (size["vacancies"], scenario, endpoint): measurement
+            for size in payload.get("sizes", [])
+            for scenario, scenario_result in size["scenarios"].items()
+            for endpoint, measurement in scenario_result["endpoints"].items()
+        }
+
+    previous = index(baseline)
+    comparison = []
+    for key, measurement in index(result).items():
+        old = previous.get(key)
+        if old is None:
+            continue
+        row = {"vacancies": key[0], "scenario": key[1], "endpoint": key[2]}
+        for metric in ("p50", "p95", "p99"):
+            old_value = old["latency_ms"][metric]
+            row[f"{metric}_ratio"] = round(measurement["latency_ms"][metric] / old_value, 2) if old_value else None
+        old_rps = old["throughput_rps"]
+        row["throughput_ratio"] = round(measurement["throughput_rps"] / old_rps, 2) if old_rps else None
+        comparison.append(row)
+    return comparison
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный замер эндпоинтов дашборда на синтетическом кэше")
+    parser.add_argument("--vacancies", type=int, nargs="+", default=[100, 2000],
+                        help="Cache sizes to measure, e.g. 100 2000 20000")
+    parser.add_argument("--coworkers", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Simultaneous in-process clients")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests per endpoint")
+    parser.add_argument("--cache-backend", choices=("binary", "json", "sqlite"), default="binary")
+    parser.add_argument("--refresh-worker", choices=("process", "inline"), default="process")
+    parser.add_argument("--refresh-vacancies", type=int, default=200,
+                        help="Vacancies served by the fake Huntflow for the background refresh")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Fake Huntflow response latency")
+    parser.add_argument("--rps", type=float, default=200.0, help="HUNTFLOW_RATE_LIMIT_RPS for the refresh")
+    parser.add_argument("--refresh-lead-seconds", type=float, default=2.0,
+                        help="Delay between starting the background refresh and the first measurement")
+    parser.add_argument("--baseline", help="Compare latencies and throughput with a previously saved result")
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    parser.add_argument("--verbose", action="store_true", help="Keep the application INFO logs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="hiring-web-bench-")
+    port = _free_port()
+
+    # Настройки приложения читаются при импорте, поэтому окружение готовится до импорта app.*
+    os.environ.update({
+        "HUNTFLOW_BASE_URL": f"http://127.0.0.1:{port}",
+        "HUNTFLOW_API_TOKEN": "bench-access-token",
+        "HUNTFLOW_REFRESH_TOKEN": "bench-refresh-token",
+        "CACHE_FILE_PATH": os.path.join(workdir, "report_cache.json"),
+        "CACHE_BACKEND": args.cache_backend,
+        "REFRESH_WORKER": args.refresh_worker,
+        "WORKER_COORDINATION": "false",
+        "HUNTFLOW_RATE_LIMIT_RPS": str(args.rps),
+        "HUNTFLOW_RATE_LIMIT_BURST": str(max(int(args.rps), 1)),
+        "HTTP_CACHE_ENABLED": "false",
+    })
+    from app import refresh_worker, report_generator
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    server = thread = None
+    if "refresh" in args.scenarios:
+        _, week_end = report_generator.get_report_week_range(datetime.now(timezone.utc))
+        spec = FakeAccountSpec(
+            vacancies=args.refresh_vacancies, seed=args.seed, latency_ms=args.latency_ms, anchor=week_end
+        )
+        _, server, thread = start_fake_server(spec, port)
+
+    result: Dict[str, Any] = {
+        "params": vars(args),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "sizes": [],
+    }
+
+    async def run_all() -> None:
+        try:
+            for vacancies in args.vacancies:
+                result["sizes"].append(await run_size(args, vacancies, report_generator.FUNNEL_STAGES_ORDER))
+        finally:
+            refresh_worker.shutdown()
+
+    try:
+        asyncio.run(run_all())
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    result["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            result["baseline_comparison"] = compare_with_baseline(result, json.load(f))
+    output = json.dumps(result, ensure_ascii=False, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-import { getStatus, refreshReport } from './modules/api.js';
+import { getStatus, refreshReport, subscribeToStatus } from './modules/api.js';
 import { updateStatusUI, initRefreshButton } from './modules/ui.js';
 import { initFilters } from './modules/filters.js';
 import { initCommentEditing } from './modules/comments.js';
@@ -12,33 +12,66 @@ function main() {
 
     const coworkersData = JSON.parse(appContainer.dataset.coworkers || '{}');
     const reportData = JSON.parse(appContainer.dataset.report || '[]');
+    const accountId = appContainer.dataset.accountId;
+    const isWarmingUp = appContainer.dataset.warmingUp === 'true';
 
     let wasUpdating = false;
+    let pollTimer = null;
 
     initFilters(coworkersData, reportData);
     initCommentEditing();
     initRefreshButton(handleRefreshClick);
-    
+
+    const accountSelect = document.getElementById('account-select');
+    if (accountSelect) {
+        accountSelect.addEventListener('change', () => {
+            const params = new URLSearchParams(window.location.search);
+            params.set('account_id', accountSelect.value);
+            window.location.search = params.toString();
+        });
+    }
+
+    const handleStatus = (status) => {
+        updateStatusUI(status);
+        // Страница, открытая до появления данных, перезагружается, как только они готовы
+        if ((wasUpdating && !status.is_updating) || (isWarmingUp && status.warming_up === false)) {
+            window.location.reload();
+        }
+        wasUpdating = status.is_updating;
+    };
+
     const pollStatus = async () => {
         try {
-            const status = await getStatus();
-            updateStatusUI(status);
-
-            if (wasUpdating && !status.is_updating) {
-                window.location.reload();
-            }
-            wasUpdating = status.is_updating;
+            const status = await getStatus(accountId);
+            handleStatus({ ...status, ...status.progress });
         } catch (error) {
             console.error(error.message);
         }
     };
-    
-    setInterval(pollStatus, 5000);
-    pollStatus();
+
+    const startPolling = () => {
+        if (pollTimer === null) {
+            pollTimer = setInterval(pollStatus, 5000);
+            pollStatus();
+        }
+    };
+
+    const source = subscribeToStatus(accountId, {
+        onProgress: handleStatus,
+        onError: (eventSource) => {
+            // EventSource переподключается сам; на опрос переходим, только если поток закрыт окончательно
+            if (eventSource.readyState === EventSource.CLOSED) {
+                startPolling();
+            }
+        },
+    });
+    if (!source || isWarmingUp) {
+        startPolling();
+    }
 
     async function handleRefreshClick() {
         try {
-            const data = await refreshReport();
+            const data = await refreshReport(accountId);
             if (data.message === "Обновление запущено в фоновом режиме.") {
                 updateStatusUI({ is_updating: true });
             } else {
@@ -1,8 +1,17 @@
+function withAccount(url, accountId) {
+    if (!accountId) {
+        return url;
+    }
+    const separator = url.includes('?') ? '&' : '?';
+    return `${url}${separator}account_id=${encodeURIComponent(accountId)}`;
+}
+
 /**
+ * @param {string} [accountId]
  * @returns {Promise<Object>}
  */
-export async function getStatus() {
-    const response = await fetch('/status');
+export async function getStatus(accountId) {
+    const response = await fetch(withAccount('/status', accountId));
     if (!response.ok) {
         throw new Error('Ошибка при получении статуса.');
     }
@@ -10,23 +19,47 @@ export async function getStatus() {
 }
 
 /**
+ * Подписывается на поток прогресса обновления аккаунта (Server-Sent Events).
+ * @param {string} [accountId] - без аккаунта используется аккаунт по умолчанию
+ * @param {Object} handlers - { onProgress, onRow, onDone, onError }
+ * @returns {EventSource|null} null, если браузер не поддерживает EventSource
+ */
+export function subscribeToStatus(accountId, handlers) {
+    if (!window.EventSource) {
+        return null;
+    }
+    const source = new EventSource(withAccount('/status/stream', accountId));
+    source.addEventListener('progress', event => handlers.onProgress(JSON.parse(event.data)));
+    source.addEventListener('row', event => handlers.onRow && handlers.onRow(JSON.parse(event.data)));
+    source.addEventListener('done', event => handlers.onDone && handlers.onDone(JSON.parse(event.data)));
+    source.onerror = () => handlers.onError && handlers.onError(source);
+    return source;
+}
+
+/**
+ * @param {string} [accountId] - без аккаунта обновляются все аккаунты
  * @returns {Promise<Object>}
  */
-export async function refreshReport() {
-    const response = await fetch('/refresh-report', { method: 'POST' });
+export async function refreshReport(accountId) {
+    const response = await fetch(withAccount('/refresh-report', accountId), { method: 'POST' });
     return response.json();
 }
 
 /**
  * @param {string} vacancyName
  * @param {string} newComment
+ * @param {string} [accountId]
  * @returns {Promise<Object>}
  */
-export async function updateComment(vacancyName, newComment) {
+export async function updateComment(vacancyName, newComment, accountId) {
     const response = await fetch('/update-comment', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ vacancy_name: vacancyName, comment: newComment })
+        body: JSON.stringify({
+            vacancy_name: vacancyName,
+            comment: newComment,
+            account_id: accountId ? Number(accountId) : null
+        })
     });
 
     if (!response.ok) {
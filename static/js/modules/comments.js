@@ -24,7 +24,8 @@ async function finishEditing() {
 
     try {
         const vacancyName = cell.dataset.vacancyName;
-        await updateComment(vacancyName, newComment);
+        const accountId = document.getElementById('app-container').dataset.accountId;
+        await updateComment(vacancyName, newComment, accountId);
     } catch (error) {
         console.error('Сетевая ошибка при сохранении:', error);
         alert('Ошибка при сохранении: ' + error.message);
@@ -1,24 +1,29 @@
 let recruiterTomSelect, vacancyTomSelect;
+let rowIndex = [];
+
+function buildRowIndex() {
+    rowIndex = Array.from(document.querySelectorAll('table tbody tr'), row => ({
+        row,
+        isPriority: row.dataset.priority === 'true',
+        memberIds: new Set(JSON.parse(row.dataset.members || '[]')),
+        vacancyName: row.dataset.vacancyName,
+    }));
+}
 
 function applyFilters() {
     const priorityToggle = document.getElementById('priority-toggle');
-    const selectedRecruiterIds = recruiterTomSelect ? recruiterTomSelect.getValue() : [];
-    const selectedVacancyNames = vacancyTomSelect ? vacancyTomSelect.getValue() : [];
-    const rows = document.querySelectorAll('table tbody tr');
+    const selectedRecruiterIds = (recruiterTomSelect ? recruiterTomSelect.getValue() : []).map(id => parseInt(id, 10));
+    const selectedVacancyNames = new Set(vacancyTomSelect ? vacancyTomSelect.getValue() : []);
     const showOnlyPriority = priorityToggle.checked;
 
-    rows.forEach(row => {
-        const isPriority = row.dataset.priority === 'true';
-        const memberIds = JSON.parse(row.dataset.members || '[]');
-        const vacancyName = row.dataset.vacancyName;
-
+    rowIndex.forEach(({ row, isPriority, memberIds, vacancyName }) => {
         const priorityMatch = !showOnlyPriority || isPriority;
 
         const recruiterMatch = selectedRecruiterIds.length === 0 ||
-            selectedRecruiterIds.map(id => parseInt(id, 10)).some(id => memberIds.includes(id));
+            selectedRecruiterIds.some(id => memberIds.has(id));
 
-        const vacancyMatch = selectedVacancyNames.length === 0 ||
-            selectedVacancyNames.includes(vacancyName);
+        const vacancyMatch = selectedVacancyNames.size === 0 ||
+            selectedVacancyNames.has(vacancyName);
 
         row.classList.toggle('hidden-by-filters', !(priorityMatch && recruiterMatch && vacancyMatch));
     });
@@ -64,5 +69,6 @@ export function initFilters(coworkersData, reportData) {
         });
     }
 
+    buildRowIndex();
     applyFilters();
 }
\ No newline at end of file
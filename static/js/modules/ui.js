@@ -2,13 +2,36 @@ const elements = {
     overlay: document.getElementById('update-overlay'),
     refreshButton: document.getElementById('refreshButton'),
     lastUpdatedSpan: document.getElementById('last-updated-time'),
+    progressText: document.getElementById('update-progress'),
 };
 
+const PHASE_TITLES = {
+    starting: 'Подключение к Huntflow...',
+    dictionaries: 'Загрузка справочников...',
+    vacancies: 'Сбор данных по вакансиям',
+    saving: 'Сохранение отчета...',
+};
+
+function formatProgress(status) {
+    const title = PHASE_TITLES[status.phase] || '';
+    if (status.phase !== 'vacancies' || !status.vacancies_total) {
+        return title;
+    }
+    let text = `${title}: ${status.vacancies_done} из ${status.vacancies_total}, запросов к API: ${status.requests}`;
+    if (status.eta_seconds !== null && status.eta_seconds !== undefined) {
+        text += `, осталось ~${Math.ceil(status.eta_seconds)} с`;
+    }
+    return text;
+}
+
 /**
  * Обновляет UI на основе статуса от сервера.
- * @param {Object} status - { is_updating: boolean, last_updated_str: string }
+ * @param {Object} status - { is_updating, phase, vacancies_done, vacancies_total, requests, eta_seconds, last_updated }
  */
 export function updateStatusUI(status) {
+    if (elements.progressText) {
+        elements.progressText.textContent = status.is_updating ? formatProgress(status) : '';
+    }
     if (status.is_updating) {
         elements.overlay.classList.remove('hidden');
         if (elements.refreshButton) {